@@ -3,30 +3,237 @@ The whole file was taken from https://github.com/PDA-UR/DIPPID-py.
 """
 
 import sys
+import re
 import json
-from threading import Thread
-from time import sleep
+import traceback
+from collections import deque
+from threading import Thread, Condition, Event
+from time import monotonic
 from datetime import datetime
 import signal
+import instrumentation
 
 # those modules are imported dynamically during runtime
 # they are imported only if the corresponding class is used
 #import socket
 #import serial
 #import wiimote
+#import ring_buffer (numpy)
+
+# generic decoder for DIPPID messages
+# parses any json object from bytes or str
+class JSONDecoder():
+    # returns a dict of capabilities and values or None for incomplete data
+    def decode(self, data):
+        try:
+            if isinstance(data, (bytes, bytearray)):
+                data = data.decode()
+            return json.loads(data)
+        except (json.decoder.JSONDecodeError, UnicodeDecodeError):
+            # incomplete or garbled data
+            return None
+
+# schema-aware decoder for the message shapes DIPPID devices send,
+# i.e. {"<capability>":{"x":..,"y":..,"z":..}} and {"<capability>":<int>}
+# parses raw bytes with precompiled patterns and caches decoded key names;
+# any other message is handed to the generic JSONDecoder
+class DIPPIDDecoder(JSONDecoder):
+    # numbers follow the JSON grammar exactly, so only messages json.loads() accepts take the fast path
+    # (each number is captured with its fraction and exponent part, which is empty for ints)
+    _NUMBER = rb'(-?(?:0|[1-9]\d*)((?:\.\d+)?(?:[eE][+-]?\d+)?))'
+    _VECTOR = re.compile(rb'\{"(\w+)":\{"x":' + _NUMBER + rb',"y":' + _NUMBER + rb',"z":' + _NUMBER + rb'\}\}')
+    _INTEGER = re.compile(rb'\{"(\w+)":(-?(?:0|[1-9]\d*))\}')
+    KNOWN_KEYS = ['accelerometer', 'gyroscope', 'gravity', 'button_1', 'button_2', 'button_3', 'button_4']
+
+    def __init__(self):
+        # raw key bytes -> decoded key, so each key is decoded only once
+        self._keys = {key.encode(): key for key in DIPPIDDecoder.KNOWN_KEYS}
+
+    def decode(self, data):
+        if isinstance(data, str):
+            return JSONDecoder.decode(self, data)
+
+        match = DIPPIDDecoder._VECTOR.fullmatch(data)
+        if match is not None:
+            # like json.loads(), numbers without fraction and exponent are ints
+            raw_key, x, x_fraction, y, y_fraction, z, z_fraction = match.groups()
+            return {self._key(raw_key): {'x': float(x) if x_fraction else int(x),
+                                         'y': float(y) if y_fraction else int(y),
+                                         'z': float(z) if z_fraction else int(z)}}
+
+        match = DIPPIDDecoder._INTEGER.fullmatch(data)
+        if match is not None:
+            return {self._key(match.group(1)): int(match.group(2))}
+
+        return JSONDecoder.decode(self, data)
+
+    def _key(self, raw_key):
+        key = self._keys.get(raw_key)
+        if key is None:
+            key = self._keys[raw_key] = raw_key.decode()
+        return key
+
+# delivers sensor callbacks outside of the receive thread
+# every capability gets its own bounded queue with one of two policies:
+#   LATEST: only the newest value is kept (coalescing, default for high-rate capabilities)
+#   ALL: every value is delivered in order (default for buttons), the oldest is dropped when the queue is full
+# with threaded=True a worker thread delivers the events, otherwise the owner has to call
+# dispatch_pending() regularly, e.g. from a QTimer so callbacks run in the GUI thread
+# use one dispatcher per sensor
+class CallbackDispatcher():
+    LATEST = 'latest'
+    ALL = 'all'
+
+    def __init__(self, threaded=True, max_queue_size=64, policies=None):
+        self._threaded = threaded
+        self._max_queue_size = max_queue_size
+        # capability -> policy, overrides the defaults
+        self._policies = dict(policies) if policies else {}
+        # capability -> deque of values waiting for delivery
+        self._queues = {}
+        # capability -> list of callbacks (the sensor's list, so later registrations are seen)
+        self._callbacks = {}
+        # capabilities with pending values in the order they became pending
+        self._ready = deque()
+        self._dropped = {}
+        self._delivered = {}
+        self._condition = Condition()
+        self._running = False
+        self._worker = None
+
+    def get_policy(self, key):
+        if key in self._policies:
+            return self._policies[key]
+        return CallbackDispatcher.ALL if key.startswith('button') else CallbackDispatcher.LATEST
+
+    # policies can only be changed before the first value of a capability was submitted
+    def set_policy(self, key, policy):
+        self._policies[key] = policy
+
+    def start(self):
+        if not self._threaded or self._running:
+            return
+        self._running = True
+        self._worker = Thread(target=self._work, daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._worker:
+            self._worker.join()
+            self._worker = None
+
+    # called from the receive thread, never blocks on callbacks
+    def submit(self, key, value, callbacks):
+        with self._condition:
+            queue = self._queues.get(key)
+            if queue is None:
+                size = 1 if self.get_policy(key) == CallbackDispatcher.LATEST else self._max_queue_size
+                queue = self._queues[key] = deque(maxlen=size)
+                self._callbacks[key] = callbacks
+                self._dropped[key] = 0
+                self._delivered[key] = 0
+
+            if not queue:
+                self._ready.append(key)
+            elif len(queue) == queue.maxlen:
+                # the oldest value is pushed out (replaced for LATEST)
+                self._dropped[key] += 1
+            queue.append(value)
+            self._condition.notify()
+
+    # delivers all values that are pending right now, returns the number of delivered values
+    def dispatch_pending(self):
+        events = []
+        with self._condition:
+            while self._ready:
+                key = self._ready.popleft()
+                queue = self._queues[key]
+                events.extend((key, value) for value in queue)
+                queue.clear()
+
+        for key, value in events:
+            for func in list(self._callbacks[key]):
+                try:
+                    func(value)
+                except Exception:
+                    # a failing callback must not take down the dispatcher
+                    traceback.print_exc()
+            self._delivered[key] += 1
+        return len(events)
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while self._running and not self._ready:
+                    self._condition.wait()
+                if not self._running:
+                    return
+            self.dispatch_pending()
+
+    # number of values waiting for delivery
+    def queue_depth(self, key=None):
+        with self._condition:
+            if key is not None:
+                return len(self._queues.get(key, ()))
+            return sum(len(queue) for queue in self._queues.values())
+
+    # number of values that were replaced or pushed out before they could be delivered
+    def dropped(self, key=None):
+        if key is not None:
+            return self._dropped.get(key, 0)
+        return sum(self._dropped.values())
+
+    # per capability: policy, current queue depth, dropped and delivered values
+    def stats(self):
+        with self._condition:
+            return {key: {'policy': self.get_policy(key),
+                          'depth': len(queue),
+                          'dropped': self._dropped[key],
+                          'delivered': self._delivered[key]}
+                    for key, queue in self._queues.items()}
 
 class Sensor():
     # class variable that stores all instances of Sensor
     instances = []
 
-    def __init__(self):
-        # list of strings which represent capabilites, such as 'buttons' or 'accelerometer'
-        self._capabilities = []
+    # seconds without a message after which a sensor is no longer considered alive
+    CONNECTION_TIMEOUT = 1.0
+    # weight of the newest inter-arrival time in the packet rate and jitter estimates (as in RFC 3550)
+    ESTIMATE_GAIN = 1 / 16
+
+    # decoder turns raw messages into dicts, JSONDecoder is used by default
+    def __init__(self, decoder=None):
+        # strings which represent capabilites, such as 'buttons' or 'accelerometer'
+        # (a dict is used as an ordered set, so lookups don't depend on the number of capabilities)
+        self._capabilities = {}
         # for each capability, store a list of callback functions
         self._callbacks = {}
         # for each capability, store the last value as an object
         self._data = {}
         self._receiving = False
+        self._decoder = decoder if decoder is not None else JSONDecoder()
+        # for each capability, a SampleHistory of every received value (see enable_history)
+        # or None if the values are not numeric
+        self._history = {}
+        self._history_size = 0
+        # delivers callbacks if set, otherwise they run in the receive thread
+        self._dispatcher = None
+        # functions called with (timestamp, message) for every received message
+        self._sample_listeners = []
+        # connection health: time of the latest message, smoothed inter-arrival time and its jitter (seconds)
+        self.connection_timeout = Sensor.CONNECTION_TIMEOUT
+        self._packets = 0
+        self._last_packet = None
+        self._interval = None
+        self._jitter = 0.0
+        self._connected = False
+        # functions called with (sensor, connected) when the sensor starts or stops sending
+        self._connection_callbacks = []
+        self._watchdog = None
+        self._watchdog_stop = Event()
         Sensor.instances.append(self)
 
     # stops the loop in _receive() and kills the thread
@@ -36,19 +243,84 @@ class Sensor():
         Sensor.instances.remove(self)
         if self._connection_thread:
             self._connection_thread.join()
+        self._stop_delivery()
+
+    # stops the dispatcher and the connection watchdog and reports the disconnect to the connection callbacks,
+    # once no more messages are received (part of every disconnect())
+    def _stop_delivery(self):
+        if self._dispatcher:
+            self._dispatcher.stop()
+        self._watchdog_stop.set()
+        if self._watchdog:
+            self._watchdog.join()
+        if self._connected:
+            self._connected = False
+            self._notify_connection(False)
 
     # runs as a thread
     # receives json formatted data from sensor,
     # stores it and notifies callbacks
     def _update(self, data):
-        try:
-            data_json = json.loads(data)
-        except json.decoder.JSONDecodeError:
-            # incomplete data
+        data_json = self._decode(data)
+        if data_json is None:
+            return
+        self._store_samples(data_json)
+        self._apply(data_json)
+
+    # parses one message, returns None for incomplete data
+    @instrumentation.timed('decode')
+    def _decode(self, data):
+        return self._decoder.decode(data)
+
+    # called once per received message (before values are merged or compared)
+    # updates the connection health, passes the message to the sample listeners
+    # and feeds the sample history of each capability
+    # timestamp is the time the message arrived (time.monotonic(), now if None)
+    def _store_samples(self, data_json, timestamp=None):
+        if timestamp is None:
+            timestamp = monotonic()
+        self._track_packet(timestamp)
+        if not self._history_size and not self._sample_listeners:
             return
 
+        for func in self._sample_listeners:
+            func(timestamp, data_json)
+        if self._history_size:
+            self._append_history(timestamp, data_json)
+
+    def _append_history(self, timestamp, data_json):
         for key, value in data_json.items():
-            self._add_capability(key)
+            history = self._history.get(key, False)
+            if history is False:
+                history = self._history[key] = self._create_history(value)
+            if history is None:
+                continue
+
+            try:
+                if history.fields[0] is None:
+                    history.append(timestamp, value)
+                else:
+                    history.append(timestamp, [value[field] for field in history.fields])
+            except (KeyError, TypeError, ValueError):
+                # value does not match the layout of the first sample
+                continue
+
+    def _create_history(self, value):
+        from ring_buffer import SampleHistory
+
+        if isinstance(value, dict):
+            if not value or not all(isinstance(v, (int, float)) for v in value.values()):
+                return None
+            return SampleHistory(self._history_size, value.keys())
+        if isinstance(value, (int, float)):
+            return SampleHistory(self._history_size, [None])
+        return None
+
+    # stores already parsed values and notifies callbacks
+    def _apply(self, data_json):
+        for key, value in data_json.items():
+            if key not in self._data:
+                self._add_capability(key)
 
             # do not notify callbacks on initialization
             if self._data[key] == []:
@@ -66,13 +338,75 @@ class Sensor():
 
     def _add_capability(self, key):
         if not self.has_capability(key):
-            self._capabilities.append(key)
+            self._capabilities[key] = None
             self._callbacks[key] = []
             self._data[key] = []
 
     # returns a list of all current capabilities
     def get_capabilities(self):
-        return self._capabilities
+        return list(self._capabilities)
+
+    def _track_packet(self, now):
+        last, self._last_packet = self._last_packet, now
+        self._packets += 1
+        if last is not None and now - last <= self.connection_timeout:
+            # gaps longer than the timeout are connection losses, not part of the packet rate
+            interval = now - last
+            if self._interval is None:
+                self._interval = interval
+            else:
+                self._jitter += (abs(interval - self._interval) - self._jitter) * Sensor.ESTIMATE_GAIN
+                self._interval += (interval - self._interval) * Sensor.ESTIMATE_GAIN
+        if not self._connected:
+            self._connected = True
+            self._notify_connection(True)
+
+    def _notify_connection(self, connected):
+        for func in self._connection_callbacks:
+            func(self, connected)
+
+    # runs as a thread while connection callbacks are registered
+    # reports a connection loss when no message arrived for connection_timeout seconds
+    def _watch_connection(self):
+        while not self._watchdog_stop.wait(self.connection_timeout / 4):
+            if self._connected and not self.is_alive():
+                self._connected = False
+                self._notify_connection(False)
+
+    # checks if the sensor received a message within the last `timeout` seconds (connection_timeout by default)
+    def is_alive(self, timeout=None):
+        last_packet = self._last_packet
+        if last_packet is None:
+            return False
+        return monotonic() - last_packet <= (timeout if timeout is not None else self.connection_timeout)
+
+    # returns the connection health: number of messages, seconds since the latest one (None if there was none),
+    # estimated messages per second and inter-arrival jitter in seconds
+    def stats(self):
+        last_packet = self._last_packet
+        return {'packets': self._packets,
+                'since_last_packet': monotonic() - last_packet if last_packet is not None else None,
+                'rate': 1 / self._interval if self._interval else 0.0,
+                'jitter': self._jitter,
+                'alive': self.is_alive()}
+
+    # register a function that is called with (sensor, True) when the sensor starts sending
+    # and with (sensor, False) when nothing arrived for connection_timeout seconds
+    # connects are reported from the receive thread, losses from a watchdog thread
+    # a sensor that is already sending is reported right away
+    def register_connection_callback(self, func):
+        self._connection_callbacks.append(func)
+        if self._connected and self.is_alive():
+            func(self, True)
+        if self._watchdog is None:
+            self._watchdog = Thread(target=self._watch_connection, daemon=True)
+            self._watchdog.start()
+
+    def unregister_connection_callback(self, func):
+        if func in self._connection_callbacks:
+            self._connection_callbacks.remove(func)
+            return True
+        return False
 
     # get last value for specified capability
     def get_value(self, key):
@@ -83,6 +417,45 @@ class Sensor():
             #raise KeyError(f'"{key}" is not a capability of this sensor.')
             return None
 
+    # keep the last `size` values of every numeric capability with timestamps (time.monotonic())
+    # requires numpy
+    def enable_history(self, size=1000):
+        self._history = {}
+        self._history_size = size
+
+    # returns views (timestamps, values) of the last n values of a capability (all if n is None)
+    # values has one column per field (e.g. x, y, z); None if there is no history for the capability
+    def get_history(self, key, n=None):
+        history = self._history.get(key)
+        if history is None:
+            return None
+        return history.latest(n)
+
+    # returns views (timestamps, values) of all values received after timestamp t
+    def get_since(self, key, t):
+        history = self._history.get(key)
+        if history is None:
+            return None
+        return history.since(t)
+
+    # returns the field names of the history columns of a capability, e.g. ['x', 'y', 'z']
+    def get_history_fields(self, key):
+        history = self._history.get(key)
+        if history is None:
+            return None
+        return history.fields
+
+    # register a function that is called with (timestamp, dict of values) for every received message,
+    # unchanged values included; runs in the receive thread, so it has to be fast
+    def add_sample_listener(self, func):
+        self._sample_listeners.append(func)
+
+    def remove_sample_listener(self, func):
+        if func in self._sample_listeners:
+            self._sample_listeners.remove(func)
+            return True
+        return False
+
     # register a callback function for a change in specified capability
     def register_callback(self, key, func):
         self._add_capability(key)
@@ -97,19 +470,45 @@ class Sensor():
             # in case somebody wants to check if the callback was present before
             return False
 
+    # hand callbacks over to a CallbackDispatcher instead of running them in the receive thread
+    # None restores synchronous callbacks
+    def set_dispatcher(self, dispatcher):
+        if self._dispatcher:
+            self._dispatcher.stop()
+        self._dispatcher = dispatcher
+        if dispatcher:
+            dispatcher.start()
+
+    def get_dispatcher(self):
+        return self._dispatcher
+
+    @instrumentation.timed('dispatch')
     def _notify_callbacks(self, key):
+        if self._dispatcher:
+            self._dispatcher.submit(key, self._data[key], self._callbacks[key])
+            return
+
         for func in self._callbacks[key]:
             func(self._data[key])
 
 # sensor connected via WiFi/UDP
 # initialized with a UDP port
 # listens to all IPs by default
-# requires the socket module
+# with batched=True all datagrams waiting on the socket are drained at once
+# and merged into a single update per capability (latest value wins)
+# requires the socket and select modules
 class SensorUDP(Sensor):
-    def __init__(self, port, ip='0.0.0.0'):
-        Sensor.__init__(self)
+    # size of a single datagram and maximum number of datagrams per batch
+    MAX_DATAGRAM_SIZE = 1024
+    MAX_BATCH_SIZE = 256
+    # seconds the batched loop waits for data before checking _receiving again
+    SELECT_TIMEOUT = 0.1
+
+    def __init__(self, port, ip='0.0.0.0', batched=False, decoder=None):
+        Sensor.__init__(self, decoder if decoder is not None else DIPPIDDecoder())
         self._ip = ip
         self._port = port
+        self._batched = batched
         self._connect()
 
     def _connect(self):
@@ -122,96 +521,394 @@ class SensorUDP(Sensor):
 
     def _receive(self):
         self._receiving = True
+        if self._batched:
+            self._receive_batched()
+            return
+
         while self._receiving:
             data, addr = self._sock.recvfrom(1024)
-            try:
-                data_decoded = data.decode()
-            except UnicodeDecodeError:
+            if instrumentation.enabled:
+                instrumentation.mark('receive')
+                instrumentation.count('packets')
+            self._update(data)
+
+    # waits until the socket is readable, then drains every pending datagram
+    # into one reusable buffer and applies the merged result once
+    def _receive_batched(self):
+        import select
+
+        self._sock.setblocking(False)
+        buffer = bytearray(SensorUDP.MAX_DATAGRAM_SIZE)
+        view = memoryview(buffer)
+        while self._receiving:
+            readable, _, _ = select.select([self._sock], [], [], SensorUDP.SELECT_TIMEOUT)
+            if not readable:
                 continue
-            self._update(data_decoded)
+
+            merged = {}
+            for _ in range(SensorUDP.MAX_BATCH_SIZE):
+                try:
+                    size = self._sock.recv_into(buffer)
+                except (BlockingIOError, InterruptedError):
+                    break
+                except OSError:
+                    # socket was closed
+                    return
+                if instrumentation.enabled:
+                    instrumentation.mark('receive')
+                    instrumentation.count('packets')
+                data_json = self._decode(bytes(view[:size]))
+                if data_json is not None:
+                    self._store_samples(data_json)
+                    merged.update(data_json)
+
+            if merged:
+                self._apply(merged)
 
 # sensor connected via serial connection (USB)
 # initialized with a path to a TTY (e.g. /dev/ttyUSB0)
 # default baudrate is 115200
+# one long-lived thread reads all available bytes at once and splits them into lines (one message per line);
+# if the port fails (e.g. the device was unplugged) it is closed and reopened by the same thread,
+# waiting RECONNECT_DELAY seconds after the first failed attempt and twice as long after every further one
 # requires pyserial
 class SensorSerial(Sensor):
-    def __init__(self, tty, baudrate=115200):
-        Sensor.__init__(self)
+    # seconds a read waits for data before checking _receiving again
+    READ_TIMEOUT = 0.1
+    RECONNECT_DELAY = 0.1
+    RECONNECT_MAX_DELAY = 5.0
+    # a line without a newline is dropped once it gets longer (e.g. noise on a wrong baudrate)
+    MAX_LINE_LENGTH = 4096
+
+    def __init__(self, tty, baudrate=115200, decoder=None):
+        Sensor.__init__(self, decoder if decoder is not None else DIPPIDDecoder())
         self._tty = tty
         self._baudrate = baudrate
+        self._serial = None
+        # number of times the port was reopened after it failed
+        self.reconnects = 0
+        # interrupts the wait between two reconnect attempts on disconnect()
+        self._stop = Event()
         self._connect()
 
     def _connect(self):
-        import serial
-
-        self._serial = serial.Serial(self._tty)
-        self._serial.baudrate = self._baudrate
+        # the first attempt raises, so a wrong path or baudrate is reported to the caller
+        self._serial = self._open()
+        self._receiving = True
         self._connection_thread = Thread(target=self._receive)
         self._connection_thread.start()
 
+    def _open(self):
+        import serial
+
+        return serial.Serial(self._tty, self._baudrate, timeout=SensorSerial.READ_TIMEOUT)
+
+    def _close(self):
+        if self._serial is not None:
+            try:
+                self._serial.close()
+            except OSError:
+                pass
+            self._serial = None
+
+    def disconnect(self):
+        self._receiving = False
+        self._stop.set()
+        Sensor.disconnect(self)
+        self._close()
+
     def _receive(self):
-        self._receiving = True
-        try:
-            while self._receiving:
-                data = self._serial.readline()
+        delay = SensorSerial.RECONNECT_DELAY
+        while self._receiving:
+            if self._serial is None:
                 try:
-                    data_decoded = data.decode()
-                except UnicodeDecodeError:
+                    self._serial = self._open()
+                except OSError:
+                    # serial.SerialException is an OSError; the device is not back yet
+                    self._stop.wait(delay)
+                    delay = min(delay * 2, SensorSerial.RECONNECT_MAX_DELAY)
                     continue
-                self._update(data)
-        except:
-            # connection lost, try again
-            self._connect()
+                self.reconnects += 1
+                delay = SensorSerial.RECONNECT_DELAY
+
+            try:
+                self._read_lines()
+            except OSError:
+                # connection lost, reopen the port in the next iteration
+                self._close()
+
+    # reads until the port fails or the sensor is disconnected
+    def _read_lines(self):
+        buffer = bytearray()
+        while self._receiving:
+            # blocks for at most READ_TIMEOUT until one byte arrived, then takes everything that is waiting
+            data = self._serial.read(self._serial.in_waiting or 1)
+            if not data:
+                continue
+            buffer += data
+
+            end = buffer.rfind(b'\n')
+            if end < 0:
+                if len(buffer) > SensorSerial.MAX_LINE_LENGTH:
+                    buffer.clear()
+                continue
+
+            lines = bytes(buffer[:end]).split(b'\n')
+            del buffer[:end + 1]
+            if instrumentation.enabled:
+                instrumentation.mark('receive')
+            for line in lines:
+                line = line.strip()
+                if line:
+                    if instrumentation.enabled:
+                        instrumentation.count('packets')
+                    try:
+                        self._update(line)
+                    except Exception:
+                        # a failing decoder or callback must not end the thread, only a failing port reopens it
+                        traceback.print_exc()
 
 # uses a Nintendo Wiimote as a sensor (connected via Bluetooth)
 # initialized with a Bluetooth address
+# the receive thread reads the state of the wiimote once per report: woken by the report callbacks
+# of wiimote.py where they are available, otherwise polling with POLL_RATE (every read counts as a report)
+# every report becomes one message with the accelerometer ({'x', 'y', 'z'} like the other sensors)
+# and the buttons whose state changed since the last report ('button_a', 'button_home', ...: 0 or 1),
+# the first message contains all buttons
 # requires wiimote.py (https://github.com/RaphaelWimmer/wiimote.py)
 # and pybluez
 class SensorWiimote(Sensor):
+    # reads per second without callbacks: twice the report rate of the wiimote (about 100 per second),
+    # so polling doesn't miss reports
+    POLL_RATE = 200
+    # seconds the thread waits for a report callback before checking _receiving again
+    REPORT_TIMEOUT = 0.1
+
     def __init__(self, btaddr):
         Sensor.__init__(self)
         self._btaddr = btaddr
+        # set by the report callbacks and by disconnect()
+        self._report = Event()
+        self._report_callbacks = []
         self._connect()
 
     def _connect(self):
         import wiimote
 
         self._wiimote = wiimote.connect(self._btaddr)
+        for device in (self._wiimote.accelerometer, self._wiimote.buttons):
+            if hasattr(device, 'register_callback'):
+                # the arguments differ between the devices, only the notification is needed
+                callback = lambda *args: self._report.set()
+                device.register_callback(callback)
+                self._report_callbacks.append((device, callback))
+        self._receiving = True
+        self._connection_thread = Thread(target=self._receive)
+        self._connection_thread.start()
+
+    def disconnect(self):
+        self._receiving = False
+        self._report.set()
+        Sensor.disconnect(self)
+        for device, callback in self._report_callbacks:
+            device.unregister_callback(callback)
+        self._report_callbacks = []
+
+    def _receive(self):
+        buttons = list(self._wiimote.buttons.BUTTONS.keys())
+        keys = ['button_' + button.lower() for button in buttons]
+        # one bit per button, in the order of `buttons`; every button counts as changed in the first report
+        previous = None
+        all_buttons = (1 << len(buttons)) - 1
+        interval = 1 / SensorWiimote.POLL_RATE
+        next_poll = monotonic()
+        while self._receiving:
+            if self._report_callbacks:
+                if not self._report.wait(SensorWiimote.REPORT_TIMEOUT):
+                    continue
+                self._report.clear()
+            else:
+                next_poll += interval
+                delay = next_poll - monotonic()
+                if delay > 0:
+                    self._report.wait(delay)
+                else:
+                    # fell behind, don't try to catch up
+                    next_poll = monotonic()
+            if not self._receiving:
+                break
+
+            accelerometer = self._wiimote.accelerometer
+            data_json = {'accelerometer': {'x': accelerometer[0], 'y': accelerometer[1], 'z': accelerometer[2]}}
+
+            state = 0
+            for bit, button in enumerate(buttons):
+                if self._wiimote.buttons[button]:
+                    state |= 1 << bit
+            changed = all_buttons if previous is None else state ^ previous
+            if changed:
+                for bit, key in enumerate(keys):
+                    if changed >> bit & 1:
+                        data_json[key] = state >> bit & 1
+                previous = state
+
+            self._store_samples(data_json)
+            self._apply(data_json)
+
+# sensor fed by a SensorHub instead of its own connection
+# behaves like every other sensor (capabilities, values, callbacks, history)
+class HubSensor(Sensor):
+    def __init__(self, hub, device, decoder=None):
+        Sensor.__init__(self, decoder)
+        self._hub = hub
+        self._device = device
+        self._connection_thread = None
+        self._receiving = True
+        self.last_seen = monotonic()
+
+    # sender address (ip, port) or device id this sensor belongs to
+    def get_device(self):
+        return self._device
+
+    def disconnect(self):
+        self._hub._remove_sensor(self._device)
+        Sensor.disconnect(self)
+
+# receives the data of many DIPPID devices on a single UDP port
+# every device gets its own HubSensor, created lazily when its first packet arrives
+# devices are told apart by sender address, or by a field in each message if device_id_field is set
+# (the field is removed from the data before it reaches the sensor)
+# sensors that did not send anything for idle_timeout seconds are evicted (None keeps them forever)
+# requires the socket and select modules
+class SensorHub():
+    # class variable that stores all instances of SensorHub
+    instances = []
+
+    MAX_DATAGRAM_SIZE = 1024
+    # seconds the loop waits for data before checking for idle devices
+    SELECT_TIMEOUT = 0.5
+
+    def __init__(self, port, ip='0.0.0.0', device_id_field=None, idle_timeout=10.0, decoder=None):
+        self._ip = ip
+        self._port = port
+        self._device_id_field = device_id_field
+        self._idle_timeout = idle_timeout
+        self._decoder = decoder if decoder is not None else DIPPIDDecoder()
+        # device -> HubSensor
+        self._sensors = {}
+        self._device_callbacks = []
+        self._eviction_callbacks = []
+        self._first_device = Event()
+        self._receiving = False
+        SensorHub.instances.append(self)
+        self._connect()
+
+    def _connect(self):
+        import socket
+
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((self._ip, self._port))
         self._connection_thread = Thread(target=self._receive)
         self._connection_thread.start()
 
+    def disconnect(self):
+        self._receiving = False
+        SensorHub.instances.remove(self)
+        if self._connection_thread:
+            self._connection_thread.join()
+        for sensor in self.get_sensors():
+            sensor.disconnect()
+        self._sock.close()
+
     def _receive(self):
+        import select
+
         self._receiving = True
-        buttons = self._wiimote.buttons.BUTTONS.keys()
+        last_check = monotonic()
         while self._receiving:
-            x = self._wiimote.accelerometer[0]
-            y = self._wiimote.accelerometer[1]
-            z = self._wiimote.accelerometer[2]
-            data_string = f'{{"x":{x},"y":{y},"z":{z}}}'
-            self._update('accelerometer', data_string)
-
-            for button in buttons:
-                state = int(self._wiimote.buttons[button])
-                self._update(f'button_' + button.lower(), state)
-            sleep(0.001)
-
-    def _update(self, key, value):
-        self._add_capability(key)
-        
-        # do not notify callbacks on initialization
-        if self._data[key] == []:
-            self._data[key] = value
+            readable, _, _ = select.select([self._sock], [], [], SensorHub.SELECT_TIMEOUT)
+            now = monotonic()
+            if readable:
+                data, addr = self._sock.recvfrom(SensorHub.MAX_DATAGRAM_SIZE)
+                if instrumentation.enabled:
+                    instrumentation.mark('receive')
+                    instrumentation.count('packets')
+                self._route(data, addr, now)
+
+            if self._idle_timeout is not None and now - last_check >= SensorHub.SELECT_TIMEOUT:
+                self._evict_idle(now)
+                last_check = now
+
+    def _route(self, data, addr, now):
+        if self._device_id_field is None:
+            self._get_or_create(addr, now)._update(data)
+            return
+
+        data_json = self._decoder.decode(data)
+        if data_json is None:
             return
+        device = data_json.pop(self._device_id_field, addr)
+        sensor = self._get_or_create(device, now)
+        sensor._store_samples(data_json)
+        sensor._apply(data_json)
+
+    def _get_or_create(self, device, now):
+        sensor = self._sensors.get(device)
+        if sensor is None:
+            sensor = self._sensors[device] = HubSensor(self, device, self._decoder)
+            for func in self._device_callbacks:
+                func(sensor)
+            self._first_device.set()
+        sensor.last_seen = now
+        return sensor
+
+    def _evict_idle(self, now):
+        for sensor in self.get_sensors():
+            if now - sensor.last_seen > self._idle_timeout:
+                sensor.disconnect()
+                for func in self._eviction_callbacks:
+                    func(sensor)
+
+    def _remove_sensor(self, device):
+        self._sensors.pop(device, None)
+
+    # returns the devices (addresses or ids) that are currently known
+    def get_devices(self):
+        return list(self._sensors.keys())
+
+    # returns the HubSensor of a device or None
+    def get_sensor(self, device):
+        return self._sensors.get(device)
+
+    # returns the sensors of all known devices, oldest first
+    def get_sensors(self):
+        return list(self._sensors.values())
+
+    # blocks until at least one device sent data, returns the oldest known sensor (or None on timeout)
+    def wait_for_sensor(self, timeout=None):
+        if not self._first_device.wait(timeout):
+            return None
+        sensors = self.get_sensors()
+        return sensors[0] if sensors else None
+
+    # register a function that is called with the new HubSensor whenever a device shows up
+    # runs in the receive thread
+    def register_device_callback(self, func):
+        self._device_callbacks.append(func)
 
-        # notify callbacks only if data has changed
-        if self._data[key] != value:
-            self._data[key] = value
-            self._notify_callbacks(key)
+    # register a function that is called with the HubSensor of a device that was evicted
+    def register_eviction_callback(self, func):
+        self._eviction_callbacks.append(func)
 
 # close the program softly when ctrl+c is pressed
 def handle_interrupt_signal(signal, frame):
-    for sensor in Sensor.instances:
+    for hub in list(SensorHub.instances):
+        hub.disconnect()
+    for sensor in list(Sensor.instances):
         sensor.disconnect()
     sys.exit(0)
 
-signal.signal(signal.SIGINT, handle_interrupt_signal)
+# installs handle_interrupt_signal for ctrl+c; programs call this at startup, importing DIPPID has no side effects
+# (only possible in the main thread)
+def install_interrupt_handler():
+    signal.signal(signal.SIGINT, handle_interrupt_signal)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+asyncio based DIPPID sensors: many devices share one event loop instead of running one thread per sensor.
+
+    async def main():
+        sensor = await AsyncSensorUDP.create(5700)
+        sensor.register_callback('button_1', on_button)        # plain function
+        sensor.register_callback('accelerometer', on_accel)    # or `async def`
+        async for key, value in sensor.updates():
+            ...
+"""
+
+import asyncio
+from DIPPID import Sensor, DIPPIDDecoder
+
+# pyserial-asyncio is imported only if AsyncSensorSerial is used
+# import serial_asyncio
+
+
+class AsyncSensor(Sensor):
+    """
+    Sensor whose data arrives on an asyncio event loop.
+    Callbacks may be plain functions or coroutine functions (scheduled as tasks on the loop).
+    Every changed value is also published to the streams returned by updates().
+    """
+
+    def __init__(self, decoder=None):
+        Sensor.__init__(self, decoder if decoder is not None else DIPPIDDecoder())
+        self._connection_thread = None
+        self._loop = None
+        # one queue per active updates() stream
+        self._streams = []
+        # keep references to running callback tasks so they are not garbage collected
+        self._tasks = set()
+
+    async def connect(self):
+        self._loop = asyncio.get_running_loop()
+        self._receiving = True
+        await self._open()
+
+    @classmethod
+    async def create(cls, *args, **kwargs):
+        sensor = cls(*args, **kwargs)
+        await sensor.connect()
+        return sensor
+
+    async def _open(self):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+    def disconnect(self):
+        self._receiving = False
+        self._close()
+        if self in Sensor.instances:
+            Sensor.instances.remove(self)
+        for task in list(self._tasks):
+            task.cancel()
+        self._stop_delivery()
+        for queue in self._streams:
+            # wake up all streams so `async for` loops end
+            self._put(queue, None)
+
+    def _notify_callbacks(self, key):
+        value = self._data[key]
+        for queue in self._streams:
+            self._put(queue, (key, value))
+
+        if self._dispatcher:
+            self._dispatcher.submit(key, value, self._callbacks[key])
+            return
+
+        for func in self._callbacks[key]:
+            result = func(value)
+            if asyncio.iscoroutine(result):
+                task = self._loop.create_task(result)
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    def _put(queue, item):
+        if queue.full():
+            # slow consumer: drop the oldest update instead of blocking the receiver
+            queue.get_nowait()
+        queue.put_nowait(item)
+
+    async def updates(self, keys=None, max_queue_size=256):
+        """
+        Yields (capability, value) for every changed value, optionally only for the given capabilities.
+        Ends when the sensor is disconnected.
+        """
+        queue = asyncio.Queue(max_queue_size)
+        self._streams.append(queue)
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                if keys is None or item[0] in keys:
+                    yield item
+        finally:
+            self._streams.remove(queue)
+
+
+class _DIPPIDDatagramProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, sensor):
+        self._sensor = sensor
+
+    def datagram_received(self, data, addr):
+        self._sensor._update(data)
+
+
+class AsyncSensorUDP(AsyncSensor):
+    """
+    Sensor connected via WiFi/UDP, received by an asyncio DatagramProtocol.
+    Listens to all IPs by default.
+    """
+
+    def __init__(self, port, ip='0.0.0.0', decoder=None):
+        AsyncSensor.__init__(self, decoder)
+        self._ip = ip
+        self._port = port
+        self._transport = None
+
+    async def _open(self):
+        self._transport, _ = await self._loop.create_datagram_endpoint(
+            lambda: _DIPPIDDatagramProtocol(self), local_addr=(self._ip, self._port))
+
+    def _close(self):
+        if self._transport:
+            self._transport.close()
+            self._transport = None
+
+
+class AsyncSensorSerial(AsyncSensor):
+    """
+    Sensor connected via serial connection (USB), read line by line by an asyncio task.
+    Reconnects with increasing delay when the connection is lost.
+    Requires pyserial-asyncio.
+    """
+
+    RECONNECT_DELAY_MIN = 0.1
+    RECONNECT_DELAY_MAX = 5.0
+
+    def __init__(self, tty, baudrate=115200, decoder=None):
+        AsyncSensor.__init__(self, decoder)
+        self._tty = tty
+        self._baudrate = baudrate
+        self._reader_task = None
+
+    async def _open(self):
+        # imported here, so a missing pyserial-asyncio is raised from connect() instead of inside the task
+        import serial_asyncio
+
+        self._reader_task = self._loop.create_task(self._receive(serial_asyncio))
+
+    def _close(self):
+        if self._reader_task:
+            self._reader_task.cancel()
+            self._reader_task = None
+
+    async def _receive(self, serial_asyncio):
+        delay = AsyncSensorSerial.RECONNECT_DELAY_MIN
+        while self._receiving:
+            try:
+                reader, writer = await serial_asyncio.open_serial_connection(url=self._tty, baudrate=self._baudrate)
+            except OSError:
+                pass
+            else:
+                try:
+                    while self._receiving:
+                        line = await reader.readline()
+                        if not line:
+                            break
+                        # the device works, the next reconnect starts with the shortest delay again
+                        delay = AsyncSensorSerial.RECONNECT_DELAY_MIN
+                        self._update(line.strip())
+                except OSError:
+                    # connection lost, try again
+                    pass
+                finally:
+                    writer.close()
+
+            # also after EOF: an unplugged port may open fine and end at once
+            if self._receiving:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, AsyncSensorSerial.RECONNECT_DELAY_MAX)
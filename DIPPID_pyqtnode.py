@@ -6,24 +6,49 @@
 The whole file was taken from https://github.com/PDA-UR/DIPPID-py. Slightly adjusted to set the port dynamically.
 """
 
-from pyqtgraph.flowchart import Flowchart, Node
+from pyqtgraph.flowchart import Node
+from pyqtgraph.flowchart.Terminal import Terminal
 from pyqtgraph.flowchart.library.common import CtrlNode
 import pyqtgraph.flowchart.library as fclib
 from pyqtgraph.Qt import QtGui, QtCore
 import pyqtgraph as pg
 import numpy as np
+from collections import deque
 from DIPPID import SensorUDP
+from ring_buffer import RingBuffer
+import filters
 import sys
+import instrumentation
+
+
+class _SnapshotTerminal(Terminal):
+    """
+    Output terminal of a BufferNode: the value is the node's snapshot(), read when a connected node asks for it,
+    instead of the value process() returned.
+    """
+
+    def setValue(self, val, process=True):
+        Terminal.setValue(self, None, process)
+
+    def value(self, term=None):
+        return self.node().snapshot()
 
 
 class BufferNode(Node):
     """
-    Buffers the last n samples provided on input and provides them as a list of
+    Buffers the last n samples provided on input and provides them as an array of
     length n on output.
-    A spinbox widget allows for setting the size of the buffer.
+    Input can be a single sample or an array of samples.
+    A spinbox widget allows for setting the size of the buffer at runtime.
     Default size is 32 samples.
+    The samples are kept in a preallocated ring buffer, so adding a sample does not
+    copy the buffer. The array is only copied out of it when a connected node reads
+    the output (see snapshot()); process() itself returns a view that is only valid
+    until the next call.
     """
     nodeName = "Buffer"
+    # largest buffer size that can be set
+    MAX_SIZE = 1000000
 
     def __init__(self, name):
         terminals = {
@@ -31,16 +56,157 @@ class BufferNode(Node):
             'dataOut': dict(io='out'),
         }
 
-        self.buffer_size = 32
-        self._buffer = np.array([])
+        self._buffer = RingBuffer(32)
+        # the array handed out by snapshot() and the number of samples written when it was copied
+        self._snapshot = None
+        self._snapshot_written = 0
+        self._init_ui()
         Node.__init__(self, name, terminals=terminals)
 
+    def addTerminal(self, name, **opts):
+        term = Node.addTerminal(self, name, **opts)
+        if term.isOutput():
+            term.__class__ = _SnapshotTerminal
+        return term
+
+    def _init_ui(self):
+        self.ui = QtGui.QWidget()
+        self.layout = QtGui.QGridLayout()
+
+        label = QtGui.QLabel("Buffer size:")
+        self.layout.addWidget(label)
+
+        self.buffer_size_input = QtGui.QSpinBox()
+        self.buffer_size_input.setMinimum(1)
+        self.buffer_size_input.setMaximum(BufferNode.MAX_SIZE)
+        self.buffer_size_input.setValue(self.buffer_size)
+        self.buffer_size_input.valueChanged.connect(self.set_buffer_size)
+        self.layout.addWidget(self.buffer_size_input)
+        self.ui.setLayout(self.layout)
+
+    def ctrlWidget(self):
+        return self.ui
+
+    @property
+    def buffer_size(self):
+        return self._buffer.capacity
+
+    @buffer_size.setter
+    def buffer_size(self, size):
+        self.set_buffer_size(size)
+
+    def set_buffer_size(self, size):
+        # keeps the newest samples that still fit into the new size
+        self._buffer.resize(int(size))
+        self._snapshot = None
+        if self.buffer_size_input.value() != size:
+            self.buffer_size_input.setValue(size)
+
+    # copy of the newest samples that readers may keep (e.g. a PlotWidget's PlotDataItem does);
+    # copied at most once per change of the buffer, however many nodes read it
+    def snapshot(self):
+        if self._snapshot is None or self._snapshot_written != self._buffer.written:
+            self._snapshot = self._buffer.latest().copy()
+            self._snapshot_written = self._buffer.written
+        return self._snapshot
+
+    @instrumentation.timed('process.BufferNode')
     def process(self, **kwds):
-        self._buffer = np.append(self._buffer, kwds['dataIn'])[-self.buffer_size:]
+        if kwds['dataIn'] is not None:
+            self._buffer.extend(kwds['dataIn'])
 
-        return {'dataOut': self._buffer}
+        # connected nodes get snapshot() through the output terminal
+        return {'dataOut': self._buffer.latest()}
 
-fclib.registerNodeType(BufferNode, [('Data',)])
+
+class FilterNode(CtrlNode):
+    """
+    Base class of the stream filter nodes: filters the samples provided on input with a stateful filter from the
+    filters module and provides the filtered samples on output.
+    Input can be a single sample or an array of samples; every call continues where the last one stopped, so the
+    node belongs between a node that outputs new samples (e.g. DIPPIDNode) and a BufferNode.
+    Changing a control starts a new filter.
+    """
+
+    def __init__(self, name):
+        terminals = {
+            'dataIn': dict(io='in'),
+            'dataOut': dict(io='out'),
+        }
+        CtrlNode.__init__(self, name, terminals=terminals)
+        self.filter = self.create_filter()
+
+    def create_filter(self):
+        raise NotImplementedError
+
+    def changed(self):
+        self.filter = self.create_filter()
+        CtrlNode.changed(self)
+
+    @instrumentation.timed('process.FilterNode')
+    def process(self, **kwds):
+        if kwds['dataIn'] is None:
+            return {'dataOut': None}
+        return {'dataOut': self.filter.process(kwds['dataIn'])}
+
+
+class MovingAverageNode(FilterNode):
+    """
+    Moving average over the last n samples.
+    """
+    nodeName = "MovingAverage"
+    uiTemplate = [
+        ('window', 'intSpin', {'value': 5, 'min': 1, 'max': 10000}),
+    ]
+
+    def create_filter(self):
+        return filters.MovingAverage(self.ctrls['window'].value())
+
+
+class MedianNode(FilterNode):
+    """
+    Median of the last n samples.
+    """
+    nodeName = "Median"
+    uiTemplate = [
+        ('window', 'intSpin', {'value': 5, 'min': 1, 'max': 10000}),
+    ]
+
+    def create_filter(self):
+        return filters.Median(self.ctrls['window'].value())
+
+
+class LowPassNode(FilterNode):
+    """
+    Exponential (first-order IIR) low-pass; a smaller alpha smooths more.
+    """
+    nodeName = "LowPass"
+    uiTemplate = [
+        ('alpha', 'spin', {'value': 0.2, 'min': 0.001, 'max': 1.0, 'step': 0.05, 'dec': True}),
+    ]
+
+    def create_filter(self):
+        return filters.LowPass(self.ctrls['alpha'].value())
+
+
+class HighPassNode(FilterNode):
+    """
+    First-order high-pass: the input minus its exponential low-pass with the same alpha.
+    """
+    nodeName = "HighPass"
+    uiTemplate = [
+        ('alpha', 'spin', {'value': 0.2, 'min': 0.001, 'max': 1.0, 'step': 0.05, 'dec': True}),
+    ]
+
+    def create_filter(self):
+        return filters.HighPass(self.ctrls['alpha'].value())
+
+
+class _SampleBridge(QtCore.QObject):
+    """
+    Signals the GUI thread that the sensor thread queued new samples.
+    """
+    samples_pending = QtCore.Signal()
 
 
 class DIPPIDNode(Node):
@@ -50,12 +216,16 @@ class DIPPIDNode(Node):
     Supported sensors: accelerometer (3 axis)
     Text input box allows for setting a Bluetooth MAC address or Port.
     Pressing the "connect" button tries connecting to the DIPPID device.
-    Update rate can be changed via a spinbox widget. Setting it to "0"
-    activates callbacks every time a new sensor value arrives (which is
-    quite often -> performance hit)
+    Update rate can be changed via a spinbox widget. A rate > 0 polls the
+    latest value with that rate. Setting it to "0" outputs every sample:
+    samples are queued by the sensor thread and handed to the GUI thread
+    through a Qt signal, the node updates at most once per display frame
+    with arrays of all samples since the last frame.
     """
 
     nodeName = "DIPPID"
+    # minimum time between two updates when every sample is output (ms)
+    FRAME_INTERVAL = 16
 
     def __init__(self, name):
         terminals = {
@@ -65,13 +235,26 @@ class DIPPIDNode(Node):
         }
 
         self.dippid = None
-        self._acc_vals = []
+        # one array per axis
+        self._acc_vals = [np.array([]), np.array([]), np.array([])]
 
         self._init_ui()
 
         self.update_timer = QtCore.QTimer()
         self.update_timer.timeout.connect(self.update_all_sensors)
 
+        # samples queued by the sensor thread, drained once per frame in the GUI thread; if the flowchart doesn't
+        # process them, the oldest are dropped (more than a buffer can hold would never reach one anyway)
+        self._pending_samples = deque(maxlen=BufferNode.MAX_SIZE)
+        self._flush_scheduled = False
+        self._last_flush = QtCore.QElapsedTimer()
+        self._last_flush.start()
+        self._bridge = _SampleBridge()
+        self._bridge.samples_pending.connect(self._schedule_flush)
+        self.frame_timer = QtCore.QTimer()
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.timeout.connect(self._flush_samples)
+
         Node.__init__(self, name, terminals=terminals)
 
     def _init_ui(self):
@@ -86,7 +269,7 @@ class DIPPIDNode(Node):
         self.text.setText(self.addr)
         self.layout.addWidget(self.text)
 
-        label2 = QtGui.QLabel("Update rate (Hz)")
+        label2 = QtGui.QLabel("Update rate (Hz, 0 = every sample)")
         self.layout.addWidget(label2)
 
         self.update_rate_input = QtGui.QSpinBox()
@@ -110,20 +293,54 @@ class DIPPIDNode(Node):
             return
 
         v = self.dippid.get_value('accelerometer')
-        self._acc_vals = [v['x'], v['y'], v['z']]
+        self._acc_vals = [np.array([v['x']]), np.array([v['y']]), np.array([v['z']])]
 
         self.update()
 
-    def update_accel(self, acc_vals):
-        if not self.dippid.has_capability('accelerometer'):
+    # runs in the sensor thread for every received message
+    def _queue_samples(self, timestamp, data):
+        acc_vals = data.get('accelerometer')
+        if not isinstance(acc_vals, dict):
             return
+        sample = (acc_vals.get('x'), acc_vals.get('y'), acc_vals.get('z'))
+        # an exception here would end the receive loop of the sensor, so malformed messages are skipped
+        if not all(isinstance(value, (int, float)) for value in sample):
+            return
+
+        self._pending_samples.append(sample)
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self._bridge.samples_pending.emit()
 
-        self._acc_vals = [acc_vals['x'], acc_vals['y'], acc_vals['z']]
+    def _schedule_flush(self):
+        if self.frame_timer.isActive():
+            return
+        # wait for the rest of the current frame, so there is at most one update per frame
+        remaining = DIPPIDNode.FRAME_INTERVAL - self._last_flush.elapsed()
+        self.frame_timer.start(max(0, int(remaining)))
+
+    def _flush_samples(self):
+        # reset the flag first: samples queued from now on schedule the next flush
+        self._flush_scheduled = False
+        count = len(self._pending_samples)
+        if count == 0:
+            return
+
+        samples = np.array([self._pending_samples.popleft() for _ in range(count)], dtype=float)
+        self._acc_vals = [samples[:, 0], samples[:, 1], samples[:, 2]]
+        self._last_flush.restart()
         self.update()
 
     def ctrlWidget(self):
         return self.ui
 
+    def set_sensor(self, sensor):
+        # use an already connected sensor, e.g. a device picked from a DIPPID.SensorHub
+        self.dippid = sensor
+        self.connect_button.setText("connected")
+        self.connect_button.setEnabled(False)
+        self.set_update_rate(self.update_rate_input.value())
+
     def connect_device(self):
         if self.connect_button.text() != "connect" and self.connect_button.text() != "try again":
             return
@@ -143,19 +360,42 @@ class DIPPIDNode(Node):
         if self.dippid is None:
             return
 
-        self.dippid.unregister_callback('accelerometer', self.update_accel)
+        self.dippid.remove_sample_listener(self._queue_samples)
 
         if rate == 0:
             self.update_timer.stop()
+            self.dippid.add_sample_listener(self._queue_samples)
         else:
-            self.update_timer.start(1000 / rate)
+            self.frame_timer.stop()
+            self._pending_samples.clear()
+            # the stopped flush never runs, so it must not block the next one after switching back to 0
+            self._flush_scheduled = False
+            self.update_timer.start(int(1000 / rate))
 
+    @instrumentation.timed('process.DIPPIDNode')
     def process(self, **kwdargs):
-        return {'accelX': np.array([self._acc_vals[0]]), 'accelY': np.array([self._acc_vals[1]]), 'accelZ': np.array([self._acc_vals[2]])}
+        if instrumentation.enabled:
+            instrumentation.since('receive', 'process')
+        return {'accelX': self._acc_vals[0], 'accelY': self._acc_vals[1], 'accelZ': self._acc_vals[2]}
+
+
+# registers the nodes of this module in pyqtgraph's node library, so a Flowchart can create them by name
+# (safe to call more than once)
+def register_nodes():
+    fclib.registerNodeType(BufferNode, [('Data',)], override=True)
+    fclib.registerNodeType(MovingAverageNode, [('Filters',)], override=True)
+    fclib.registerNodeType(MedianNode, [('Filters',)], override=True)
+    fclib.registerNodeType(LowPassNode, [('Filters',)], override=True)
+    fclib.registerNodeType(HighPassNode, [('Filters',)], override=True)
+    fclib.registerNodeType(DIPPIDNode, [('Sensor',)], override=True)
 
-fclib.registerNodeType(DIPPIDNode, [('Sensor',)])
 
 if __name__ == '__main__':
+    from pyqtgraph.flowchart import Flowchart
+    import DIPPID
+
+    DIPPID.install_interrupt_handler()
+    register_nodes()
     app = QtGui.QApplication([])
     win = QtGui.QMainWindow()
     win.setWindowTitle('DIPPIDNode demo')
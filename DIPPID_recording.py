@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Record-and-replay of DIPPID sensor streams.
+
+Logs are append-only binary files: a small header followed by fixed-width 40 byte records, so a log can be
+memory-mapped and read as one NumPy structured array (see DIPPIDLog.as_array()).
+Each record holds a monotonic timestamp, a capability id, a kind and up to three float64 values:
+  - KIND_DECLARE records introduce a capability; the value bytes hold its utf-8 name
+  - KIND_INT / KIND_FLOAT records hold one number (buttons, other scalars)
+  - KIND_VECTOR records hold the x, y and z value of accelerometer-like capabilities
+Values of any other shape (strings, nested data) are not recorded.
+
+Record the phone into a file:    python DIPPID_recording.py record session.dlog --port 5700
+Show what a file contains:       python DIPPID_recording.py info session.dlog
+"""
+
+import mmap
+import os
+import struct
+import sys
+import time
+from argparse import ArgumentParser
+from threading import Thread, Event, Lock
+from DIPPID import Sensor, SensorUDP, install_interrupt_handler
+
+MAGIC = b'DIPPIDLG'
+VERSION = 1
+# magic, version, record size, wall-clock time the recording started
+HEADER = struct.Struct('<8sIId')
+# timestamp, capability id, kind, number of values, padding, values
+RECORD = struct.Struct('<dHBB4x3d')
+DECLARE_RECORD = struct.Struct('<dHBB4x24s')
+
+KIND_DECLARE = 0
+KIND_INT = 1
+KIND_FLOAT = 2
+KIND_VECTOR = 3
+
+VECTOR_FIELDS = ('x', 'y', 'z')
+MAX_NAME_LENGTH = 24
+
+
+class SensorRecorder:
+    """
+    Writes every message a sensor receives into a DIPPID log.
+    Hooks into Sensor._update through a sample listener, so unchanged values are recorded as well.
+    """
+
+    def __init__(self, path, flush_interval=1.0):
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, time.time()))
+        self._flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+        # capability name -> id
+        self._ids = {}
+        self._lock = Lock()
+        self._sensors = []
+        self.records_written = 0
+
+    def attach(self, sensor: Sensor):
+        sensor.add_sample_listener(self.record)
+        self._sensors.append(sensor)
+
+    def detach(self, sensor: Sensor):
+        sensor.remove_sample_listener(self.record)
+        self._sensors.remove(sensor)
+
+    def record(self, timestamp, data_json):
+        with self._lock:
+            if self._file.closed:
+                return
+            for key, value in data_json.items():
+                packed = self._pack(timestamp, key, value)
+                if packed is not None:
+                    self._file.write(packed)
+                    self.records_written += 1
+
+            if timestamp - self._last_flush >= self._flush_interval:
+                self._file.flush()
+                self._last_flush = timestamp
+
+    def _pack(self, timestamp, key, value):
+        if isinstance(value, dict):
+            try:
+                values = [float(value[field]) for field in VECTOR_FIELDS]
+            except (KeyError, TypeError, ValueError):
+                return None
+            kind, count = KIND_VECTOR, 3
+        elif isinstance(value, int):
+            values, kind, count = [float(value), 0.0, 0.0], KIND_INT, 1
+        elif isinstance(value, float):
+            values, kind, count = [value, 0.0, 0.0], KIND_FLOAT, 1
+        else:
+            return None
+
+        capability = self._ids.get(key)
+        if capability is None:
+            name = key.encode()
+            if len(name) > MAX_NAME_LENGTH:
+                return None
+            capability = self._ids[key] = len(self._ids)
+            self._file.write(DECLARE_RECORD.pack(timestamp, capability, KIND_DECLARE, 0, name))
+        return RECORD.pack(timestamp, capability, kind, count, *values)
+
+    def close(self):
+        for sensor in list(self._sensors):
+            self.detach(sensor)
+        with self._lock:
+            self._file.close()
+
+
+class DIPPIDLog:
+    """
+    Read access to a DIPPID log through a memory map.
+    A record that was only partially written (e.g. the recorder crashed) is ignored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            if size < HEADER.size:
+                raise ValueError(f"{path} is not a DIPPID log (file too short)")
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, record_size, self.start_time = HEADER.unpack_from(self._map)
+        if magic != MAGIC or record_size != RECORD.size:
+            raise ValueError(f"{path} is not a DIPPID log")
+        if version != VERSION:
+            raise ValueError(f"{path} has unsupported version {version}")
+
+        self.record_count = (size - HEADER.size) // RECORD.size
+        # capability id -> name
+        self.capabilities = {}
+        for t, capability, kind, count, name in self._iter_raw(DECLARE_RECORD):
+            if kind == KIND_DECLARE:
+                self.capabilities[capability] = name.rstrip(b'\0').decode()
+
+    def _iter_raw(self, layout):
+        end = HEADER.size + self.record_count * RECORD.size
+        return layout.iter_unpack(memoryview(self._map)[HEADER.size:end])
+
+    def __len__(self):
+        return self.record_count
+
+    def samples(self):
+        """
+        Yields (timestamp, capability, value) for every recorded value in recording order.
+        Values have the same shape they had when received: {'x', 'y', 'z'} dicts, ints or floats.
+        """
+        for t, capability, kind, count, x, y, z in self._iter_raw(RECORD):
+            if kind == KIND_DECLARE:
+                continue
+            name = self.capabilities[capability]
+            if kind == KIND_VECTOR:
+                yield t, name, {'x': x, 'y': y, 'z': z}
+            elif kind == KIND_INT:
+                yield t, name, int(x)
+            else:
+                yield t, name, x
+
+    def messages(self):
+        """
+        Yields (timestamp, dict of values) with all values that were received in the same message.
+        """
+        current_t, current = None, {}
+        for t, name, value in self.samples():
+            if t != current_t and current:
+                yield current_t, current
+                current = {}
+            current_t = t
+            current[name] = value
+        if current:
+            yield current_t, current
+
+    def as_array(self):
+        """
+        Returns all records as a memory-mapped NumPy structured array (requires numpy).
+        Declaration records are included, filter them with array['kind'] != KIND_DECLARE.
+        """
+        import numpy as np
+
+        dtype = np.dtype([('t', '<f8'), ('capability', '<u2'), ('kind', 'u1'), ('count', 'u1'),
+                          ('padding', 'V4'), ('values', '<f8', (3,))])
+        return np.memmap(self.path, dtype=dtype, mode='r', offset=HEADER.size, shape=(self.record_count,))
+
+    def duration(self):
+        if not self.record_count:
+            return 0.0
+        first = RECORD.unpack_from(self._map, HEADER.size)[0]
+        last = RECORD.unpack_from(self._map, HEADER.size + (self.record_count - 1) * RECORD.size)[0]
+        return last - first
+
+    def close(self):
+        self._map.close()
+
+
+class SensorReplay(Sensor):
+    """
+    Plays a DIPPID log back as if the device was connected.
+    speed 1.0 replays in real time, 2.0 twice as fast, None (or 0) as fast as possible.
+    With loop=True the log starts over when it ends.
+    """
+
+    # longest single sleep, so disconnect() does not have to wait for long pauses in a recording
+    MAX_SLEEP = 0.1
+
+    def __init__(self, path, speed=1.0, loop=False):
+        Sensor.__init__(self)
+        self._log = DIPPIDLog(path)
+        self._speed = speed
+        self._loop = loop
+        self._finished = Event()
+        self._connect()
+
+    def _connect(self):
+        self._connection_thread = Thread(target=self._receive)
+        self._connection_thread.start()
+
+    def _receive(self):
+        self._receiving = True
+        while self._receiving:
+            # a log without messages would be started over without pause
+            if not self._play() or not self._loop:
+                break
+        self._finished.set()
+
+    # returns whether the log had any messages
+    def _play(self):
+        start = time.monotonic()
+        first_t = None
+        for t, data_json in self._log.messages():
+            if not self._receiving:
+                break
+            if first_t is None:
+                first_t = t
+
+            if self._speed:
+                due = start + (t - first_t) / self._speed
+                while self._receiving:
+                    delay = due - time.monotonic()
+                    if delay <= 0:
+                        break
+                    time.sleep(min(delay, SensorReplay.MAX_SLEEP))
+
+            self._store_samples(data_json)
+            self._apply(data_json)
+        return first_t is not None
+
+    # blocks until the whole log was played (never returns for looping replays unless disconnected)
+    def wait_finished(self, timeout=None):
+        return self._finished.wait(timeout)
+
+    def disconnect(self):
+        Sensor.disconnect(self)
+        self._log.close()
+
+
+def main():
+    parser = ArgumentParser(description="Record DIPPID data into a binary log or inspect a log.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="record a DIPPID device until ctrl+c is pressed")
+    record.add_argument("file")
+    record.add_argument("-p", "--port", type=int, default=5700)
+    info = commands.add_parser("info", help="print the capabilities and length of a log")
+    info.add_argument("file")
+    args = parser.parse_args()
+    install_interrupt_handler()
+
+    if args.command == "record":
+        sensor = SensorUDP(args.port)
+        recorder = SensorRecorder(args.file)
+        recorder.attach(sensor)
+        print(f"Recording port {args.port} into {args.file}, press ctrl+c to stop.")
+        try:
+            while True:
+                time.sleep(1)
+                sys.stdout.write(f"\r{recorder.records_written} records")
+                sys.stdout.flush()
+        finally:
+            recorder.close()
+    else:
+        log = DIPPIDLog(args.file)
+        print(f"{log.record_count} records, {log.duration():.1f} s, started {time.ctime(log.start_time)}")
+        print("capabilities:", ", ".join(log.capabilities.values()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Fan-out of one DIPPID sensor to several processes through shared memory.
+
+A single publisher process owns the sensor (e.g. the UDP port) and writes every received value into a shared memory
+segment; any number of processes read it with SensorShared, which behaves like every other Sensor. Values are parsed
+once in the publisher, the readers only copy numbers.
+
+Layout of the segment (all numbers little-endian 64 bit):
+  - header: magic, version, number of capability slots, window size, declared capabilities, state, message counter
+  - one slot per capability: its name and kind, a sequence counter and the latest value (timestamp, x, y, z), and a
+    window of the latest values as rows (timestamp, x, y, z)
+The publisher is the only writer. It fills a slot completely before it bumps the declared capabilities, and writes a
+row before it bumps the row counter of the slot, so readers never see half-written rows; the latest value is guarded
+by its sequence counter (odd while it is written, a reader retries if it changed while reading). Like in a RingBuffer,
+every row is stored twice, so the window is one contiguous slice and get_history() returns views into the shared
+memory without copying.
+
+Publish the phone on port 5700:   python DIPPID_shared.py --port 5700
+Then read it from any process:    sensor = SensorShared()
+"""
+
+import os
+import sys
+import time
+from argparse import ArgumentParser
+from multiprocessing import shared_memory
+from threading import Thread, Event
+import numpy as np
+from DIPPID import Sensor, SensorUDP, install_interrupt_handler
+from DIPPID_recording import KIND_INT, KIND_FLOAT, KIND_VECTOR, VECTOR_FIELDS
+
+DEFAULT_NAME = 'dippid'
+MAGIC = b'DIPPIDSH'
+VERSION = 1
+
+# header fields (uint64 after the magic)
+VERSION_FIELD, SLOTS_FIELD, WINDOW_FIELD, DECLARED_FIELD, STATE_FIELD, MESSAGES_FIELD = range(6)
+HEADER_SIZE = 128
+STATE_RUNNING = 1
+STATE_CLOSED = 2
+
+# slot fields (uint64 after the name)
+KIND_FIELD, SEQUENCE_FIELD, WRITTEN_FIELD = range(3)
+NAME_SIZE = 32
+SLOT_META_SIZE = 32
+# timestamp, x, y, z
+ROW_WIDTH = 4
+
+
+def _slot_size(window):
+    # one spare row: the row the publisher writes next is never handed out
+    return NAME_SIZE + SLOT_META_SIZE + ROW_WIDTH * 8 + 2 * (window + 1) * ROW_WIDTH * 8
+
+
+def _attach(name):
+    try:
+        # Python 3.13+: readers must not register the segment with the resource tracker
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        pass
+    memory = shared_memory.SharedMemory(name)
+    if os.name == 'posix':
+        # older versions register every attached segment with the resource tracker, which removes it when the
+        # process exits, although the publisher owns it (https://bugs.python.org/issue39959)
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(memory._name, 'shared_memory')
+    return memory
+
+
+class _Slot:
+    """
+    NumPy views of one capability slot.
+    """
+
+    def __init__(self, buffer, offset, window):
+        self.capacity = window + 1
+        self._name = np.ndarray((NAME_SIZE,), np.uint8, buffer, offset)
+        self.meta = np.ndarray((ROW_WIDTH,), '<u8', buffer, offset + NAME_SIZE)
+        self.latest = np.ndarray((ROW_WIDTH,), '<f8', buffer, offset + NAME_SIZE + SLOT_META_SIZE)
+        self.rows = np.ndarray((2 * self.capacity, ROW_WIDTH), '<f8', buffer,
+                               offset + NAME_SIZE + SLOT_META_SIZE + ROW_WIDTH * 8)
+
+    @property
+    def name(self) -> str:
+        return self._name.tobytes().rstrip(b'\0').decode()
+
+    @property
+    def kind(self) -> int:
+        return int(self.meta[KIND_FIELD])
+
+    @property
+    def written(self) -> int:
+        return int(self.meta[WRITTEN_FIELD])
+
+    @property
+    def fields(self) -> list:
+        return list(VECTOR_FIELDS) if self.kind == KIND_VECTOR else [None]
+
+    def declare(self, name: bytes, kind):
+        self._name[:] = 0
+        self._name[:len(name)] = np.frombuffer(name, np.uint8)
+        self.meta[:] = 0
+        self.meta[KIND_FIELD] = kind
+
+    def write(self, timestamp, values):
+        self.meta[SEQUENCE_FIELD] += 1
+        self.latest[0] = timestamp
+        self.latest[1:] = values
+        self.meta[SEQUENCE_FIELD] += 1
+
+        written = self.written
+        pos = written % self.capacity
+        self.rows[pos] = self.latest
+        self.rows[pos + self.capacity] = self.latest
+        self.meta[WRITTEN_FIELD] = written + 1
+
+    def read_latest(self):
+        # returns (timestamp, x, y, z) of the latest value
+        while True:
+            sequence = int(self.meta[SEQUENCE_FIELD])
+            if sequence & 1 == 0:
+                row = self.latest.tolist()
+                if int(self.meta[SEQUENCE_FIELD]) == sequence:
+                    return row
+            time.sleep(0)
+
+    def value(self, row):
+        # converts (x, y, z) into the shape the value had when it was received
+        kind = self.kind
+        if kind == KIND_VECTOR:
+            return {'x': row[0], 'y': row[1], 'z': row[2]}
+        if kind == KIND_INT:
+            return int(row[0])
+        return row[0]
+
+    def window(self, end, n):
+        # view of the n rows before row number `end`, oldest first
+        n = max(0, min(n, end, self.capacity - 1))
+        stop = end % self.capacity + self.capacity
+        return self.rows[stop - n:stop]
+
+
+def _header(buffer):
+    return np.ndarray((6,), '<u8', buffer, len(MAGIC))
+
+
+class SharedPublisher:
+    """
+    Writes every value a sensor receives into the shared memory segment `name`, with a window of the latest `window`
+    values per capability. Values are {'x', 'y', 'z'} dicts, ints and floats; anything else is not published.
+    An existing segment of the same name (e.g. left over from a crashed publisher) is replaced.
+    """
+
+    def __init__(self, name=DEFAULT_NAME, window=1000, max_capabilities=16):
+        self.name = name
+        self.window = window
+        self.max_capabilities = max_capabilities
+        size = HEADER_SIZE + max_capabilities * _slot_size(window)
+        try:
+            self._memory = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            self._replace_stale(name)
+            self._memory = shared_memory.SharedMemory(name, create=True, size=size)
+
+        buffer = self._memory.buf
+        buffer[:len(MAGIC)] = MAGIC
+        self._header = _header(buffer)
+        self._header[:] = 0
+        self._header[VERSION_FIELD] = VERSION
+        self._header[SLOTS_FIELD] = max_capabilities
+        self._header[WINDOW_FIELD] = window
+        self._header[STATE_FIELD] = STATE_RUNNING
+        self._slots = [_Slot(buffer, HEADER_SIZE + index * _slot_size(window), window)
+                       for index in range(max_capabilities)]
+        # capability name -> slot, None for values that can't be published
+        self._capabilities = {}
+        self._sensor = None
+        self.messages_published = 0
+
+    @staticmethod
+    def _replace_stale(name):
+        stale = _attach(name)
+        if bytes(stale.buf[:len(MAGIC)]) == MAGIC:
+            # readers of the old segment see that it is closed and attach to the new one
+            header = _header(stale.buf)
+            header[STATE_FIELD] = STATE_CLOSED
+            del header
+        stale.close()
+        stale.unlink()
+
+    def attach(self, sensor: Sensor):
+        # one sensor per segment: the receive thread of the sensor is the only writer
+        if self._sensor is not None:
+            raise ValueError("the publisher already publishes a sensor")
+        sensor.add_sample_listener(self.publish)
+        self._sensor = sensor
+
+    def detach(self):
+        if self._sensor is not None:
+            self._sensor.remove_sample_listener(self.publish)
+            self._sensor = None
+
+    def publish(self, timestamp, data_json):
+        published = False
+        for key, value in data_json.items():
+            slot = self._capabilities.get(key, False)
+            if slot is False:
+                slot = self._capabilities[key] = self._declare(key, value)
+            if slot is None:
+                continue
+
+            if slot.kind == KIND_VECTOR:
+                try:
+                    values = [float(value[field]) for field in VECTOR_FIELDS]
+                except (KeyError, TypeError, ValueError):
+                    # value does not match the layout of the first value
+                    continue
+            elif isinstance(value, (int, float)):
+                values = [float(value), 0.0, 0.0]
+            else:
+                continue
+            slot.write(timestamp, values)
+            published = True
+
+        if published:
+            self._header[MESSAGES_FIELD] += 1
+            self.messages_published += 1
+
+    def _declare(self, key, value):
+        if isinstance(value, dict):
+            kind = KIND_VECTOR
+        elif isinstance(value, int):
+            kind = KIND_INT
+        elif isinstance(value, float):
+            kind = KIND_FLOAT
+        else:
+            return None
+
+        name = key.encode()
+        declared = int(self._header[DECLARED_FIELD])
+        if len(name) > NAME_SIZE or declared == self.max_capabilities:
+            return None
+        slot = self._slots[declared]
+        slot.declare(name, kind)
+        # the slot is complete, readers may use it from now on
+        self._header[DECLARED_FIELD] = declared + 1
+        return slot
+
+    def close(self):
+        self.detach()
+        self._header[STATE_FIELD] = STATE_CLOSED
+        # the views have to be gone before the memory can be closed
+        self._header = None
+        self._slots = []
+        self._capabilities = {}
+        self._memory.close()
+        self._memory.unlink()
+
+
+class SensorShared(Sensor):
+    """
+    Reads a sensor published by a SharedPublisher in another process.
+
+    Values, callbacks, sample listeners and connection callbacks work like with every other sensor; the timestamps
+    passed to sample listeners are the times the publisher received the messages (time.monotonic() is the same clock
+    in all processes). The history is the window in shared memory: get_history() and get_since() return views of it
+    without copying (valid until the sensor is disconnected; copy them to keep them longer), enable_history() is
+    not needed.
+    Raises FileNotFoundError if there is no publisher. If the publisher is restarted, the sensor attaches to the new
+    segment.
+    """
+
+    # seconds between two looks at the message counter
+    POLL_INTERVAL = 0.002
+    # seconds between two attempts to attach to a restarted publisher
+    ATTACH_INTERVAL = 0.5
+
+    def __init__(self, name=DEFAULT_NAME):
+        Sensor.__init__(self)
+        self._name = name
+        self._memory = None
+        self._slots = []
+        # number of rows of each slot that were handed out already
+        self._seen = []
+        self._messages_seen = 0
+        # rows that were overwritten in the window before they were read (the reader was too slow)
+        self.lost = 0
+        self._stop = Event()
+        self._attach()
+        self._connect()
+
+    def _attach(self):
+        memory = _attach(self._name)
+        if bytes(memory.buf[:len(MAGIC)]) != MAGIC:
+            memory.close()
+            raise ValueError(f"shared memory {self._name} is not a DIPPID publisher")
+        header = _header(memory.buf)
+        if int(header[VERSION_FIELD]) != VERSION:
+            del header
+            memory.close()
+            raise ValueError(f"shared memory {self._name} has unsupported version")
+        self._memory = memory
+        self._header = header
+        self._window = int(header[WINDOW_FIELD])
+        self._messages_seen = int(header[MESSAGES_FIELD])
+        self._slots = []
+        self._seen = []
+        # values published before the sensor attached are in the history, but not delivered as messages
+        self._add_slots(skip_published=True)
+
+    def _detach(self):
+        self._header = None
+        self._slots = []
+        self._seen = []
+        memory, self._memory = self._memory, None
+        try:
+            memory.close()
+        except BufferError:
+            # somebody still holds a view of the history, the memory is released with the last view
+            pass
+
+    def _add_slots(self, skip_published=False):
+        declared = int(self._header[DECLARED_FIELD])
+        while len(self._slots) < declared:
+            slot = _Slot(self._memory.buf, HEADER_SIZE + len(self._slots) * _slot_size(self._window), self._window)
+            self._slots.append(slot)
+            self._seen.append(slot.written if skip_published else 0)
+            self._add_capability(slot.name)
+
+    def _connect(self):
+        self._receiving = True
+        self._connection_thread = Thread(target=self._receive)
+        self._connection_thread.start()
+
+    def disconnect(self):
+        self._receiving = False
+        self._stop.set()
+        Sensor.disconnect(self)
+        if self._memory is not None:
+            self._detach()
+
+    def _receive(self):
+        while self._receiving:
+            if self._memory is None:
+                try:
+                    self._attach()
+                except (FileNotFoundError, ValueError):
+                    self._stop.wait(SensorShared.ATTACH_INTERVAL)
+                continue
+
+            messages = int(self._header[MESSAGES_FIELD])
+            if messages != self._messages_seen:
+                self._messages_seen = messages
+                self._read()
+            elif int(self._header[STATE_FIELD]) == STATE_CLOSED:
+                self._detach()
+                continue
+            self._stop.wait(SensorShared.POLL_INTERVAL)
+
+    # turns the rows that were published since the last call back into messages
+    def _read(self):
+        self._add_slots()
+        messages = {}
+        merged = {}
+        for index, slot in enumerate(self._slots):
+            written = slot.written
+            new = written - self._seen[index]
+            if new == 0:
+                continue
+            self._seen[index] = written
+
+            rows = slot.window(written, new).tolist()
+            # rows the publisher overwrote while they were copied (it writes row n over row n - capacity)
+            overwritten = slot.written - slot.capacity + 1 - (written - len(rows))
+            if overwritten > 0:
+                rows = rows[overwritten:]
+            self.lost += new - len(rows)
+            name = slot.name
+            for t, x, y, z in rows:
+                messages.setdefault(t, {})[name] = slot.value((x, y, z))
+            merged[name] = slot.value(slot.read_latest()[1:])
+
+        for timestamp in sorted(messages):
+            self._store_samples(messages[timestamp], timestamp)
+        if merged:
+            self._apply(merged)
+
+    def _slot(self, key):
+        for slot in self._slots:
+            if slot.name == key:
+                return slot
+        return None
+
+    # the window in shared memory is the history
+    def enable_history(self, size=1000):
+        pass
+
+    def get_history(self, key, n=None):
+        slot = self._slot(key)
+        if slot is None:
+            return None
+        rows = slot.window(slot.written, self._window if n is None else n)
+        return rows[:, 0], rows[:, 1:1 + len(slot.fields)]
+
+    def get_since(self, key, t):
+        history = self.get_history(key)
+        if history is None:
+            return None
+        timestamps, values = history
+        start = np.searchsorted(timestamps, t, side='right')
+        return timestamps[start:], values[start:]
+
+    def get_history_fields(self, key):
+        slot = self._slot(key)
+        if slot is None:
+            return None
+        return slot.fields
+
+
+def main():
+    parser = ArgumentParser(description="Publish a DIPPID device into shared memory for other processes.")
+    parser.add_argument("-p", "--port", type=int, default=5700, help="UDP port the device sends to")
+    parser.add_argument("-n", "--name", default=DEFAULT_NAME, help="name of the shared memory segment")
+    parser.add_argument("-w", "--window", type=int, default=1000, help="values per capability kept for the readers")
+    args = parser.parse_args()
+    install_interrupt_handler()
+
+    # the batched loop passes every message to the publisher as well and stops without waiting for a datagram
+    sensor = SensorUDP(args.port, batched=True)
+    publisher = SharedPublisher(args.name, args.window)
+    publisher.attach(sensor)
+    print(f"Publishing port {args.port} as shared memory '{args.name}', press ctrl+c to stop.")
+    try:
+        while True:
+            time.sleep(1)
+            sys.stdout.write(f"\r{publisher.messages_published} messages")
+            sys.stdout.flush()
+    finally:
+        publisher.close()
+
+
+if __name__ == '__main__':
+    main()
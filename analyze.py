@@ -6,48 +6,82 @@ Implemented by Michael Meckl.
 """
 
 import sys
+import time
 import numpy as np
 from argparse import ArgumentParser
 # import pyqtgraph.examples
 from pyqtgraph.flowchart import Flowchart, Node
+from pyqtgraph.flowchart.library.common import CtrlNode
 import pyqtgraph.flowchart.library as fclib
 from pyqtgraph.Qt import QtGui, QtCore
 import pyqtgraph as pg
-from DIPPID_pyqtnode import DIPPIDNode, BufferNode
+import DIPPID
+import DIPPID_pyqtnode
+import instrumentation
+import spectral
+from ring_buffer import RingBuffer
+from log_writer import AsyncLogWriter, StdoutSink, create_sink
 
 
 class LogNode(Node):
     """
-    Logs the data provided by the input terminal to stdout.
+    Logs the data provided by the input terminals.
+    Every sample becomes one record (time, accelX, accelY, accelZ, rotation_angle) that is handed to an
+    AsyncLogWriter, so the GUI thread never waits for the terminal or a file. Logs to stdout unless another
+    writer is set with set_writer().
     """
     nodeName = 'LogNode'  # Node type name that will appear to the user.
 
+    FIELDS = ['time', 'accelX', 'accelY', 'accelZ', 'rotation_angle']
+    LABELS = {'time': 'Time', 'accelX': 'AccelerationX', 'accelY': 'AccelerationY', 'accelZ': 'AccelerationZ',
+              'rotation_angle': 'RotationAngle'}
+
     def __init__(self, name):
         terminals = {
             'accelX': {'io': 'in'},
             'accelY': {'io': 'in'},
             'accelZ': {'io': 'in'},
-            'rotation_vector': {'io': 'in'},
             'rotation_angle': {'io': 'in'}
         }
+        self.writer = None
         Node.__init__(self, name, terminals=terminals)
 
+    def set_writer(self, writer: AsyncLogWriter):
+        if self.writer is not None:
+            self.writer.close()
+        self.writer = writer
+
     def process(self, **kwds):
-        print(f"Log:\n"
-              f"AccelerationX: {kwds['accelX'][0]}\n"
-              f"AccelerationY: {kwds['accelY'][0]}\n"
-              f"AccelerationZ: {kwds['accelZ'][0]}\n"
-              f"RotationAngle: {kwds['rotation_angle'][0]}°\n"
-              f"RotationVector: {kwds['rotation_vector']}\n")
+        if self.writer is None:
+            self.writer = AsyncLogWriter(StdoutSink(LogNode.FIELDS, LogNode.LABELS))
+
+        accel_x = np.atleast_1d(kwds['accelX'])
+        accel_y = np.atleast_1d(kwds['accelY'])
+        accel_z = np.atleast_1d(kwds['accelZ'])
+        # the angle input may cover a longer window (e.g. a whole buffer), its newest values belong to the samples
+        angles = np.atleast_1d(kwds['rotation_angle'])[-len(accel_x):]
+        if len(angles) < len(accel_x):
+            angles = np.concatenate([np.full(len(accel_x) - len(angles), np.nan), angles])
+
+        now = time.time()
+        for x, y, z, angle in zip(accel_x.tolist(), accel_y.tolist(), accel_z.tolist(), angles.tolist()):
+            self.writer.submit({'time': now, 'accelX': x, 'accelY': y, 'accelZ': z, 'rotation_angle': angle})
 
 
-class NormalVectorNode(Node):
+class NormalVectorNode(CtrlNode):
     """
     Accepts accelerometer values on its two input terminals.
     Calculates the rotation around one axis from the accelerometer values of the other two axes by calculating the
     normal vector of the plane spanned by the two input vectors and outputs a vector.
+    The inputs can be single values or whole arrays of samples (e.g. the output of a BufferNode); a whole array is
+    processed in one vectorized step. The vector is calculated from the latest sample, the angle output contains the
+    angle of every sample. The smoothing control sets the width of a moving average that is applied to the input
+    samples of one call (1 = no smoothing).
     """
     nodeName = 'NormalVectorNode'
+    uiTemplate = [
+        ('smoothing', 'intSpin', {'value': 1, 'min': 1, 'max': 1000}),
+    ]
 
     def __init__(self, name):
         terminals = {
@@ -56,17 +90,38 @@ class NormalVectorNode(Node):
             'rotation_vector': {'io': 'out'},
             'rotation_angle': {'io': 'out'},
         }
-        Node.__init__(self, name, terminals=terminals)
-
+        CtrlNode.__init__(self, name, terminals=terminals)
+
+    @staticmethod
+    def _smooth(values, window):
+        # moving average with the same length as the input; the first samples are averaged over fewer values
+        cumsum = np.cumsum(np.insert(values, 0, 0.0))
+        sums = cumsum[1:].copy()
+        sums[window:] -= cumsum[1:-window]
+        counts = np.minimum(np.arange(1, len(values) + 1), window)
+        return sums / counts
+
+    @instrumentation.timed('process.NormalVectorNode')
     def process(self, **kwds):
         # kwds will have one keyword argument per input terminal.
-        accel1 = kwds["accel1"][0]
-        accel2 = kwds["accel2"][0]
-        self.rotation_vector = np.array([(0, 0), (accel1, accel2)])
+        accel1 = np.asarray(kwds["accel1"], dtype=float).ravel()
+        accel2 = np.asarray(kwds["accel2"], dtype=float).ravel()
+        # both inputs should have the same length, otherwise the newest samples are paired
+        n = min(len(accel1), len(accel2))
+        if n == 0:
+            return {'rotation_vector': None, 'rotation_angle': None}
+        accel1, accel2 = accel1[-n:], accel2[-n:]
+
+        window = self.ctrls['smoothing'].value()
+        if window > 1:
+            accel1 = self._smooth(accel1, window)
+            accel2 = self._smooth(accel2, window)
+
+        self.rotation_vector = np.array([(0, 0), (accel1[-1], accel2[-1])])
 
         # formel based on this post:
         # https://math.stackexchange.com/questions/74204/find-angle-between-two-points-respective-to-horizontal-axis
-        self.rotation = np.degrees(np.arctan2([accel2], [accel1]))
+        self.rotation = np.degrees(np.arctan2(accel2, accel1))
 
         # this would work as well:
         # v_3 = accel1 / np.sqrt(accel1**2 + accel2**2)
@@ -75,11 +130,258 @@ class NormalVectorNode(Node):
         return {'rotation_vector': self.rotation_vector, 'rotation_angle': self.rotation}
 
 
+class SpectralNode(CtrlNode):
+    """
+    Base class of the spectrum nodes: transforms the samples provided on dataIn with a sliding-window FFT from the
+    spectral module. Like the filter nodes, the node needs the new samples of every update (e.g. from DIPPIDNode with
+    an update rate of 0), not a whole buffer; it keeps the window of the last `size` samples itself and computes a
+    new spectrum every `hop` samples (0 = size / 4). `rate` is the sample rate of the input in Hz. Sizes that are
+    powers of two are transformed fastest.
+    With `worker` checked, the transforms run in a worker thread and the output shows the spectra that were done
+    by the time of the update. Changing a control starts a new transform.
+    """
+    uiTemplate = [
+        ('size', 'intSpin', {'value': 256, 'min': 16, 'max': 8192}),
+        ('hop', 'intSpin', {'value': 0, 'min': 0, 'max': 8192}),
+        ('rate', 'spin', {'value': 100.0, 'min': 1.0, 'max': 10000.0, 'suffix': 'Hz', 'siPrefix': True}),
+        ('worker', 'check', {'checked': False}),
+    ]
+
+    def __init__(self, name):
+        terminals = {
+            'dataIn': dict(io='in'),
+            'dataOut': dict(io='out'),
+        }
+        CtrlNode.__init__(self, name, terminals=terminals)
+        self.worker = None
+        self.transform = None
+        self._start()
+
+    def create_transform(self, size, hop, sample_rate):
+        raise NotImplementedError
+
+    def _start(self):
+        if self.worker is not None:
+            self.worker.close()
+            self.worker = None
+        self.transform = self.create_transform(self.ctrls['size'].value(), self.ctrls['hop'].value(),
+                                               self.ctrls['rate'].value())
+        if self.ctrls['worker'].isChecked():
+            self.worker = spectral.TransformWorker(self.transform)
+
+    def changed(self):
+        self._start()
+        CtrlNode.changed(self)
+
+    def close(self):
+        if self.worker is not None:
+            self.worker.close()
+        CtrlNode.close(self)
+
+    def _transform(self, values):
+        if self.worker is not None:
+            self.worker.submit(values)
+        else:
+            self.transform.process(values)
+
+
+class SpectrumNode(SpectralNode):
+    """
+    Outputs the latest amplitude spectrum as a curve (frequency in Hz on x) for a PlotWidget node. The curve is one
+    persistent PlotDataItem that is updated in place whenever there is a new spectrum.
+    """
+    nodeName = 'SpectrumNode'
+
+    def __init__(self, name):
+        self.curve = pg.PlotDataItem()
+        self._shown = None
+        SpectralNode.__init__(self, name)
+
+    def create_transform(self, size, hop, sample_rate):
+        return spectral.SlidingSpectrum(size, hop, sample_rate)
+
+    @instrumentation.timed('process.SpectrumNode')
+    def process(self, **kwds):
+        if kwds['dataIn'] is None:
+            return {'dataOut': None}
+        self._transform(kwds['dataIn'])
+
+        latest = self.transform.latest
+        if latest is not None and latest is not self._shown:
+            self.curve.setData(self.transform.frequencies, latest)
+            self._shown = latest
+        return {'dataOut': self.curve}
+
+
+class SpectrogramNode(SpectralNode):
+    """
+    Outputs the latest `history` spectra as an image (time in seconds on x, frequency in Hz on y, amplitude in dB
+    between the `min` and `max` levels) for a PlotWidget node. The image is one persistent ImageItem that is updated
+    in place whenever there are new spectra.
+    """
+    nodeName = 'SpectrogramNode'
+    uiTemplate = SpectralNode.uiTemplate + [
+        ('history', 'intSpin', {'value': 200, 'min': 10, 'max': 10000}),
+        ('min', 'spin', {'value': -60.0, 'min': -200.0, 'max': 100.0, 'suffix': 'dB'}),
+        ('max', 'spin', {'value': 20.0, 'min': -200.0, 'max': 100.0, 'suffix': 'dB'}),
+    ]
+
+    def __init__(self, name):
+        self.image = pg.ImageItem()
+        self._shown = None
+        SpectralNode.__init__(self, name)
+
+    def create_transform(self, size, hop, sample_rate):
+        self._shown = None
+        return spectral.Spectrogram(size, hop, sample_rate, history=self.ctrls['history'].value())
+
+    @instrumentation.timed('process.SpectrogramNode')
+    def process(self, **kwds):
+        if kwds['dataIn'] is None:
+            return {'dataOut': None}
+        self._transform(kwds['dataIn'])
+
+        # only redraw if there are new spectra
+        written = self.transform.written
+        if written and written != self._shown:
+            spectrum = self.transform.spectrum
+            # image() is a view of the spectrogram's ring buffer, which ImageItem would keep and render later
+            image = self.transform.image().copy()
+            self.image.setImage(image, autoLevels=False, levels=(self.ctrls['min'].value(), self.ctrls['max'].value()))
+            # one spectrum every hop samples, the bins go up to the Nyquist frequency
+            self.image.setRect(QtCore.QRectF(0, 0, len(image) * spectrum.hop / spectrum.sample_rate,
+                                             spectrum.sample_rate / 2))
+            self._shown = written
+        return {'dataOut': self.image}
+
+
+class StreamPlotNode(CtrlNode):
+    """
+    Plots a stream of samples into a PlotWidget (see setPlot()), e.g. high-rate sensor values.
+    Takes the new samples on dataIn like SpectralNode and keeps the last `history` seconds (x-axis: seconds before
+    the newest sample). The curve is redrawn at most `fps` times per second and only inside the visible x-range;
+    with more than two samples per pixel column, only the minimum and maximum of every column are drawn.
+    `rate` is the sample rate of the input in Hz.
+    """
+    nodeName = 'StreamPlot'
+    uiTemplate = [
+        ('history', 'spin', {'value': 60.0, 'min': 0.1, 'max': 3600.0, 'suffix': 's'}),
+        ('rate', 'spin', {'value': 100.0, 'min': 1.0, 'max': 10000.0, 'suffix': 'Hz', 'siPrefix': True}),
+        ('fps', 'intSpin', {'value': 30, 'min': 1, 'max': 240}),
+    ]
+
+    # largest number of samples kept per node
+    MAX_SAMPLES = 10000000
+
+    def __init__(self, name):
+        terminals = {
+            'dataIn': dict(io='in'),
+        }
+        CtrlNode.__init__(self, name, terminals=terminals)
+        self.plot = None
+        self.curve = pg.PlotDataItem()
+        self._buffer = RingBuffer(self._capacity())
+        self._dirty = False
+        self.redraw_timer = QtCore.QTimer()
+        self.redraw_timer.timeout.connect(self.redraw)
+        self.redraw_timer.start(int(1000 / self.ctrls['fps'].value()))
+
+    def _capacity(self):
+        return max(1, min(int(np.ceil(self.ctrls['history'].value() * self.ctrls['rate'].value())),
+                          StreamPlotNode.MAX_SAMPLES))
+
+    def setPlot(self, plot):
+        if self.plot is not None:
+            self.plot.removeItem(self.curve)
+            self.plot.getViewBox().sigRangeChanged.disconnect(self._invalidate)
+        self.plot = plot
+        if plot is not None:
+            plot.addItem(self.curve)
+            plot.setXRange(-self.ctrls['history'].value(), 0, padding=0)
+            # zooming and panning shows other samples
+            plot.getViewBox().sigRangeChanged.connect(self._invalidate)
+            self._invalidate()
+
+    def changed(self):
+        self._buffer.resize(self._capacity())
+        self.redraw_timer.start(int(1000 / self.ctrls['fps'].value()))
+        if self.plot is not None:
+            self.plot.setXRange(-self.ctrls['history'].value(), 0, padding=0)
+        self._invalidate()
+        CtrlNode.changed(self)
+
+    def close(self):
+        self.redraw_timer.stop()
+        self.setPlot(None)
+        CtrlNode.close(self)
+
+    def _invalidate(self, *args):
+        self._dirty = True
+
+    @instrumentation.timed('process.StreamPlotNode')
+    def process(self, **kwds):
+        if kwds['dataIn'] is not None:
+            self._buffer.extend(kwds['dataIn'])
+            self._dirty = True
+
+    @staticmethod
+    def _min_max(values, first, columns):
+        # values[i] is sample number first + i; returns the sample numbers and values of the minimum and the maximum
+        # (in the order they occur) of blocks of samples, or all samples if there are at most two per column
+        count = len(values)
+        if count <= 2 * columns:
+            # values may be a view of the ring buffer, which PlotDataItem would keep
+            return np.arange(first, first + count), values.copy()
+
+        block = -(-count // columns)
+        # blocks start at multiples of the block size, so they stay the same while the plot scrolls
+        head = -first % block
+        body = (count - head) // block * block
+        blocks = values[head:head + body].reshape(-1, block)
+        lowest = blocks.argmin(axis=1)
+        highest = blocks.argmax(axis=1)
+        offsets = np.stack([np.minimum(lowest, highest), np.maximum(lowest, highest)], axis=1)
+        starts = np.arange(head, head + body, block)[:, np.newaxis]
+
+        # the partial blocks at both ends are drawn as they are
+        indices = np.concatenate([np.arange(head), (starts + offsets).ravel(), np.arange(head + body, count)])
+        return first + indices, values[indices]
+
+    @instrumentation.timed('redraw.StreamPlotNode')
+    def redraw(self):
+        if not self._dirty or self.plot is None:
+            return
+        self._dirty = False
+
+        samples = self._buffer.latest()
+        end = self._buffer.written  # sample number after the newest sample
+        first = end - len(samples)
+        rate = self.ctrls['rate'].value()
+
+        # clip to the visible range (plus one sample on each side, so the curve reaches the edges)
+        view = self.plot.getViewBox()
+        (left, right), _ = view.viewRange()
+        start = max(first, end + int(np.floor(left * rate)) - 1)
+        stop = min(end, end + int(np.ceil(right * rate)) + 1)
+        if stop <= start:
+            self.curve.setData([], [])
+            return
+
+        numbers, values = self._min_max(samples[start - first:stop - first], start, max(1, int(view.width())))
+        self.curve.setData((numbers - end) / rate, values, skipFiniteCheck=True)
+
+
 # noinspection PyAttributeOutsideInit
 class FlowChart:
-    def __init__(self, layout, port=5700):
+    def __init__(self, layout, port=5700, filter_type=None, spectrum=False, stream=False):
         self.layout = layout
         self.port = port
+        # node type of the filter between the sensor and the buffers (e.g. 'LowPass'), None for the raw values
+        self.filter_type = filter_type
+        # show the spectrum and the spectrogram of the x-acceleration
+        self.spectrum = spectrum
+        # plot the acceleration values with StreamPlot nodes instead of buffers and PlotWidget nodes
+        self.stream = stream
 
         # Create an empty flowchart with a single input and output
         self.fc = Flowchart(terminals={})
@@ -116,15 +418,38 @@ class FlowChart:
         self.pw4.setYRange(-1, 1)
         self.pw4.setTitle("Rotation")
 
+        # create plot widgets for the spectrum nodes below the other plots
+        if self.spectrum:
+            self.pw5 = pg.PlotWidget()
+            self.layout.addWidget(self.pw5, 3, 1)
+            self.pw5.setLabel('bottom', "Frequency", units="Hz")
+            self.pw5.setTitle("X-Acceleration Spectrum")
+
+            self.pw6 = pg.PlotWidget()
+            self.layout.addWidget(self.pw6, 3, 2)
+            self.pw6.setLabel('bottom', "Time", units="s")
+            self.pw6.setLabel('left', "Frequency", units="Hz")
+            self.pw6.setTitle("X-Acceleration Spectrogram")
+
+        # measure the time from a datagram arriving to the plots being painted (only if instrumentation is enabled)
+        self.paint_probes = [instrumentation.install_paint_probe(pw, title) for pw, title in
+                             ((self.pw1, "accelX"), (self.pw2, "accelY"), (self.pw3, "accelZ"), (self.pw4, "rotation"))]
+
     def set_plot_widgets(self):
-        self.pw1Node = self.fc.createNode('PlotWidget', pos=(300, -150))
+        plot_node_type = 'StreamPlot' if self.stream else 'PlotWidget'
+        self.pw1Node = self.fc.createNode(plot_node_type, pos=(300, -150))
         self.pw1Node.setPlot(self.pw1)
-        self.pw2Node = self.fc.createNode('PlotWidget', pos=(300, -50))
+        self.pw2Node = self.fc.createNode(plot_node_type, pos=(300, -50))
         self.pw2Node.setPlot(self.pw2)
-        self.pw3Node = self.fc.createNode('PlotWidget', pos=(300, 150))
+        self.pw3Node = self.fc.createNode(plot_node_type, pos=(300, 150))
         self.pw3Node.setPlot(self.pw3)
         self.pw4Node = self.fc.createNode('PlotWidget', pos=(300, 200))
         self.pw4Node.setPlot(self.pw4)
+        if self.spectrum:
+            self.pw5Node = self.fc.createNode('PlotWidget', pos=(300, 300))
+            self.pw5Node.setPlot(self.pw5)
+            self.pw6Node = self.fc.createNode('PlotWidget', pos=(300, 400))
+            self.pw6Node.setPlot(self.pw6)
 
     def create_nodes(self):
         # create the dippid node and set the provided port automatically
@@ -136,22 +461,44 @@ class FlowChart:
         self.bufferNodeY = self.fc.createNode('Buffer', pos=(150, 0))
         self.bufferNodeZ = self.fc.createNode('Buffer', pos=(150, 150))
 
+        # create a filter node for each axis if requested
+        self.filterNodes = None
+        if self.filter_type is not None:
+            self.filterNodes = [self.fc.createNode(self.filter_type, pos=(75, y)) for y in (-150, 0, 150)]
+
         # create the custom nodes
         self.normalVectorNode = self.fc.createNode("NormalVectorNode", pos=(150, 200))
         self.logNode = self.fc.createNode("LogNode", pos=(300, 50))
 
+        if self.spectrum:
+            self.spectrumNode = self.fc.createNode("SpectrumNode", pos=(150, 300))
+            self.spectrogramNode = self.fc.createNode("SpectrogramNode", pos=(150, 400))
+        if self.spectrum or self.stream:
+            # the spectrum and stream plot nodes need every sample, not the latest one per update
+            self.dippidNode.update_rate_input.setValue(0)
+
     def connect_node_terminals(self):
         # connect the acceleration values with the buffer nodes and the buffers with the corresponding plot widgets
-        self.fc.connectTerminals(self.dippidNode['accelX'], self.bufferNodeX['dataIn'])
-        self.fc.connectTerminals(self.dippidNode['accelY'], self.bufferNodeY['dataIn'])
-        self.fc.connectTerminals(self.dippidNode['accelZ'], self.bufferNodeZ['dataIn'])
-        self.fc.connectTerminals(self.bufferNodeX['dataOut'], self.pw1Node['In'])
-        self.fc.connectTerminals(self.bufferNodeY['dataOut'], self.pw2Node['In'])
-        self.fc.connectTerminals(self.bufferNodeZ['dataOut'], self.pw3Node['In'])
-
-        # connect the normal vector node with two of the acceleration values and plot it
-        self.fc.connectTerminals(self.dippidNode['accelX'], self.normalVectorNode['accel1'])
-        self.fc.connectTerminals(self.dippidNode['accelZ'], self.normalVectorNode['accel2'])
+        # (through the filter nodes, if there are any)
+        # (stream plot nodes keep their own history and get the new samples instead of the buffers)
+        buffers = (('accelX', self.bufferNodeX, self.pw1Node), ('accelY', self.bufferNodeY, self.pw2Node),
+                   ('accelZ', self.bufferNodeZ, self.pw3Node))
+        for index, (axis, buffer_node, plot_node) in enumerate(buffers):
+            if self.filterNodes is None:
+                samples = self.dippidNode[axis]
+            else:
+                samples = self.filterNodes[index]['dataOut']
+                self.fc.connectTerminals(self.dippidNode[axis], self.filterNodes[index]['dataIn'])
+            self.fc.connectTerminals(samples, buffer_node['dataIn'])
+            if self.stream:
+                self.fc.connectTerminals(samples, plot_node['dataIn'])
+            else:
+                self.fc.connectTerminals(buffer_node['dataOut'], plot_node['In'])
+
+        # connect the normal vector node with the buffers of two of the acceleration values and plot it;
+        # the node processes the whole buffered window at once (e.g. to smooth it)
+        self.fc.connectTerminals(self.bufferNodeX['dataOut'], self.normalVectorNode['accel1'])
+        self.fc.connectTerminals(self.bufferNodeZ['dataOut'], self.normalVectorNode['accel2'])
         self.fc.connectTerminals(self.normalVectorNode['rotation_vector'], self.pw4Node['In'])
 
         # connect the log node with the acceleration buffer nodes and the normal vector node
@@ -159,7 +506,23 @@ class FlowChart:
         self.fc.connectTerminals(self.dippidNode['accelY'], self.logNode['accelY'])
         self.fc.connectTerminals(self.dippidNode['accelZ'], self.logNode['accelZ'])
         self.fc.connectTerminals(self.normalVectorNode['rotation_angle'], self.logNode['rotation_angle'])
-        self.fc.connectTerminals(self.normalVectorNode['rotation_vector'], self.logNode['rotation_vector'])
+
+        # the spectrum nodes keep their own window of the new samples
+        if self.spectrum:
+            self.fc.connectTerminals(self.dippidNode['accelX'], self.spectrumNode['dataIn'])
+            self.fc.connectTerminals(self.spectrumNode['dataOut'], self.pw5Node['In'])
+            self.fc.connectTerminals(self.dippidNode['accelX'], self.spectrogramNode['dataIn'])
+            self.fc.connectTerminals(self.spectrogramNode['dataOut'], self.pw6Node['In'])
+
+
+# registers the nodes of DIPPID_pyqtnode and the custom nodes of this module (safe to call more than once)
+def register_nodes():
+    DIPPID_pyqtnode.register_nodes()
+    fclib.registerNodeType(LogNode, [('Logging',)], override=True)
+    fclib.registerNodeType(NormalVectorNode, [('NormalVector',)], override=True)
+    fclib.registerNodeType(SpectrumNode, [('Spectrum',)], override=True)
+    fclib.registerNodeType(SpectrogramNode, [('Spectrum',)], override=True)
+    fclib.registerNodeType(StreamPlotNode, [('Display',)], override=True)
 
 
 def main():
@@ -167,12 +530,26 @@ def main():
     parser = ArgumentParser(description="A small application that generates a PyqtGraph flowchart.")
     parser.add_argument("-p", "--port", help="The port on which the mobile device sends its data via DIPPID", type=int,
                         default=5700, required=False)
+    parser.add_argument("--shared", help="Read the device from a DIPPID_shared.py publisher instead of the port "
+                        "(optionally with the name of its shared memory)", nargs="?", const="dippid", metavar="NAME")
+    parser.add_argument("--filter", help="Filter the acceleration values before they are buffered and plotted",
+                        choices=["MovingAverage", "Median", "LowPass", "HighPass"])
+    parser.add_argument("--spectrum", help="Show the spectrum and the spectrogram of the x-acceleration",
+                        action="store_true")
+    parser.add_argument("--stream", help="Plot the acceleration values of the last minute, decimated to the plot "
+                        "width, instead of the last buffer", action="store_true")
+    parser.add_argument("--log-sink", help="Where the LogNode writes its records", choices=["stdout", "csv", "jsonl",
+                        "npy"], default="stdout")
+    parser.add_argument("--log-file", help="File for the csv, jsonl and npy log sinks")
+    parser.add_argument("--log-max-rate", help="Log at most this many records per second", type=float)
+    parser.add_argument("--log-sample-every", help="Log only every n-th record", type=int, default=1)
     args = parser.parse_args()
     port = args.port
+    if args.log_sink != "stdout" and not args.log_file:
+        parser.error(f"--log-sink {args.log_sink} requires --log-file")
 
-    # register the custom nodes
-    fclib.registerNodeType(LogNode, [('Logging',)])
-    fclib.registerNodeType(NormalVectorNode, [('NormalVector',)])
+    DIPPID.install_interrupt_handler()
+    register_nodes()
 
     # create the gui
     app = QtGui.QApplication([])
@@ -184,9 +561,19 @@ def main():
     cw.setLayout(layout)
 
     # create the flowchart
-    flowchart = FlowChart(layout, port)
+    flowchart = FlowChart(layout, port, args.filter, args.spectrum, args.stream)
+    if args.shared is not None:
+        from DIPPID_shared import SensorShared
+        flowchart.dippidNode.set_sensor(SensorShared(args.shared))
+    log_writer = AsyncLogWriter(create_sink(args.log_sink, LogNode.FIELDS, args.log_file, LogNode.LABELS),
+                                max_rate=args.log_max_rate, sample_every=args.log_sample_every)
+    flowchart.logNode.set_writer(log_writer)
+    # write everything that is still queued before the app exits
+    app.aboutToQuit.connect(log_writer.close)
 
     win.show()
+    if instrumentation.enabled:
+        instrumentation.start_periodic_dump()
     # if not running in interactive mode or using PySide instead of PyQt, start the app
     if (sys.flags.interactive != 1) or not hasattr(QtCore, 'PYQT_VERSION'):
         sys.exit(QtGui.QApplication.instance().exec_())
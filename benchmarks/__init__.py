@@ -0,0 +1,4 @@
+"""
+Headless benchmarks for the DIPPID sensor pipeline.
+Run them from the repository root, e.g. `python -m benchmarks.udp_receive`.
+"""
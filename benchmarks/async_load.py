@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Load test with many simulated DIPPID devices on localhost: one SensorUDP thread per device against
+all devices multiplexed on a single asyncio loop (AsyncSensorUDP).
+Reports CPU time of the receiving process and the send-to-callback latency.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import socket
+import statistics
+import time
+from argparse import ArgumentParser
+from DIPPID import SensorUDP
+from DIPPID_asyncio import AsyncSensorUDP
+
+
+def simulate_devices(first_port, devices, rate, duration):
+    # runs in its own process so it does not count towards the receiver's cpu time
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    interval = 1.0 / rate
+    start = time.monotonic()
+    tick = 0
+    while time.monotonic() - start < duration:
+        for device in range(devices):
+            # the send time is part of the payload, so the receiver can measure latency (same monotonic clock)
+            payload = {"accelerometer": {"x": tick * 0.01, "y": device, "z": 9.81}, "t": time.monotonic()}
+            sock.sendto(json.dumps(payload).encode(), ("127.0.0.1", first_port + device))
+        tick += 1
+        time.sleep(max(0.0, start + tick * interval - time.monotonic()))
+    sock.close()
+
+
+def start_simulator(args):
+    process = multiprocessing.Process(target=simulate_devices,
+                                      args=(args.port, args.devices, args.rate, args.duration))
+    process.start()
+    return process
+
+
+def run_threaded(args):
+    latencies = []
+
+    def on_timestamp(sent):
+        latencies.append(time.monotonic() - sent)
+
+    sensors = [SensorUDP(args.port + i, ip='127.0.0.1') for i in range(args.devices)]
+    for sensor in sensors:
+        sensor.register_callback('t', on_timestamp)
+
+    cpu_start = time.process_time()
+    start_simulator(args).join()
+    time.sleep(0.2)
+    cpu = time.process_time() - cpu_start
+
+    wake = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    for sensor in sensors:
+        sensor._receiving = False
+        # unblock recvfrom() so the thread can end
+        wake.sendto(b"{}", ("127.0.0.1", sensor._port))
+        sensor.disconnect()
+        sensor._sock.close()
+    wake.close()
+    return cpu, latencies
+
+
+async def run_asyncio(args):
+    latencies = []
+
+    def on_timestamp(sent):
+        latencies.append(time.monotonic() - sent)
+
+    sensors = [await AsyncSensorUDP.create(args.port + i, ip='127.0.0.1') for i in range(args.devices)]
+    for sensor in sensors:
+        sensor.register_callback('t', on_timestamp)
+
+    cpu_start = time.process_time()
+    simulator = start_simulator(args)
+    while simulator.is_alive():
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(0.2)
+    cpu = time.process_time() - cpu_start
+
+    for sensor in sensors:
+        sensor.disconnect()
+    return cpu, latencies
+
+
+def report(name, cpu, latencies, args):
+    expected = args.devices * args.rate * args.duration
+    latencies = sorted(latencies) or [float('nan')]
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if len(latencies) > 1 else latencies[0]
+    print(f"{name:<20}{cpu:>8.2f}s{len(latencies) / expected:>10.1%}"
+          f"{statistics.median(latencies) * 1e3:>10.3f}{p99 * 1e3:>10.3f}")
+
+
+def main():
+    parser = ArgumentParser(description="Thread-per-sensor vs single asyncio loop with many UDP devices.")
+    parser.add_argument("-p", "--port", type=int, default=6100, help="port of the first device")
+    parser.add_argument("-n", "--devices", type=int, default=50)
+    parser.add_argument("-r", "--rate", type=int, default=100, help="packets per second per device")
+    parser.add_argument("-d", "--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"{'receiver':<20}{'cpu':>9}{'received':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    cpu, latencies = run_threaded(args)
+    report("thread per sensor", cpu, latencies, args)
+
+    args.port += args.devices
+    cpu, latencies = asyncio.run(run_asyncio(args))
+    report("asyncio loop", cpu, latencies, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Per-sample cost of BufferNode for buffer sizes from 32 to 100k samples:
+the former np.append implementation against the ring buffer, both bare and through BufferNode.process().
+The output array is only copied when a connected node reads it, which this benchmark doesn't do.
+"""
+
+import os
+import timeit
+from argparse import ArgumentParser
+import numpy as np
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+class AppendBuffer:
+    """
+    The BufferNode implementation before it was backed by a ring buffer.
+    """
+
+    def __init__(self, buffer_size):
+        self.buffer_size = buffer_size
+        self._buffer = np.array([])
+
+    def process(self, **kwds):
+        self._buffer = np.append(self._buffer, kwds['dataIn'])[-self.buffer_size:]
+        return {'dataOut': self._buffer}
+
+
+def check_output_kept(node, size):
+    # a connected node may keep the output it read, later samples must not change it
+    node.process(dataIn=np.arange(size, dtype=float))
+    output = node.outputs()['dataOut'].value()
+    kept = output.copy()
+    node.process(dataIn=np.full(size // 2 + 1, -1.0))
+    if not np.array_equal(output, kept):
+        raise AssertionError(f"the output of BufferNode changed with later samples (size {size})")
+
+
+def per_sample_cost(process, samples, repeat):
+    def run():
+        for sample in samples:
+            process(dataIn=sample)
+
+    return min(timeit.repeat(run, number=1, repeat=repeat)) / len(samples) * 1e6
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark BufferNode implementations.")
+    parser.add_argument("-n", "--samples", type=int, default=20000, help="samples fed per run (after warm-up)")
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    parser.add_argument("-s", "--sizes", type=int, nargs="+", default=[32, 1000, 10000, 100000])
+    args = parser.parse_args()
+
+    from pyqtgraph.Qt import QtGui
+    from DIPPID_pyqtnode import BufferNode
+
+    app = QtGui.QApplication([])
+    samples = [np.array([value]) for value in np.random.default_rng(1).normal(size=args.samples)]
+
+    print(f"{'size':>8}{'np.append':>14}{'BufferNode':>14}  (us/sample)")
+    for size in args.sizes:
+        old = AppendBuffer(size)
+        node = BufferNode(f"buffer{size}")
+        node.set_buffer_size(size)
+        check_output_kept(node, size)
+
+        # fill both buffers first so the measurement runs at full size
+        warm_up = np.zeros(size)
+        old.process(dataIn=warm_up)
+        node.process(dataIn=warm_up)
+
+        old_cost = per_sample_cost(old.process, samples, args.repeat)
+        new_cost = per_sample_cost(node.process, samples, args.repeat)
+        print(f"{size:>8}{old_cost:>14.2f}{new_cost:>14.2f}")
+
+    app.quit()
+
+
+if __name__ == '__main__':
+    main()
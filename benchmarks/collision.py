@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cost of one GameWindow step (movement plus collision checks) for levels with 10 to 10k objects:
+the former linear scan over all obstacles and collectibles against the per-lane index.
+"""
+
+import os
+import random
+import sys
+import timeit
+from argparse import ArgumentParser
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from game_widget import GameWindow, Velocity
+from game_levels import DataLevel, TOP_LANE, BOTTOM_LANE
+
+
+class LinearScanGameWindow(GameWindow):
+    """
+    GameWindow with the collision checks from before the level index: every object is looked at on every move.
+    """
+
+    def _set_values_for_level(self, level_index: int):
+        GameWindow._set_values_for_level(self, level_index)
+        chunks = [self.level.chunk(index) for index in range(self.level.chunk_count)]
+        self.current_obstacles = [obstacle for chunk in chunks for obstacle in chunk.obstacles]
+        self.current_collectibles = [collectible for chunk in chunks for collectible in chunk.collectibles]
+
+    def _overlaps(self, object_x, object_lane, object_radius):
+        player_right_edge = self.player_xPos + self.player_width / 2
+        player_left_edge = self.player_xPos - self.player_width / 2
+        player_lane = TOP_LANE if self.at_top_lane else BOTTOM_LANE
+        return (player_right_edge > object_x - object_radius and player_left_edge <= object_x + object_radius
+                and player_lane == object_lane)
+
+    def _check_player_collision(self):
+        for collectible in self.current_collectibles:
+            if self._overlaps(collectible[0], collectible[1], self.collectible_radius):
+                self.current_collectibles.remove(collectible)
+                break
+        for obstacle in self.current_obstacles:
+            if self._overlaps(obstacle[0], obstacle[1], self.obstacle_radius):
+                self.player_xPos = self.player_start_xPos
+                break
+
+
+def crowded_level(game, count, seed=1):
+    # objects spread over the whole width, on the bottom lane only, so the player on the top lane never hits one
+    rng = random.Random(seed)
+    width = game.width()
+    return DataLevel("crowded", {"length": width,
+                                 "obstacles": {"bottom": [rng.uniform(0, width) for _ in range(count // 2)]},
+                                 "collectibles": {"bottom": [rng.uniform(0, width) for _ in range(count // 2)]}})
+
+
+def step_cost(window_class, count, steps, repeat):
+    game = window_class()
+    game.levels = [crowded_level(game, count)]
+    game.start(level_finished_callback=lambda level: None, points_changed_callback=lambda points: None)
+    game.stop()  # steps are driven by the benchmark
+    game.move_character_forward(Velocity.NORMAL)
+
+    def step():
+        game.step(1 / 60)
+        if game.player_xPos > game.width() - 2 * game.player_width:
+            game.player_xPos = game.player_start_xPos
+
+    return min(timeit.repeat(step, number=steps, repeat=repeat)) / steps * 1e6
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark GameWindow collision checks for long levels.")
+    parser.add_argument("-n", "--steps", type=int, default=1000, help="game steps per run")
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    parser.add_argument("-c", "--counts", type=int, nargs="+", default=[10, 1000, 10000],
+                        help="objects per level")
+    args = parser.parse_args()
+
+    from PyQt5 import QtWidgets
+    app = QtWidgets.QApplication(sys.argv)
+
+    print(f"{'objects':>8}{'linear scan':>14}{'lane index':>14}  (us/step)")
+    for count in args.counts:
+        old_cost = step_cost(LinearScanGameWindow, count, args.steps, args.repeat)
+        new_cost = step_cost(GameWindow, count, args.steps, args.repeat)
+        print(f"{count:>8}{old_cost:>14.2f}{new_cost:>14.2f}")
+
+    app.quit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Measures the per-message cost of Sensor._update for the old path (str decode, json.loads, linear capability lookup)
+and the new decoder layer (raw bytes into JSONDecoder / DIPPIDDecoder).
+First checks that values of another type than the first one of a capability do not break its history.
+"""
+
+import json
+import random
+import timeit
+from argparse import ArgumentParser
+from DIPPID import Sensor, JSONDecoder, DIPPIDDecoder
+
+
+def record_payloads(count=1000, seed=7):
+    # payloads as a DIPPID phone sends them: one capability per message, mostly motion data
+    rng = random.Random(seed)
+    payloads = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.95:
+            key = rng.choice(["accelerometer", "gyroscope", "gravity"])
+            values = {axis: round(rng.uniform(-10, 10), rng.randint(3, 8)) for axis in "xyz"}
+            payload = {key: values}
+        else:
+            payload = {f"button_{rng.randint(1, 4)}": rng.randint(0, 1)}
+        payloads.append(json.dumps(payload, separators=(",", ":")).encode())
+    return payloads
+
+
+class LegacySensor(Sensor):
+    """
+    The Sensor._update implementation before the decoder layer was introduced.
+    """
+
+    def _update(self, data):
+        try:
+            data_json = json.loads(data.decode())
+        except json.decoder.JSONDecodeError:
+            return
+
+        for key, value in data_json.items():
+            self._add_capability(key)
+            if self._data[key] == []:
+                self._data[key] = value
+                continue
+            if self._data[key] != value:
+                self._data[key] = value
+                self._notify_callbacks(key)
+
+
+def check_history_types(decoder):
+    # a value of another type than the first one of its capability is skipped by the history, not raised
+    sensor = Sensor(decoder=decoder)
+    sensor.enable_history(16)
+    for payload in [b'{"button_1":1}', b'{"button_1":"pressed"}', b'{"button_1":{"x":1}}', b'{"button_1":0}']:
+        sensor._update(payload)
+    Sensor.instances.remove(sensor)
+    timestamps, values = sensor.get_history('button_1')
+    if len(timestamps) != 2 or sensor.get_value('button_1') != 0:
+        raise AssertionError(f"{type(decoder).__name__}: mismatching values broke the history of button_1")
+
+
+def measure(sensor, payloads, repeat):
+    def run():
+        for payload in payloads:
+            sensor._update(payload)
+
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    Sensor.instances.remove(sensor)
+    return best / len(payloads) * 1e6
+
+
+def main():
+    parser = ArgumentParser(description="Microbenchmark of the DIPPID message decoding paths.")
+    parser.add_argument("-n", "--messages", type=int, default=20000)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    check_history_types(JSONDecoder())
+    check_history_types(DIPPIDDecoder())
+    payloads = record_payloads(args.messages)
+    paths = [
+        ("legacy (decode + json.loads)", LegacySensor()),
+        ("JSONDecoder", Sensor(decoder=JSONDecoder())),
+        ("DIPPIDDecoder", Sensor(decoder=DIPPIDDecoder())),
+    ]
+    for name, sensor in paths:
+        print(f"{name:<30}{measure(sensor, payloads, args.repeat):8.2f} us/message")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Throughput of the stream filters (million samples per second) on a 1M sample array:
+
+    loop       a sample-by-sample Python loop with the same state (the straightforward implementation)
+    whole      Filter.process() on the whole array in one call
+    chunked    Filter.process() on chunks of 64 samples, roughly what a node gets per display frame
+    3 axes     Filter.process() on the whole array with x, y and z as channels of one (n, 3) array
+"""
+
+import timeit
+from argparse import ArgumentParser
+from collections import deque
+import numpy as np
+
+import filters
+
+
+def loop_moving_average(values, window):
+    samples = deque([values[0]] * window, maxlen=window)
+    total = values[0] * window
+    output = np.empty(len(values))
+    for i, value in enumerate(values.tolist()):
+        total += value - samples[0]
+        samples.append(value)
+        output[i] = total / window
+    return output
+
+
+def loop_median(values, window):
+    samples = deque([values[0]] * window, maxlen=window)
+    output = np.empty(len(values))
+    for i, value in enumerate(values.tolist()):
+        samples.append(value)
+        output[i] = sorted(samples)[window // 2] if window % 2 else np.median(samples)
+    return output
+
+
+def loop_low_pass(values, alpha):
+    previous = values[0]
+    output = np.empty(len(values))
+    for i, value in enumerate(values.tolist()):
+        previous = alpha * value + (1 - alpha) * previous
+        output[i] = previous
+    return output
+
+
+def loop_high_pass(values, alpha):
+    return values - loop_low_pass(values, alpha)
+
+
+FILTERS = [
+    ("MovingAverage(5)", lambda: filters.MovingAverage(5), lambda values: loop_moving_average(values, 5)),
+    ("MovingAverage(100)", lambda: filters.MovingAverage(100), lambda values: loop_moving_average(values, 100)),
+    ("Median(5)", lambda: filters.Median(5), lambda values: loop_median(values, 5)),
+    ("LowPass(0.2)", lambda: filters.LowPass(0.2), lambda values: loop_low_pass(values, 0.2)),
+    ("LowPass(0.9)", lambda: filters.LowPass(0.9), lambda values: loop_low_pass(values, 0.9)),
+    ("HighPass(0.2)", lambda: filters.HighPass(0.2), lambda values: loop_high_pass(values, 0.2)),
+]
+
+
+def throughput(func, samples, repeat):
+    return samples / min(timeit.repeat(func, number=1, repeat=repeat)) / 1e6
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the stream filters.")
+    parser.add_argument("-n", "--samples", type=int, default=1000000, help="samples per array")
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    parser.add_argument("-c", "--chunk", type=int, default=64, help="samples per call for the chunked column")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    values = np.cumsum(rng.normal(size=args.samples))
+    axes = np.cumsum(rng.normal(size=(args.samples, 3)), axis=0)
+    chunks = np.array_split(values, max(1, args.samples // args.chunk))
+
+    print(f"{'filter':>20}{'loop':>10}{'whole':>10}{'chunked':>10}{'3 axes':>10}  (M samples/s)")
+    for name, create, loop in FILTERS:
+        # the loop is the reference: the filters must produce the same values
+        expected = loop(values)
+        if not np.allclose(create().process(values), expected):
+            raise AssertionError(f"{name} differs from the reference loop")
+
+        loop_rate = throughput(lambda: loop(values), args.samples, 1)
+        whole_rate = throughput(lambda: create().process(values), args.samples, args.repeat)
+
+        def chunked():
+            stream_filter = create()
+            for chunk in chunks:
+                stream_filter.process(chunk)
+
+        chunked_rate = throughput(chunked, args.samples, args.repeat)
+        axes_rate = throughput(lambda: create().process(axes), args.samples * 3, args.repeat)
+        print(f"{name:>20}{loop_rate:>10.2f}{whole_rate:>10.2f}{chunked_rate:>10.2f}{axes_rate:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
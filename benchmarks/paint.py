@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Paint cost of GameWindow per frame at several window sizes while the player moves (offscreen Qt platform).
+
+    uncached   the former paintEvent: new pens and brushes and everything redrawn, on the whole window (repaint())
+    cached     the current paintEvent on the whole window: static layer pixmap plus the moving sprites
+    dirty      the current paintEvent limited to the region the game loop marked dirty, as update() paints it
+
+The style sheet background is painted outside paintEvent for the same region; the background column shows its cost
+for the whole window.
+"""
+
+import os
+import timeit
+from argparse import ArgumentParser
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5 import QtWidgets, QtCore, QtGui
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QPainter, QPen, QBrush, QColor
+from game_widget import GameWindow, Velocity
+
+
+class LegacyGameWindow(GameWindow):
+    """
+    GameWindow with the paintEvent from before the static layer was cached.
+    """
+
+    def paintEvent(self, event):
+        painter = QPainter()
+        painter.begin(self)
+        painter.translate(-self.camera_x, 0)
+
+        left, right = self.camera_x, self.camera_x + self.width()
+        y_middle, y_bottom = self.inset + self.road_height, self.inset + self.road_height * 2
+        painter.setBrush(QBrush(QColor(186, 186, 186), Qt.SolidPattern))
+        painter.drawRect(left, self.inset, right - left, self.road_height * 2)
+        pen = QPen(Qt.black, 3, Qt.SolidLine)
+        painter.setPen(pen)
+        painter.drawLine(left, self.inset, right, self.inset)
+        painter.drawLine(left, y_bottom, right, y_bottom)
+        pen.setStyle(Qt.DashLine)
+        painter.setPen(pen)
+        painter.drawLine(left, y_middle, right, y_middle)
+
+        painter.setPen(QPen(Qt.NoPen))
+        painter.setBrush(QBrush(Qt.black, Qt.SolidPattern))
+        for x, lane in self.level_run.objects("obstacles", left, right):
+            painter.drawEllipse(QtCore.QPointF(x, self._obstacle_y(lane)), self.obstacle_radius, self.obstacle_radius)
+        painter.setPen(QPen(Qt.NoPen))
+        painter.setBrush(QBrush(Qt.yellow, Qt.SolidPattern))
+        for x, lane in self.level_run.objects("collectibles", left, right):
+            painter.drawEllipse(QtCore.QPointF(x, self._collectible_y(lane)),
+                                self.collectible_radius, self.collectible_radius)
+
+        painter.setPen(QPen(Qt.NoPen))
+        painter.setBrush(QBrush(Qt.darkGreen, Qt.SolidPattern))
+        painter.drawRect(QtCore.QRectF(self.player_xPos, self.player_yPos, self.player_width, self.player_height))
+        painter.setPen(QPen(Qt.black, 4, Qt.SolidLine))
+        painter.drawPoint(QtCore.QPointF(self.player_xPos + self.player_width - 5, self.player_yPos + 5))
+        painter.drawLine(QtCore.QLineF(self.player_xPos + self.player_width - 8, self.player_yPos + 10,
+                                       self.player_xPos + self.player_width, self.player_yPos + 10))
+        painter.end()
+
+
+class BackgroundOnly(GameWindow):
+    """
+    Paints nothing but the style sheet background and border.
+    """
+
+    def paintEvent(self, event):
+        pass
+
+
+def paint_cost(window_class, width, height, frames, repeat, dirty_only=False):
+    game = window_class()
+    game.setFixedSize(width, height)
+    game.start(level_finished_callback=lambda level: None, points_changed_callback=lambda points: None)
+    game.stop()  # frames are driven by the benchmark
+    game.move_character_forward(Velocity.FAST)
+    image = QtGui.QImage(width, height, QtGui.QImage.Format_ARGB32_Premultiplied)
+    game.render(image)  # the first paint renders the static layer
+
+    def frame():
+        game.dirty_region = QtGui.QRegion()
+        game.step(1 / 60)
+        if dirty_only:
+            # render() puts the top left corner of the region at the target offset
+            game.render(image, game.dirty_region.boundingRect().topLeft(), game.dirty_region)
+        else:
+            game.render(image)
+
+    return min(timeit.repeat(frame, number=frames, repeat=repeat)) / frames * 1e6
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark GameWindow.paintEvent with and without the cached static layer.")
+    parser.add_argument("-n", "--frames", type=int, default=500, help="frames painted per run")
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    parser.add_argument("-s", "--sizes", nargs="+", default=["700x350", "1920x1080", "3840x2160"],
+                        help="window sizes as WIDTHxHEIGHT")
+    args = parser.parse_args()
+
+    app = QtWidgets.QApplication([])
+    print(f"{'size':>10}{'background':>12}{'uncached':>12}{'cached':>12}{'dirty':>12}  (us/frame)")
+    for size in args.sizes:
+        width, height = (int(value) for value in size.split("x"))
+        background_cost = paint_cost(BackgroundOnly, width, height, args.frames, args.repeat)
+        old_cost = paint_cost(LegacyGameWindow, width, height, args.frames, args.repeat)
+        cached_cost = paint_cost(GameWindow, width, height, args.frames, args.repeat)
+        dirty_cost = paint_cost(GameWindow, width, height, args.frames, args.repeat, dirty_only=True)
+        print(f"{size:>10}{background_cost:>12.1f}{old_cost:>12.1f}{cached_cost:>12.1f}{dirty_cost:>12.1f}")
+
+    app.quit()
+
+
+if __name__ == '__main__':
+    main()
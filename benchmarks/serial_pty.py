@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SensorSerial against a simulated device on a pseudo-terminal (Linux/macOS, requires pyserial).
+
+    throughput   messages received per second and CPU load at several baud rates (0 = as fast as the pty allows),
+                 for the former readline() loop and the current bulk reads
+    reconnect    the device is unplugged and plugged in again a few times while it sends; shows whether the sensor
+                 receives again after every replug and how many file descriptors and threads are left over
+
+The device side is a PtyDevice that can also be used on its own:
+    device = PtyDevice()
+    sensor = DIPPID.SensorSerial(device.path)
+    device.start(baudrate=921600)
+    ...
+    device.unplug()
+"""
+
+import os
+import pty
+import shutil
+import tempfile
+import threading
+import time
+import tty
+from argparse import ArgumentParser
+from threading import Thread, Event
+
+import DIPPID
+from benchmarks.simulator import DeviceSimulator
+
+
+class PtyDevice:
+    """
+    A DIPPID device on a pseudo-terminal that writes one message per line, paced like a UART at `baudrate`
+    (10 bits per byte). `path` is a symlink to the pty, like the stable names udev creates for USB serial adapters:
+    unplug() closes the pty, plug() creates a new one behind the same path.
+    Bytes the receiver doesn't read in time are dropped (as in a UART overrun) instead of blocking the device.
+    """
+
+    # seconds between two writes
+    WRITE_INTERVAL = 0.001
+
+    def __init__(self, rate=100.0, seed=1):
+        self._directory = tempfile.mkdtemp(prefix="dippid-pty-")
+        self.path = os.path.join(self._directory, "ttyDIPPID")
+        self._master = None
+        self._simulator = DeviceSimulator(0, rate=rate, seed=seed)
+        self._stop = Event()
+        self._thread = None
+        self.sent = 0
+        self.dropped_bytes = 0
+        self.plug()
+
+    @property
+    def plugged(self) -> bool:
+        return self._master is not None
+
+    def plug(self):
+        if self.plugged:
+            return
+        master, slave = pty.openpty()
+        tty.setraw(slave)
+        os.set_blocking(master, False)
+        link = self.path + ".new"
+        os.symlink(os.ttyname(slave), link)
+        os.replace(link, self.path)
+        os.close(slave)
+        self._master = master
+
+    def unplug(self):
+        if not self.plugged:
+            return
+        master, self._master = self._master, None
+        os.close(master)
+        os.remove(self.path)
+
+    def _messages(self, count):
+        lines = []
+        t = 0.0
+        while len(lines) < count:
+            lines.extend(self._simulator.messages(t))
+            t += 1 / self._simulator.rate
+        return [line + b"\n" for line in lines[:count]]
+
+    def run(self, baudrate=115200, duration=None):
+        """
+        Writes messages until stop() is called or `duration` seconds have passed (blocking).
+        baudrate 0 writes as fast as the pty takes the data.
+        """
+        # a cycle of prepared messages, so generating them doesn't limit the rate
+        messages = self._messages(1000)
+        index = 0
+        pending = b""
+        start = time.monotonic()
+        written = 0
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if duration is not None and now - start >= duration:
+                break
+            budget = int((now - start) * baudrate / 10) - written if baudrate else 1 << 16
+            if baudrate and not self.plugged:
+                # the device keeps sending into nowhere
+                written += max(0, budget)
+            if budget <= 0 or not self.plugged:
+                time.sleep(PtyDevice.WRITE_INTERVAL)
+                continue
+
+            chunk = bytearray()
+            lines = 0
+            while len(chunk) < budget:
+                if not pending:
+                    pending = messages[index]
+                    index = (index + 1) % len(messages)
+                    lines += 1
+                chunk += pending
+                pending = b""
+            try:
+                size = os.write(self._master, chunk)
+            except (BlockingIOError, OSError):
+                size = 0
+            if baudrate:
+                written += len(chunk)
+                self.dropped_bytes += len(chunk) - size
+            else:
+                # unpaced: resend what didn't fit
+                pending = bytes(chunk[size:])
+            self.sent += lines if baudrate or size == len(chunk) else max(0, lines - 1)
+            if baudrate:
+                time.sleep(PtyDevice.WRITE_INTERVAL)
+
+    def start(self, baudrate=115200, duration=None):
+        self._stop.clear()
+        self._thread = Thread(target=self.run, args=(baudrate, duration), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        self.unplug()
+        self._simulator.close()
+        shutil.rmtree(self._directory, ignore_errors=True)
+
+
+class LegacySensorSerial(DIPPID.SensorSerial):
+    """
+    SensorSerial as it was before: one readline() per message and a new connection thread (started from the failing
+    one) whenever reading fails.
+    """
+
+    def _connect(self):
+        import serial
+
+        self._serial = serial.Serial(self._tty)
+        self._serial.baudrate = self._baudrate
+        self._connection_thread = Thread(target=self._receive)
+        self._connection_thread.start()
+
+    def _receive(self):
+        self._receiving = True
+        try:
+            while self._receiving:
+                data = self._serial.readline()
+                try:
+                    data_decoded = data.decode()
+                except UnicodeDecodeError:
+                    continue
+                self._update(data)
+        except:
+            # connection lost, try again
+            self._connect()
+
+    def disconnect(self):
+        # readline() has no timeout: only a failing port ends the loop
+        self._receiving = False
+        DIPPID.Sensor.instances.remove(self)
+
+
+def open_fds():
+    return len(os.listdir("/proc/self/fd")) if os.path.isdir("/proc/self/fd") else None
+
+
+def _count_messages(sensor):
+    received = [0]
+
+    def count(timestamp, data):
+        received[0] += 1
+
+    sensor.add_sample_listener(count)
+    return received
+
+
+def _serial_threads():
+    return sum(1 for thread in threading.enumerate() if thread.name != "MainThread" and thread.daemon is False)
+
+
+def throughput(sensor_class, baudrate, duration):
+    device = PtyDevice()
+    sensor = sensor_class(device.path)
+    received = _count_messages(sensor)
+    device.start(baudrate, duration)
+    cpu_start, wall_start = time.process_time(), time.monotonic()
+    device._thread.join()
+    time.sleep(0.2)
+    cpu = (time.process_time() - cpu_start) / (time.monotonic() - wall_start)
+    # unplugging ends the loop of the legacy sensor
+    device.close()
+    sensor.disconnect()
+    return device.sent / duration, received[0] / duration, cpu
+
+
+def reconnect(sensor_class, cycles, connected_time, unplugged_time):
+    fds, threads = open_fds(), _serial_threads()
+    device = PtyDevice()
+    sensor = sensor_class(device.path)
+    received = _count_messages(sensor)
+    device.start(115200)
+    phases = []
+    for cycle in range(cycles + 1):
+        if cycle:
+            device.unplug()
+            time.sleep(unplugged_time)
+            device.plug()
+        before = received[0]
+        time.sleep(connected_time)
+        phases.append(received[0] - before)
+    alive = sensor._connection_thread.is_alive()
+    device.close()
+    sensor.disconnect()
+    time.sleep(0.2)
+    leftover_fds = open_fds() - fds if fds is not None else None
+    return phases, alive, leftover_fds, _serial_threads() - threads
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark SensorSerial on a pseudo-terminal.")
+    parser.add_argument("-d", "--duration", type=float, default=2.0, help="seconds per throughput measurement")
+    parser.add_argument("-b", "--baudrates", type=int, nargs="+", default=[115200, 921600, 3000000, 0],
+                        help="baud rates of the simulated device (0 = unpaced)")
+    parser.add_argument("-c", "--cycles", type=int, default=3, help="unplug/plug cycles of the reconnect test")
+    args = parser.parse_args()
+
+    # the legacy sensor's threads die with an exception when the device is gone; count them instead of printing
+    failed_threads = []
+    threading.excepthook = lambda hook_args: failed_threads.append(hook_args.thread)
+
+    print(f"{'baudrate':>10}{'readline/s':>12}{'lost':>7}{'cpu':>7}{'bulk/s':>10}{'lost':>7}{'cpu':>7}")
+    for baudrate in args.baudrates:
+        row = f"{baudrate or 'unpaced':>10}"
+        for sensor_class in (LegacySensorSerial, DIPPID.SensorSerial):
+            sent, received, cpu = throughput(sensor_class, baudrate, args.duration)
+            lost = max(0.0, 1 - received / sent) if sent else 0.0
+            row += f"{received:>{12 if sensor_class is LegacySensorSerial else 10}.0f}{lost:>7.0%}{cpu:>7.0%}"
+        print(row)
+
+    print()
+    print(f"messages received per connected phase of 0.5 s, unplugged for 0.3 s in between")
+    for sensor_class in (LegacySensorSerial, DIPPID.SensorSerial):
+        failed_threads.clear()
+        phases, alive, fds, threads = reconnect(sensor_class, args.cycles, 0.5, 0.3)
+        print(f"{sensor_class.__name__:>20}: {phases}, receive thread {'alive' if alive else 'dead'} at the end, "
+              f"{len(failed_threads)} threads died, {fds} fds and {threads} threads left over after disconnect()")
+
+if __name__ == '__main__':
+    main()
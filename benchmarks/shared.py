@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Fan-out of one sensor stream through DIPPID_shared to 1..n reader processes: latency from publishing a message to
+the sample listener of every reader, and the CPU load of each reader process.
+The publisher runs in this process and is fed with simulator messages (no network involved).
+"""
+
+import json
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser, SUPPRESS
+
+import DIPPID
+from DIPPID_shared import SharedPublisher, SensorShared
+from benchmarks.simulator import DeviceSimulator
+from benchmarks.suite import _percentiles
+
+NAME = 'dippid-benchmark'
+
+
+def _read(duration):
+    # runs in a reader process, prints its results as json
+    sensor = SensorShared(NAME)
+    latencies = []
+    sensor.add_sample_listener(lambda timestamp, data: latencies.append(time.monotonic() - timestamp))
+    cpu_start, wall_start = time.process_time(), time.monotonic()
+    time.sleep(duration)
+    cpu = (time.process_time() - cpu_start) / (time.monotonic() - wall_start)
+    sensor.disconnect()
+    print(json.dumps([cpu, latencies, sensor.lost]))
+
+
+class _Source(DIPPID.Sensor):
+    # a sensor without a connection, the benchmark hands it the messages
+    def __init__(self):
+        DIPPID.Sensor.__init__(self)
+        self._connection_thread = None
+
+
+def fan_out(readers, rate, duration):
+    source = _Source()
+    publisher = SharedPublisher(NAME)
+    publisher.attach(source)
+    simulator = DeviceSimulator(0, rate=rate, combined=True, seed=1)
+
+    # independent processes (not forked), like separate programs; forked processes would share the resource tracker
+    processes = [subprocess.Popen([sys.executable, "-m", "benchmarks.shared", "--reader", str(duration + 1.0)],
+                                  stdout=subprocess.PIPE, text=True) for _ in range(readers)]
+    time.sleep(1.0)  # let the readers start and attach
+
+    start = time.monotonic()
+    due = start
+    while time.monotonic() - start < duration:
+        due += 1 / rate
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        source._store_samples(simulator.sample(time.monotonic() - start))
+
+    reports = [json.loads(process.communicate()[0]) for process in processes]
+    publisher.close()
+    source.disconnect()
+    simulator.close()
+    return reports
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the shared memory fan-out of a sensor stream.")
+    parser.add_argument("-d", "--duration", type=float, default=3.0, help="seconds per measurement")
+    parser.add_argument("--rate", type=float, default=200, help="messages per second (all capabilities combined)")
+    parser.add_argument("--readers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--reader", type=float, help=SUPPRESS)
+    args = parser.parse_args()
+    if args.reader is not None:
+        _read(args.reader)
+        return
+
+    print(f"{'readers':>8}{'p50 (ms)':>10}{'p99 (ms)':>10}{'max (ms)':>10}{'cpu/reader':>12}{'lost':>6}")
+    for readers in args.readers:
+        reports = fan_out(readers, args.rate, args.duration)
+        latency = _percentiles([value for cpu, latencies, lost in reports for value in latencies])
+        cpu = sum(cpu for cpu, latencies, lost in reports) / len(reports)
+        lost = sum(lost for cpu, latencies, lost in reports)
+        print(f"{readers:>8}{latency['p50'] * 1e3:>10.2f}{latency['p99'] * 1e3:>10.2f}{latency['max'] * 1e3:>10.2f}"
+              f"{cpu:>12.1%}{lost:>6}")
+
+
+if __name__ == '__main__':
+    main()
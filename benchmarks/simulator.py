@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Local DIPPID device simulator: sends realistic DIPPID JSON over UDP like the phone app does.
+
+Motion capabilities follow a slowly tumbling phone: gravity rotates around the device, the accelerometer adds user
+acceleration and gaussian sensor noise to it and the gyroscope reports the matching angular velocity. Buttons are
+pressed and released every few seconds.
+
+Run it standalone to drive the apps without a phone:
+    python -m benchmarks.simulator --port 5700 --rate 100
+"""
+
+import json
+import math
+import random
+import socket
+import time
+from argparse import ArgumentParser
+from threading import Thread, Event
+
+MOTION_CAPABILITIES = ["accelerometer", "gyroscope", "gravity"]
+BUTTONS = ["button_1", "button_2", "button_3", "button_4"]
+GRAVITY = 9.81
+
+
+class DeviceSimulator:
+    """
+    Sends DIPPID messages to host:port.
+
+    rate:        messages per second and capability (buttons are sent at the same rate, as the app does)
+    jitter:      standard deviation of the send interval in seconds (gaussian, clipped at zero)
+    noise:       standard deviation of the accelerometer noise in m/s^2
+    combined:    send all capabilities in one message instead of one message per capability
+    timestamps:  add a "t" field with time.monotonic() of sending to every message (for latency measurements)
+    """
+
+    def __init__(self, port, host="127.0.0.1", rate=100.0, jitter=0.0, noise=0.05, capabilities=None,
+                 combined=False, timestamps=False, seed=None):
+        self.port = port
+        self.host = host
+        self.rate = rate
+        self.jitter = jitter
+        self.noise = noise
+        self.capabilities = list(capabilities) if capabilities else MOTION_CAPABILITIES + BUTTONS
+        self.combined = combined
+        self.timestamps = timestamps
+        self.sent = 0
+
+        self._random = random.Random(seed)
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._stop = Event()
+        self._thread = None
+        self._buttons = {button: 0 for button in BUTTONS}
+
+    def sample(self, t):
+        """
+        Returns the values of all capabilities at time t (seconds since start).
+        """
+        # the phone tilts back and forth around two axes
+        pitch = 0.8 * math.sin(2 * math.pi * 0.25 * t)
+        roll = 0.5 * math.sin(2 * math.pi * 0.13 * t + 1.0)
+        gravity = {"x": GRAVITY * math.sin(roll),
+                   "y": GRAVITY * math.sin(pitch) * math.cos(roll),
+                   "z": GRAVITY * math.cos(pitch) * math.cos(roll)}
+        gyroscope = {"x": 0.8 * 2 * math.pi * 0.25 * math.cos(2 * math.pi * 0.25 * t),
+                     "y": 0.5 * 2 * math.pi * 0.13 * math.cos(2 * math.pi * 0.13 * t + 1.0),
+                     "z": self._random.gauss(0, 0.02)}
+        shake = 0.3 * math.sin(2 * math.pi * 3.0 * t)
+        accelerometer = {axis: value + shake + self._random.gauss(0, self.noise) for axis, value in gravity.items()}
+
+        values = {"accelerometer": accelerometer, "gyroscope": gyroscope, "gravity": gravity}
+        for index, button in enumerate(BUTTONS):
+            # every button is held for half a second once every (2 + index) seconds
+            self._buttons[button] = int((t % (2 + index)) < 0.5)
+            values[button] = self._buttons[button]
+        return {key: values[key] for key in self.capabilities}
+
+    def messages(self, t):
+        values = self.sample(t)
+        messages = [values] if self.combined else [{key: value} for key, value in values.items()]
+        if self.timestamps:
+            for message in messages:
+                message["t"] = time.monotonic()
+        return [json.dumps(message, separators=(",", ":")).encode() for message in messages]
+
+    def run(self, duration=None):
+        """
+        Sends until stop() is called or `duration` seconds have passed (blocking).
+        """
+        start = time.monotonic()
+        due = start
+        target = (self.host, self.port)
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if duration is not None and now - start >= duration:
+                break
+            if due > now:
+                time.sleep(due - now)
+            for message in self.messages(time.monotonic() - start):
+                self._sock.sendto(message, target)
+                self.sent += 1
+            interval = 1.0 / self.rate
+            if self.jitter:
+                interval = max(0.0, self._random.gauss(interval, self.jitter))
+            due += interval
+
+    def start(self, duration=None):
+        self._stop.clear()
+        self._thread = Thread(target=self.run, args=(duration,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        self._sock.close()
+
+
+def main():
+    parser = ArgumentParser(description="Simulate a DIPPID device sending over UDP.")
+    parser.add_argument("-p", "--port", type=int, default=5700)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("-r", "--rate", type=float, default=100.0, help="messages per second and capability")
+    parser.add_argument("-j", "--jitter", type=float, default=0.0, help="std. deviation of the send interval (s)")
+    parser.add_argument("-d", "--duration", type=float, help="seconds to send (default: until ctrl+c)")
+    parser.add_argument("--combined", action="store_true", help="send all capabilities in one message")
+    args = parser.parse_args()
+
+    simulator = DeviceSimulator(args.port, args.host, args.rate, args.jitter, combined=args.combined)
+    print(f"Sending to {args.host}:{args.port}, press ctrl+c to stop.")
+    try:
+        simulator.run(args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.close()
+        print(f"{simulator.sent} messages sent")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+CPU cost of keeping a spectrogram of one sensor axis up to date, for several input rates and window sizes.
+Each column is the share of one CPU core needed to keep up with the input rate (computed from the time per sample):
+
+    naive      the whole window re-transformed on every sample (what a node fed by a BufferNode would do)
+    per sample Spectrogram.process() on every sample (a new spectrum every hop = size / 4 samples)
+    per frame  Spectrogram.process() on the samples of one display frame (60 fps)
+    worker     the time the calling (GUI) thread spends to hand every frame to a TransformWorker
+"""
+
+import time
+from argparse import ArgumentParser
+import numpy as np
+
+import spectral
+from ring_buffer import RingBuffer
+
+FRAME_RATE = 60
+
+
+def naive(values, size, history):
+    window = np.hanning(size)
+    samples = RingBuffer(size)
+    frames = RingBuffer(history + 1, width=size // 2 + 1)
+    for value in values:
+        samples.append(value)
+        if len(samples) == size:
+            frame = samples.latest()
+            spectrum = np.abs(np.fft.rfft((frame - frame.mean()) * window))
+            frames.append(20 * np.log10(np.maximum(spectrum, 1e-6)))
+
+
+def per_sample(values, size, history):
+    spectrogram = spectral.Spectrogram(size, history=history)
+    for value in values:
+        spectrogram.process(value)
+
+
+def per_frame(chunks, size, history):
+    spectrogram = spectral.Spectrogram(size, history=history)
+    for chunk in chunks:
+        spectrogram.process(chunk)
+
+
+def worker(chunks, size, history):
+    transform_worker = spectral.TransformWorker(spectral.Spectrogram(size, history=history))
+    start = time.perf_counter()
+    for chunk in chunks:
+        transform_worker.submit(chunk)
+    elapsed = time.perf_counter() - start
+    transform_worker.join()
+    transform_worker.close()
+    return elapsed
+
+
+def check_chunked(values, size, chunks):
+    # the spectra must not depend on how the input is split, also if hop doesn't divide size
+    hop = size // 3 + 1
+    whole = spectral.SlidingSpectrum(size, hop).process(values)
+    spectrum = spectral.SlidingSpectrum(size, hop)
+    chunked = np.concatenate([spectrum.process(chunk) for chunk in chunks])
+    if whole.shape != chunked.shape or not np.allclose(whole, chunked):
+        raise AssertionError(f"chunked input gives other spectra than the whole input (size {size})")
+
+
+def seconds_per_sample(func, samples, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        elapsed = func()
+        best = min(best, elapsed if elapsed is not None else time.perf_counter() - start)
+    return best / samples
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the incremental spectrogram.")
+    parser.add_argument("--rates", type=float, nargs="+", default=[100, 250, 1000], help="input rates in Hz")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256, 1024, 4096, 8192], help="window sizes")
+    parser.add_argument("--history", type=int, default=200, help="spectra kept in the spectrogram")
+    parser.add_argument("-n", "--samples", type=int, default=5000, help="samples after the first full window")
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    print(f"{'rate':>7}{'size':>6}{'naive':>10}{'per sample':>12}{'per frame':>11}{'worker':>9}  (CPU share)")
+    for size in args.sizes:
+        values = rng.normal(size=size + args.samples)
+        # time per sample does not depend on the rate, only the number of samples per frame does
+        naive_time = seconds_per_sample(lambda: naive(values, size, args.history), len(values), 1)
+        sample_time = seconds_per_sample(lambda: per_sample(values, size, args.history), len(values), args.repeat)
+        for rate in args.rates:
+            chunks = np.array_split(values, max(1, int(len(values) * FRAME_RATE / rate)))
+            check_chunked(values, size, chunks)
+            frame_time = seconds_per_sample(lambda: per_frame(chunks, size, args.history), len(values), args.repeat)
+            worker_time = seconds_per_sample(lambda: worker(chunks, size, args.history), len(values), args.repeat)
+            print(f"{rate:>7.0f}{size:>6}{naive_time * rate:>10.1%}{sample_time * rate:>12.1%}"
+                  f"{frame_time * rate:>11.2%}{worker_time * rate:>9.2%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cold start of dippid_game.py and analyze.py (offscreen Qt platform): every run is a new interpreter started with
+`python -X importtime` that builds the window like the app's main() and exits after the first frame was painted.
+
+    imports         total import time reported by -X importtime (sum of the self times of all imported modules)
+    first frame     wall time from starting the interpreter to the end of the first painted frame (median)
+    top imports     the top-level imports with the largest cumulative import time
+
+Another version of the apps can be measured with --tree, e.g. to compare with an older commit:
+    git worktree add /tmp/dippid-old <commit>
+    python -m benchmarks.startup --tree /tmp/dippid-old
+"""
+
+import os
+import sys
+import time
+from argparse import ArgumentParser, SUPPRESS
+
+APPS = ("game", "analyze")
+
+
+def _build_game():
+    import dippid_game
+
+    return dippid_game.DippidGame(port=_free_port())
+
+
+def _build_analyze():
+    from pyqtgraph.Qt import QtGui
+    import analyze
+
+    if hasattr(analyze, 'register_nodes'):
+        analyze.register_nodes()
+    else:
+        # older versions register the nodes of DIPPID_pyqtnode at import and the custom ones in main()
+        import pyqtgraph.flowchart.library as fclib
+        fclib.registerNodeType(analyze.LogNode, [('Logging',)], override=True)
+        fclib.registerNodeType(analyze.NormalVectorNode, [('NormalVector',)], override=True)
+    win = QtGui.QMainWindow()
+    cw = QtGui.QWidget()
+    win.setCentralWidget(cw)
+    layout = QtGui.QGridLayout()
+    cw.setLayout(layout)
+    win.flowchart = analyze.FlowChart(layout, _free_port())
+    return win
+
+
+def _free_port():
+    import socket
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.bind(("", 0))
+        return probe.getsockname()[1]
+
+
+def _run_child(app_name):
+    # runs in the measured interpreter: prints the wall clock time at the end of the first frame and exits
+    from PyQt5 import QtWidgets, QtCore
+
+    app = QtWidgets.QApplication([sys.argv[0]])
+    window = _build_game() if app_name == "game" else _build_analyze()
+
+    class FirstFrame(QtCore.QObject):
+        def eventFilter(self, watched, event):
+            if event.type() == QtCore.QEvent.Paint and not self.property("painted"):
+                self.setProperty("painted", True)
+                # the rest of the frame is painted before the next event loop iteration
+                QtCore.QTimer.singleShot(0, self.finish)
+            return False
+
+        def finish(self):
+            print(time.time(), flush=True)
+            # the sensor threads would keep the interpreter alive
+            os._exit(0)
+
+    probe = FirstFrame()
+    app.installEventFilter(probe)
+    window.show()
+    app.exec_()
+
+
+def _parse_importtime(stderr):
+    import re
+
+    import_line = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+    total = 0
+    top_level = {}
+    for line in stderr.splitlines():
+        match = import_line.match(line)
+        if match is None:
+            continue
+        own, cumulative, indent, name = match.groups()
+        total += int(own)
+        if len(indent) == 1:
+            top_level[name] = top_level.get(name, 0) + int(cumulative)
+    return total / 1e6, top_level
+
+
+def measure(app_name, tree):
+    # imported here (like re and statistics), the measured interpreter runs this script as well
+    import subprocess
+
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", PYTHONPATH=tree)
+    env.pop("DIPPID_INSTRUMENT", None)
+    start = time.time()
+    result = subprocess.run([sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child", app_name],
+                            cwd=tree, env=env, capture_output=True, text=True, timeout=60)
+    lines = result.stdout.split()
+    if result.returncode != 0 or not lines:
+        raise RuntimeError(f"{app_name} did not start:\n{result.stderr[-2000:]}")
+    imports, top_level = _parse_importtime(result.stderr)
+    return float(lines[-1]) - start, imports, top_level
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the cold start of dippid_game.py and analyze.py.")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="starts per app")
+    parser.add_argument("--tree", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        help="directory with the apps (default: this checkout)")
+    parser.add_argument("--child", choices=APPS, help=SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        # the directory of this script would shadow modules of the apps (filters, spectral)
+        sys.path.remove(os.path.dirname(os.path.abspath(__file__)))
+        _run_child(args.child)
+        return
+    import statistics
+
+    tree = os.path.abspath(args.tree)
+    print(f"{'app':>8}{'imports (ms)':>14}{'first frame (ms)':>18}  top imports (ms)")
+    for app_name in APPS:
+        runs = [measure(app_name, tree) for _ in range(args.repeat)]
+        first_frame = statistics.median(run[0] for run in runs)
+        imports = statistics.median(run[1] for run in runs)
+        top_level = runs[-1][2]
+        top = sorted(top_level.items(), key=lambda item: -item[1])[:4]
+        top_text = ", ".join(f"{name} {micros / 1e3:.0f}" for name, micros in top)
+        print(f"{app_name:>8}{imports * 1e3:>14.0f}{first_frame * 1e3:>18.0f}  {top_text}")
+
+
+if __name__ == '__main__':
+    main()
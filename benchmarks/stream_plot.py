@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+CPU load of plotting three channels of a high-rate stream with a full history (offscreen Qt platform, real time).
+The samples of every display frame (60 fps) are handed to the plot nodes like DIPPIDNode does with an update rate of 0.
+
+    PlotWidget     BufferNode with the whole history and pyqtgraph's PlotWidget node (a new plot item per update)
+    peak           the same with pyqtgraph's automatic peak downsampling and clip-to-view turned on
+    StreamPlot     StreamPlotNode: one curve per channel, min/max decimation to the plot width, redraws capped at fps
+
+The frames column counts the paints of the plots per second (the three plots are painted together).
+"""
+
+import os
+import time
+from argparse import ArgumentParser
+import numpy as np
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+FRAME_RATE = 60
+
+
+class BufferedPlot:
+    def __init__(self, plot, capacity, peak):
+        import pyqtgraph.flowchart.library as fclib
+        from DIPPID_pyqtnode import BufferNode
+
+        if peak:
+            plot.setDownsampling(auto=True, mode='peak')
+            plot.setClipToView(True)
+        self.buffer = BufferNode("buffer")
+        self.buffer.set_buffer_size(capacity)
+        self.plot_node = fclib.getNodeType('PlotWidget')("plot")
+        self.plot_node.ctrlWidget()  # created by the flowchart otherwise, setPlot() needs it
+        self.plot_node.setPlot(plot)
+
+    def feed(self, samples):
+        self.buffer.process(dataIn=samples)
+        self.plot_node.process({'In': self.buffer.snapshot()})
+
+
+class StreamPlot:
+    def __init__(self, plot, history, rate, fps):
+        from analyze import StreamPlotNode
+
+        self.node = StreamPlotNode("stream")
+        self.node.ctrls['history'].setValue(history)
+        self.node.ctrls['rate'].setValue(rate)
+        self.node.ctrls['fps'].setValue(fps)
+        self.node.setPlot(plot)
+
+    def feed(self, samples):
+        self.node.process(dataIn=samples)
+
+
+def run(kind, channels, rate, history, fps, duration):
+    from pyqtgraph.Qt import QtGui, QtCore
+    import pyqtgraph as pg
+
+    window = QtGui.QWidget()
+    layout = QtGui.QVBoxLayout(window)
+    plots = [pg.PlotWidget() for _ in range(channels)]
+    for plot in plots:
+        layout.addWidget(plot)
+    window.resize(1200, 300 * channels)
+    window.show()
+
+    capacity = int(history * rate)
+    if kind == "StreamPlot":
+        sinks = [StreamPlot(plot, history, rate, fps) for plot in plots]
+    else:
+        sinks = [BufferedPlot(plot, capacity, kind == "peak") for plot in plots]
+
+    rng = np.random.default_rng(1)
+
+    def samples(count, start):
+        t = (start + np.arange(count)) / rate
+        return np.sin(2 * np.pi * 0.5 * t) + 0.1 * rng.normal(size=count)
+
+    # fill the whole history first
+    for sink in sinks:
+        sink.feed(samples(capacity, 0))
+    QtGui.QApplication.processEvents()
+
+    paints = [0]
+
+    class PaintCounter(QtCore.QObject):
+        def eventFilter(self, watched, event):
+            if event.type() == QtCore.QEvent.Paint:
+                paints[0] += 1
+            return False
+
+    counter = PaintCounter()
+    plots[0].viewport().installEventFilter(counter)
+
+    sent = [capacity]
+    start = time.monotonic()
+
+    def feed():
+        due = capacity + int((time.monotonic() - start) * rate)
+        chunk = samples(due - sent[0], sent[0])
+        sent[0] = due
+        for sink in sinks:
+            sink.feed(chunk)
+
+    timer = QtCore.QTimer()
+    timer.timeout.connect(feed)
+    timer.start(int(1000 / FRAME_RATE))
+    loop = QtCore.QEventLoop()
+    QtCore.QTimer.singleShot(int(duration * 1000), loop.quit)
+    cpu_start, wall_start = time.process_time(), time.monotonic()
+    loop.exec_()
+    cpu = (time.process_time() - cpu_start) / (time.monotonic() - wall_start)
+    frames = paints[0] / (time.monotonic() - wall_start)
+    timer.stop()
+    window.close()
+    return cpu, frames
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark plotting a high-rate stream.")
+    parser.add_argument("-d", "--duration", type=float, default=5.0, help="seconds per measurement")
+    parser.add_argument("-c", "--channels", type=int, default=3)
+    parser.add_argument("--rate", type=float, default=1000, help="samples per second and channel")
+    parser.add_argument("--history", type=float, default=60, help="seconds shown")
+    parser.add_argument("--fps", type=int, default=30, help="redraw cap of StreamPlotNode")
+    args = parser.parse_args()
+
+    from pyqtgraph.Qt import QtGui
+
+    app = QtGui.QApplication([])
+    print(f"{args.channels} channels at {args.rate:.0f} Hz, {args.history:.0f} s history")
+    print(f"{'':>12}{'cpu':>8}{'frames/s':>10}")
+    for kind in ("PlotWidget", "peak", "StreamPlot"):
+        cpu, frames = run(kind, args.channels, args.rate, args.history, args.fps, args.duration)
+        print(f"{kind:>12}{cpu:>8.0%}{frames:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Headless end-to-end benchmark suite. Writes machine-readable JSON so results can be compared between versions:
+    python -m benchmarks.suite --output results.json
+
+Measures
+    ingest     SensorUDP throughput and drop rate (per-datagram and batched loop) against the device simulator
+    latency    send-to-callback latency, with callbacks in the receive thread and through a CallbackDispatcher
+    nodes      cost of BufferNode.process, LowPassNode.process and NormalVectorNode.process per call
+               (after checking that DIPPIDNode keeps delivering samples when its update rate is switched)
+    game       GameWindow game step with collision checks and paint cost per frame (offscreen Qt platform)
+"""
+
+import json
+import multiprocessing
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+from argparse import ArgumentParser
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+import DIPPID
+from benchmarks.simulator import DeviceSimulator
+
+
+def _simulate(port, rate, duration, timestamps, combined):
+    simulator = DeviceSimulator(port, rate=rate, timestamps=timestamps, combined=combined, seed=1)
+    simulator.run(duration)
+    simulator.close()
+    return simulator.sent
+
+
+def _simulate_in_process(port, rate, duration, timestamps=False, combined=False):
+    # the simulator gets its own process, so it does not compete with the receiver for the GIL
+    with multiprocessing.Pool(1) as pool:
+        return pool.apply(_simulate, (port, rate, duration, timestamps, combined))
+
+
+def _stop_sensor(sensor):
+    sensor._receiving = False
+    # unblock a receive loop that waits in recvfrom()
+    wake = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    wake.sendto(b"{}", ("127.0.0.1", sensor._port))
+    wake.close()
+    sensor.disconnect()
+    sensor._sock.close()
+
+
+def _percentiles(values):
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+    return {"count": len(values),
+            "p50": values[len(values) // 2],
+            "p90": values[int(len(values) * 0.9)],
+            "p99": values[min(len(values) - 1, int(len(values) * 0.99))],
+            "max": values[-1],
+            "mean": statistics.fmean(values)}
+
+
+def bench_ingest(port, rates, duration):
+    results = []
+    for rate in rates:
+        for batched in (False, True):
+            sensor = DIPPID.SensorUDP(port, ip="127.0.0.1", batched=batched)
+            received = [0]
+
+            def count(timestamp, data):
+                # the empty message that stops the receive loop is not counted
+                if data:
+                    received[0] += 1
+
+            sensor.add_sample_listener(count)
+
+            sent = _simulate_in_process(port, rate, duration)
+            time.sleep(0.2)
+            _stop_sensor(sensor)
+            port += 1
+            results.append({"loop": "batched" if batched else "per-datagram",
+                            "rate_per_capability": rate,
+                            "sent": sent,
+                            "received_per_s": received[0] / duration,
+                            "drop_rate": max(0.0, 1 - received[0] / sent) if sent else 0.0})
+    return results, port
+
+
+def bench_latency(port, rate, duration):
+    results = {}
+    for mode in ("receive-thread", "dispatcher"):
+        sensor = DIPPID.SensorUDP(port, ip="127.0.0.1")
+        if mode == "dispatcher":
+            sensor.set_dispatcher(DIPPID.CallbackDispatcher(policies={"t": DIPPID.CallbackDispatcher.ALL}))
+        latencies = []
+        sensor.register_callback("t", lambda sent: latencies.append(time.monotonic() - sent))
+
+        _simulate_in_process(port, rate, duration, timestamps=True, combined=True)
+        time.sleep(0.2)
+        _stop_sensor(sensor)
+        port += 1
+        results[mode] = _percentiles(latencies)
+    return results, port
+
+
+def _per_call(func, number, repeat=3):
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def check_update_rate_switch(app):
+    # DIPPIDNode must deliver every sample again after switching the update rate from 0 to n and back to 0
+    from DIPPID import Sensor
+    from DIPPID_pyqtnode import DIPPIDNode
+
+    node = DIPPIDNode("dippid")
+    sensor = Sensor()
+    node.set_sensor(sensor)
+    node.set_update_rate(0)
+    message = {"accelerometer": {"x": 0.1, "y": 0.2, "z": 9.81}}
+    sensor._store_samples(message)
+    app.processEvents()  # the flush is scheduled, not yet run
+    node.set_update_rate(10)
+    node.set_update_rate(0)
+    for _ in range(5):
+        sensor._store_samples(message)
+    deadline = time.monotonic() + 1.0
+    while time.monotonic() < deadline and len(node.process()["accelX"]) != 5:
+        app.processEvents()
+        time.sleep(0.005)
+    node.set_update_rate(10)
+    Sensor.instances.remove(sensor)
+    if len(node.process()["accelX"]) != 5:
+        raise AssertionError("DIPPIDNode stopped delivering samples after switching the update rate back to 0")
+
+
+def bench_nodes(app):
+    from DIPPID_pyqtnode import BufferNode, LowPassNode
+    from analyze import NormalVectorNode
+
+    check_update_rate_switch(app)
+    rng = np.random.default_rng(1)
+    results = {}
+
+    buffer_node = BufferNode("buffer")
+    buffer_node.set_buffer_size(1000)
+    single = np.array([0.5])
+    frame = rng.normal(size=64)
+    results["BufferNode.process(1 sample)"] = _per_call(lambda: buffer_node.process(dataIn=single), 20000)
+    results["BufferNode.process(64 samples)"] = _per_call(lambda: buffer_node.process(dataIn=frame), 20000)
+
+    low_pass_node = LowPassNode("low pass")
+    results["LowPassNode.process(64 samples)"] = _per_call(lambda: low_pass_node.process(dataIn=frame), 20000)
+
+    normal_vector_node = NormalVectorNode("normal")
+    window_x, window_z = rng.normal(size=32), rng.normal(size=32)
+    results["NormalVectorNode.process(32 samples)"] = _per_call(
+        lambda: normal_vector_node.process(accel1=window_x, accel2=window_z), 5000)
+    normal_vector_node.ctrls["smoothing"].setValue(5)
+    results["NormalVectorNode.process(32 samples, smoothing 5)"] = _per_call(
+        lambda: normal_vector_node.process(accel1=window_x, accel2=window_z), 5000)
+    return results
+
+
+def bench_game(app):
+    from PyQt5 import QtGui
+    from game_widget import GameWindow, Direction, Velocity
+
+    game = GameWindow()
+    game.start(level_finished_callback=lambda level: None, points_changed_callback=lambda points: None)
+    results = {}
+
+    directions = [Direction.UP, Direction.DOWN]
+    moves = [0]
+
+    def move():
+        moves[0] += 1
+        game.move_character_forward(Velocity.NORMAL)
+        game.step(1 / 60)
+        if moves[0] % 7 == 0:
+            game.switch_lane(directions[moves[0] % 2])
+
+    # the widget is not shown, so this measures the game step and collision checks only
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")  # the game prints when switching lanes fails or a level is finished
+    try:
+        results["step_with_collision_check"] = _per_call(move, 5000)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    image = QtGui.QImage(game.size(), QtGui.QImage.Format_ARGB32_Premultiplied)
+    results["paint_frame"] = _per_call(lambda: game.render(image), 500)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = ArgumentParser(description="Run the headless DIPPID benchmark suite.")
+    parser.add_argument("-o", "--output", help="write the JSON results to this file instead of stdout")
+    parser.add_argument("-p", "--port", type=int, default=6200, help="first local UDP port to use")
+    parser.add_argument("-d", "--duration", type=float, default=3.0, help="seconds per network measurement")
+    parser.add_argument("--rates", type=int, nargs="+", default=[100, 1000, 5000],
+                        help="simulator messages per second and capability for the ingest benchmark")
+    parser.add_argument("--skip", nargs="*", default=[], choices=["ingest", "latency", "nodes", "game"])
+    args = parser.parse_args()
+
+    from PyQt5 import QtWidgets
+    app = QtWidgets.QApplication([])
+
+    results = {}
+    port = args.port
+    if "ingest" not in args.skip:
+        results["ingest"], port = bench_ingest(port, args.rates, args.duration)
+    if "latency" not in args.skip:
+        results["latency"], port = bench_latency(port, 200, args.duration)
+    if "nodes" not in args.skip:
+        results["nodes"] = bench_nodes(app)
+    if "game" not in args.skip:
+        results["game"] = bench_game(app)
+
+    report = {
+        "meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                 "revision": git_revision(),
+                 "python": platform.python_version(),
+                 "platform": platform.platform(),
+                 "numpy": np.__version__,
+                 "units": "seconds (per call for nodes and game)"},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
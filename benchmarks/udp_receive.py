@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Replays synthetic DIPPID traffic over UDP against the per-datagram and the batched receive loop of SensorUDP
+and reports the processed packets per second and the drop rate for each send rate.
+"""
+
+import json
+import random
+import socket
+import time
+from argparse import ArgumentParser
+from DIPPID import SensorUDP
+
+
+class CountingSensorUDP(SensorUDP):
+    """
+    SensorUDP that counts every datagram it parses (both receive loops decode each datagram exactly once).
+    """
+
+    def __init__(self, port, batched):
+        self.decoded = 0
+        SensorUDP.__init__(self, port, ip='127.0.0.1', batched=batched)
+
+    def _decode(self, data):
+        self.decoded += 1
+        return SensorUDP._decode(self, data)
+
+
+def make_payloads(count=64):
+    payloads = []
+    for i in range(count):
+        key = random.choice(["accelerometer", "gyroscope", "gravity"])
+        values = {axis: round(random.uniform(-10, 10), 6) for axis in "xyz"}
+        payloads.append(json.dumps({key: values}).encode())
+    payloads.append(json.dumps({"button_1": 1}).encode())
+    payloads.append(json.dumps({"button_1": 0}).encode())
+    return payloads
+
+
+def send_traffic(port, rate, duration, payloads):
+    # send in small bursts every millisecond so high rates are reachable from python
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    target = ("127.0.0.1", port)
+    sent = 0
+    start = time.perf_counter()
+    while True:
+        elapsed = time.perf_counter() - start
+        if elapsed >= duration:
+            break
+        due = int(elapsed * rate)
+        while sent < due:
+            sock.sendto(payloads[sent % len(payloads)], target)
+            sent += 1
+        time.sleep(0.001)
+    sock.close()
+    return sent, time.perf_counter() - start
+
+
+def run(port, rate, duration, batched):
+    sensor = CountingSensorUDP(port, batched=batched)
+    sent, elapsed = send_traffic(port, rate, duration, make_payloads())
+    # give the receiver a moment to drain what is still queued in the socket
+    time.sleep(0.2)
+    received = sensor.decoded
+
+    sensor._receiving = False
+    # wake up the blocking recvfrom() of the per-datagram loop
+    wake = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    wake.sendto(b"{}", ("127.0.0.1", port))
+    wake.close()
+    sensor.disconnect()
+    sensor._sock.close()
+
+    return {
+        "loop": "batched" if batched else "per-datagram",
+        "rate": rate,
+        "sent": sent,
+        "sent_per_s": sent / elapsed,
+        "received_per_s": received / elapsed,
+        "drop_rate": 1 - received / sent if sent else 0.0,
+    }
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the SensorUDP receive loops with synthetic traffic.")
+    parser.add_argument("-p", "--port", type=int, default=5799, help="first local port to use")
+    parser.add_argument("-d", "--duration", type=float, default=3.0, help="seconds of traffic per run")
+    parser.add_argument("-r", "--rates", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    port = args.port
+    print(f"{'loop':<14}{'rate':>8}{'sent/s':>12}{'recv/s':>12}{'drop':>9}")
+    for rate in args.rates:
+        for batched in (False, True):
+            result = run(port, rate, args.duration, batched)
+            port += 1  # avoid waiting for the previous socket to be released
+            print(f"{result['loop']:<14}{result['rate']:>8}{result['sent_per_s']:>12.0f}"
+                  f"{result['received_per_s']:>12.0f}{result['drop_rate']:>8.1%}")
+
+
+if __name__ == '__main__':
+    main()
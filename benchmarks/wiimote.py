@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+CPU load of SensorWiimote with a fake wiimote module (no Bluetooth needed) that sends 100 reports per second,
+like a real Wiimote. The fake is installed as the `wiimote` module, so DIPPID imports it instead of wiimote.py.
+
+    device only   the fake wiimote without a sensor (the baseline included in the other rows)
+    legacy        the former loop: polls every millisecond and compares formatted strings
+    polling       the current sensor on a wiimote without report callbacks (polls with POLL_RATE)
+    callbacks     the current sensor woken by the report callbacks
+
+The changes column counts the accelerometer callbacks of the sensor. The fake reports integer values like a real
+Wiimote, which don't change on every report; all sensors should see the same changes.
+"""
+
+import math
+import sys
+import time
+import types
+from argparse import ArgumentParser
+from threading import Thread, Event
+
+import DIPPID
+
+BUTTONS = {'A': 0x0008, 'B': 0x0004, 'Down': 0x0400, 'Home': 0x0080, 'Left': 0x0100, 'Minus': 0x0010,
+           'One': 0x0002, 'Plus': 0x1000, 'Right': 0x0200, 'Two': 0x0001, 'Up': 0x0800}
+
+
+class FakeDevice:
+    """
+    Accelerometer or buttons of a wiimote.py without report callbacks.
+    """
+
+    def __init__(self):
+        self._state = None
+
+    def __getitem__(self, key):
+        return self._state[key]
+
+    def _set(self, state):
+        self._state = state
+
+
+class FakeCallbackDevice(FakeDevice):
+    def __init__(self):
+        FakeDevice.__init__(self)
+        self._callbacks = []
+
+    def register_callback(self, func):
+        self._callbacks.append(func)
+
+    def unregister_callback(self, func):
+        if func in self._callbacks:
+            self._callbacks.remove(func)
+
+    def _set(self, state):
+        FakeDevice._set(self, state)
+        for func in self._callbacks:
+            func(state)
+
+
+class FakeWiimote:
+    """
+    Sends `rate` reports per second from its own thread: the accelerometer tilts slowly, button A is pressed for half
+    a second every two seconds.
+    """
+
+    def __init__(self, rate=100.0, with_callbacks=True):
+        self.rate = rate
+        self.reports = 0
+        device_class = FakeCallbackDevice if with_callbacks else FakeDevice
+        self.accelerometer = device_class()
+        self.buttons = device_class()
+        self.buttons.BUTTONS = BUTTONS
+        self._report(0.0)
+        self._stop = Event()
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _report(self, t):
+        tilt = math.sin(2 * math.pi * 0.5 * t)
+        self.accelerometer._set([int(512 + 100 * tilt), int(512 - 100 * tilt), 612])
+        self.buttons._set({button: button == 'A' and t % 2 < 0.5 for button in BUTTONS})
+        self.reports += 1
+
+    def _run(self):
+        start = time.monotonic()
+        due = start
+        while not self._stop.is_set():
+            due += 1 / self.rate
+            self._stop.wait(max(0.0, due - time.monotonic()))
+            self._report(time.monotonic() - start)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def install_fake_wiimote(with_callbacks=True):
+    module = types.ModuleType('wiimote')
+    module.devices = []
+
+    def connect(btaddr):
+        device = FakeWiimote(with_callbacks=with_callbacks)
+        module.devices.append(device)
+        return device
+
+    module.connect = connect
+    sys.modules['wiimote'] = module
+    return module
+
+
+class LegacySensorWiimote(DIPPID.SensorWiimote):
+    """
+    SensorWiimote as it was before: polls every millisecond, formats the accelerometer as a string and updates every
+    button on its own.
+    """
+
+    def _connect(self):
+        import wiimote
+
+        self._wiimote = wiimote.connect(self._btaddr)
+        self._connection_thread = Thread(target=self._receive)
+        self._connection_thread.start()
+
+    def _receive(self):
+        self._receiving = True
+        buttons = self._wiimote.buttons.BUTTONS.keys()
+        while self._receiving:
+            x = self._wiimote.accelerometer[0]
+            y = self._wiimote.accelerometer[1]
+            z = self._wiimote.accelerometer[2]
+            data_string = f'{{"x":{x},"y":{y},"z":{z}}}'
+            self._update('accelerometer', data_string)
+
+            for button in buttons:
+                state = int(self._wiimote.buttons[button])
+                self._update(f'button_' + button.lower(), state)
+            time.sleep(0.001)
+
+    def _update(self, key, value):
+        self._add_capability(key)
+
+        # do not notify callbacks on initialization
+        if self._data[key] == []:
+            self._data[key] = value
+            return
+
+        # notify callbacks only if data has changed
+        if self._data[key] != value:
+            self._data[key] = value
+            self._notify_callbacks(key)
+
+
+def cpu_load(sensor_class, with_callbacks, duration):
+    module = install_fake_wiimote(with_callbacks)
+    sensor = sensor_class("00:00:00:00:00:00") if sensor_class else None
+    changes = [0]
+    if sensor:
+        sensor.register_callback('accelerometer', lambda value: changes.__setitem__(0, changes[0] + 1))
+    if not module.devices:
+        module.connect(None)
+    device = module.devices[0]
+
+    cpu_start, wall_start, reports_start = time.process_time(), time.monotonic(), device.reports
+    time.sleep(duration)
+    cpu = (time.process_time() - cpu_start) / (time.monotonic() - wall_start)
+    reports = device.reports - reports_start
+    if sensor:
+        sensor.disconnect()
+    device.close()
+    return cpu, reports, changes[0]
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the CPU load of SensorWiimote with a fake wiimote.")
+    parser.add_argument("-d", "--duration", type=float, default=3.0, help="seconds per measurement")
+    args = parser.parse_args()
+
+    print(f"{'':>14}{'cpu':>8}{'reports':>9}{'changes':>9}")
+    for name, sensor_class, with_callbacks in (("device only", None, True),
+                                               ("legacy", LegacySensorWiimote, True),
+                                               ("polling", DIPPID.SensorWiimote, False),
+                                               ("callbacks", DIPPID.SensorWiimote, True)):
+        cpu, reports, changes = cpu_load(sensor_class, with_callbacks, args.duration)
+        print(f"{name:>14}{cpu:>8.1%}{reports:>9}{changes:>9}")
+
+
+if __name__ == '__main__':
+    main()
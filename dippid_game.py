@@ -5,45 +5,157 @@
 Implemented by Michael Meckl.
 """
 
+import os
 import sys
+import importlib.util
 from argparse import ArgumentParser
 import DIPPID
-from PyQt5 import QtWidgets, QtCore, uic
+import instrumentation
+from PyQt5 import QtWidgets, QtCore
 from game_widget import Direction, Velocity
 
-# import os
-# CURRENT_DIR = os.path.dirname(os.path.realpath(__file__))
-# ui_file = os.path.join(CURRENT_DIR, "dippid_game.ui")
-# form, base = uic.loadUiType(ui_file)
+CURRENT_DIR = os.path.dirname(os.path.realpath(__file__))
+UI_FILE = os.path.join(CURRENT_DIR, "dippid_game.ui")
+# the ui class compiled from UI_FILE, regenerated whenever UI_FILE is newer
+UI_CACHE = os.path.join(CURRENT_DIR, "dippid_game_ui.py")
+
+
+def load_ui_class():
+    # parsing the .ui file (and importing uic) on every start is slow, so the generated code is cached and imported
+    try:
+        if not os.path.exists(UI_CACHE) or os.path.getmtime(UI_CACHE) < os.path.getmtime(UI_FILE):
+            from PyQt5 import uic
+
+            temporary = f"{UI_CACHE}.{os.getpid()}.tmp"
+            with open(temporary, "w", encoding="utf-8") as file:
+                uic.compileUi(UI_FILE, file)
+            os.replace(temporary, UI_CACHE)
+    except OSError:
+        # no write access to the directory of the game: parse the .ui file every time
+        from PyQt5 import uic
+
+        return uic.loadUiType(UI_FILE)[0]
+
+    spec = importlib.util.spec_from_file_location("dippid_game_ui", UI_CACHE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.Ui_Dippid_Game
 
 
 class DippidGame(QtWidgets.QWidget):
 
     ALL_CAPABILITIES = ["accelerometer", "gyroscope", "gravity", "button_1", "button_2", "button_3", "button_4"]
 
-    def __init__(self, port=5700):
+    # emitted from the sensor threads, delivered in the gui thread
+    connection_changed = QtCore.pyqtSignal(bool)
+    sensor_found = QtCore.pyqtSignal(object)
+
+    def __init__(self, port=5700, use_hub=False, show_fps=False, seed=None, shared=None):
         super(DippidGame, self).__init__()
-        self.sensor = DIPPID.SensorUDP(port)
+        # sensor callbacks are queued in the dispatcher of the current sensor and delivered in the gui thread
+        # (widgets must not be touched from the sensor thread)
+        self.dispatcher = None
+        self.dispatch_timer = QtCore.QTimer(self)
+        self.dispatch_timer.timeout.connect(self._dispatch_pending)
+        self.game_running = False
 
-        # self.setupUi(self)
-        self.ui = uic.loadUi("dippid_game.ui", self)
+        self.ui = load_ui_class()()
+        self.ui.setupUi(self)
+        self.ui.game_widget.show_fps = show_fps
+        self.ui.game_widget.seed = seed  # play generated levels instead of the level files
+        self.connection_changed.connect(self._update_connected_status)
+        self.sensor_found.connect(self._on_sensor_found)
         self._show_introduction()
 
+        # with a hub several devices may send to the same port; the game is played with the first one that shows up
+        # (or the next one, if the device that is played with stopped sending)
+        self.hub = DIPPID.SensorHub(port) if use_hub else None
+        self.sensor = None
+        if use_hub:
+            self.hub.register_device_callback(self._on_hub_device)
+        elif shared is not None:
+            from DIPPID_shared import SensorShared
+            self._use_sensor(SensorShared(shared))
+        else:
+            self._use_sensor(DIPPID.SensorUDP(port))
+
+    def _use_sensor(self, sensor: DIPPID.Sensor):
+        if self.sensor is not None:
+            self.sensor.unregister_connection_callback(self._on_connection_event)
+            if self.game_running:
+                self._unregister_sensor_callbacks()
+            self.sensor.set_dispatcher(None)
+        self.sensor = sensor
+        self.dispatcher = None
+        if self.game_running:
+            self._attach_dispatcher()
+            self._register_sensor_callbacks()
+        self.sensor.register_connection_callback(self._on_connection_event)
+
+    def _attach_dispatcher(self):
+        # only while the game runs: before that, the dispatcher would queue events nobody delivers, and they would
+        # all arrive as stale moves on the first tick of the game
+        # a new dispatcher for every sensor, a dispatcher keeps the callback lists of the first sensor it served;
+        # gravity is coalesced to its latest value, all gyroscope values are kept so no rapid turn is missed
+        self.dispatcher = DIPPID.CallbackDispatcher(threaded=False,
+                                                    policies={"gyroscope": DIPPID.CallbackDispatcher.ALL})
+        self.sensor.set_dispatcher(self.dispatcher)
+
+    def _dispatch_pending(self):
+        if self.dispatcher is not None:
+            self.dispatcher.dispatch_pending()
+
+    def _on_hub_device(self, sensor: DIPPID.Sensor):
+        # runs in the hub thread: every device reports when it (re)starts sending, so a device that was already
+        # known can take over as well
+        sensor.register_connection_callback(self._on_hub_connection_event)
+
+    def _on_hub_connection_event(self, sensor: DIPPID.Sensor, connected: bool):
+        if connected:
+            self.sensor_found.emit(sensor)
+
+    def _on_sensor_found(self, sensor: DIPPID.Sensor):
+        if self.sensor is None or not self.sensor.is_alive():
+            self._use_sensor(sensor)
+
+    # switches to another device of the hub that is sending right now, returns whether there was one
+    def _fail_over(self) -> bool:
+        for sensor in self.hub.get_sensors():
+            if sensor is not self.sensor and sensor.is_alive():
+                self._use_sensor(sensor)
+                return True
+        return False
+
+    def _on_connection_event(self, sensor: DIPPID.Sensor, connected: bool):
+        # runs in a sensor thread, the signal hands the event over to the gui thread
+        if sensor is self.sensor:
+            self.connection_changed.emit(connected)
+
     def _show_introduction(self):
         self.ui.stackedWidget.setCurrentIndex(0)
         self.ui.btn_start_game.setFocusPolicy(QtCore.Qt.NoFocus)  # prevent auto-focus of the start button
         self.ui.btn_start_game.setEnabled(False)  # disable the start game button until the sensor device connected!
-
-        # check the connection to the device repeatedly until successful connection; without the connection
-        # the game can't be played so it would be useless to allow a user to start it
-        self.timer = QtCore.QTimer(self)
-        self.timer.timeout.connect(self._check_connected_status)
-        self.timer.start(10)  # wait for 10 ms until next try
+        self._show_connected_status(False)
 
         self.ui.btn_start_game.clicked.connect(self._show_game)
 
-    def _check_connected_status(self):
-        if self._is_connected():
+    def _update_connected_status(self, connected: bool):
+        # the sensor reports when it starts or stops sending, so there is no need to poll it
+        if not connected and self.hub is not None and not self.sensor.is_alive() and self._fail_over():
+            connected = True
+        if self.game_running:
+            # pause the game while the device is gone, it continues as soon as data arrives again
+            self.ui.game_widget.set_paused(not connected)
+            return
+
+        ready = connected and self._capabilities_ready()
+        self._show_connected_status(ready)
+        if connected and not ready:
+            # the first messages don't contain all capabilities yet
+            QtCore.QTimer.singleShot(100, lambda: self._update_connected_status(self.sensor.is_alive()))
+
+    def _show_connected_status(self, connected: bool):
+        if connected:
             self.ui.connected_status.setStyleSheet("QLabel { font-weight: bold; color : green;}")
             self.ui.connected_status.setText("Connected")
             self.ui.btn_start_game.setEnabled(True)
@@ -52,16 +164,11 @@ class DippidGame(QtWidgets.QWidget):
             self.ui.connected_status.setText("Not connected")
             self.ui.btn_start_game.setEnabled(False)
 
-    def _is_connected(self) -> bool:
-        # TODO find a better method to test connection!
-        #  (if we have been connected once it won't recognize a connection loss as the capabilities are already there!)
+    def _capabilities_ready(self) -> bool:
         # check if all capabilities have been registered (if all work the sensor is obviously sending data)
-        capabilities_ready = all(self.sensor.has_capability(capability) for capability in DippidGame.ALL_CAPABILITIES)
-        return True if capabilities_ready else False
+        return all(self.sensor.has_capability(capability) for capability in DippidGame.ALL_CAPABILITIES)
 
     def _show_game(self):
-        self.timer.stop()  # stop the qtimer that checks whether we are connected or not (we have to be if we are here)
-
         index = self.ui.stackedWidget.currentIndex() + 1
         # switch widget index to the element in the stack at the given index (i.e. move to this page)
         self.ui.stackedWidget.setCurrentIndex(index)
@@ -74,7 +181,10 @@ class DippidGame(QtWidgets.QWidget):
         # the callbacks need to be registered AFTER checking connected status and starting the game, otherwise we can't
         # be sure about the connected status as they register themselves as capabilities as well (and would fire before
         # the game even started)
+        self.game_running = True
+        self._attach_dispatcher()
         self._register_sensor_callbacks()
+        self.dispatch_timer.start(16)  # deliver queued sensor events about once per frame
 
     def _update_level(self, level: int):
         self.ui.level.setText(str(level))
@@ -88,6 +198,10 @@ class DippidGame(QtWidgets.QWidget):
         self.sensor.register_callback('gravity', self._handle_position_change)
         self.sensor.register_callback('gyroscope', self._handle_angle_acceleration)
 
+    def _unregister_sensor_callbacks(self):
+        self.sensor.unregister_callback('gravity', self._handle_position_change)
+        self.sensor.unregister_callback('gyroscope', self._handle_angle_acceleration)
+
     def _handle_angle_acceleration(self, data):
         if data["x"] > 2.5:
             # the mobile device was moved rapidly around the x-axis!
@@ -101,6 +215,8 @@ class DippidGame(QtWidgets.QWidget):
             self.ui.game_widget.move_character_forward(velocity=Velocity.FAST)
         elif data["x"] <= -5.0:
             self.ui.game_widget.move_character_forward(velocity=Velocity.NORMAL)
+        else:
+            self.ui.game_widget.stop_character()
 
     def _handle_button_press(self, data):
         try:
@@ -123,12 +239,22 @@ def main():
                                         " DIPPID protocol.")
     parser.add_argument("-p", "--port", help="The port on which the mobile device sends its data via DIPPID", type=int,
                         default=5700, required=False)
+    parser.add_argument("--hub", help="Accept several devices on the port and play with the first one that sends data",
+                        action="store_true")
+    parser.add_argument("--shared", help="Read the device from a DIPPID_shared.py publisher instead of the port "
+                        "(optionally with the name of its shared memory)", nargs="?", const="dippid", metavar="NAME")
+    parser.add_argument("--fps", help="Show frame rate and frame times in the game window", action="store_true")
+    parser.add_argument("--seed", help="Play generated levels from this seed instead of the levels in levels/",
+                        type=int)
     args = parser.parse_args()
     port = args.port
+    DIPPID.install_interrupt_handler()
 
     app = QtWidgets.QApplication(sys.argv)
-    dippid_game = DippidGame(port=port)
+    dippid_game = DippidGame(port=port, use_hub=args.hub, show_fps=args.fps, seed=args.seed, shared=args.shared)
     dippid_game.show()
+    if instrumentation.enabled:
+        instrumentation.start_periodic_dump()
     sys.exit(app.exec_())
 
 
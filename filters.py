@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Stateful, vectorized filters for sensor streams.
+
+A filter processes whole arrays of samples per call (shape (n,) or (n, k) for k channels, e.g. the x, y and z axis of
+the accelerometer) and keeps the state it needs to continue with the next call, so filtering a stream chunk by chunk
+gives the same result as filtering it in one go. The state is a fixed number of samples per channel (one for the
+exponential filters, window - 1 for the window filters), independent of the length of the stream.
+Before the first sample the past is assumed to be constant at the value of the first sample, so the output doesn't
+ramp up from zero.
+
+SensorFilter applies a filter to one capability of a DIPPID Sensor as the samples arrive.
+"""
+
+import math
+from threading import Lock
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class Filter:
+    """
+    Base class of the filters: subclasses implement _process() for a non-empty float array whose first axis is time.
+    """
+
+    def __init__(self):
+        self._shape = None
+
+    def process(self, values) -> np.ndarray:
+        """
+        Filters the next samples of the stream and returns an array with the same shape.
+        """
+        values = np.atleast_1d(np.asarray(values, dtype=float))
+        if len(values) == 0:
+            return values
+        if values.shape[1:] != self._shape:
+            # a different number of channels starts a new stream
+            self.reset()
+            self._shape = values.shape[1:]
+        return self._process(values)
+
+    def _process(self, values) -> np.ndarray:
+        raise NotImplementedError
+
+    def reset(self):
+        """
+        Forgets the state, the next sample starts a new stream.
+        """
+        self._shape = None
+
+
+class _WindowFilter(Filter):
+    """
+    A filter over the last `window` samples; the last window - 1 samples of a call are kept for the next one.
+    """
+
+    def __init__(self, window: int):
+        if window < 1:
+            raise ValueError(f"window must be at least 1 (got {window})")
+        self.window = int(window)
+        self._tail = None
+        Filter.__init__(self)
+
+    def _windows(self, values):
+        # values with the samples of the previous call in front, so every output sample has a full window
+        if self._tail is None:
+            self._tail = np.repeat(values[:1], self.window - 1, axis=0)
+        extended = np.concatenate([self._tail, values])
+        self._tail = extended[len(extended) - self.window + 1:].copy()
+        return extended
+
+    def reset(self):
+        Filter.reset(self)
+        self._tail = None
+
+
+class MovingAverage(_WindowFilter):
+    """
+    Mean of the last `window` samples. Uses running sums, so the cost per sample doesn't depend on the window size.
+    """
+
+    def _process(self, values):
+        extended = self._windows(values)
+        sums = np.cumsum(extended, axis=0)
+        averages = sums[self.window - 1:].copy()
+        averages[1:] -= sums[:len(sums) - self.window]
+        return averages / self.window
+
+
+class Median(_WindowFilter):
+    """
+    Median of the last `window` samples; removes single outliers (spikes) without smoothing the edges of the signal.
+    """
+
+    def _process(self, values):
+        extended = self._windows(values)
+        return np.median(sliding_window_view(extended, self.window, axis=0), axis=-1)
+
+
+_scipy_lfilter = False
+
+
+def _lfilter():
+    # scipy is optional; the (failing) import is only tried once, as it is slow compared to filtering a few samples
+    global _scipy_lfilter
+    if _scipy_lfilter is False:
+        try:
+            from scipy.signal import lfilter as _scipy_lfilter
+        except ImportError:
+            _scipy_lfilter = None
+    return _scipy_lfilter
+
+
+def _exponential_smoothing(values, alpha, previous):
+    """
+    y[i] = alpha * x[i] + (1 - alpha) * y[i - 1] along the first axis, with y[-1] = previous.
+
+    Uses scipy.signal.lfilter if it is installed. Otherwise the samples are split into blocks: inside a block the
+    recursion is written as y[i] = alpha * d^i * sum(x[j] / d^j for j <= i) with d = 1 - alpha, which is one cumsum
+    for all blocks at once, and only the carry from block to block remains a loop. Blocks are short enough that
+    d^-i stays far from overflowing.
+    """
+    decay = 1.0 - alpha
+    lfilter = _lfilter()
+    if lfilter is not None:
+        return lfilter([alpha], [1.0, -decay], values, axis=0, zi=[decay * previous])[0]
+
+    if decay == 0.0:
+        return values.copy()
+    count = len(values)
+    block = max(1, min(count, 4096, int(-100 / math.log10(decay)))) if decay < 1.0 else count
+    blocks = -(-count // block)
+    padded = np.zeros((blocks * block,) + values.shape[1:])
+    padded[:count] = values
+    padded = padded.reshape((blocks, block) + values.shape[1:])
+
+    powers = (decay ** np.arange(block)).reshape((1, block) + (1,) * (values.ndim - 1))
+    # response of every block to its own samples, as if the output before the block was 0
+    output = alpha * powers * np.cumsum(padded / powers, axis=1)
+    carry_decay = decay * powers
+    end_decay = decay ** block
+    carry = previous
+    for index in range(blocks):
+        local_end = output[index, -1].copy()
+        output[index] += carry_decay[0] * carry
+        carry = local_end + end_decay * carry
+    return output.reshape((blocks * block,) + values.shape[1:])[:count]
+
+
+class LowPass(Filter):
+    """
+    First-order IIR (exponential) low-pass: y[i] = alpha * x[i] + (1 - alpha) * y[i - 1].
+    A smaller alpha smooths more; alpha = 1 passes the signal unchanged. See alpha_for_cutoff().
+    """
+
+    def __init__(self, alpha: float):
+        if not 0 < alpha <= 1:
+            raise ValueError(f"alpha must be in (0, 1] (got {alpha})")
+        self.alpha = float(alpha)
+        self._previous = None
+        Filter.__init__(self)
+
+    def _process(self, values):
+        if self._previous is None:
+            self._previous = values[0]
+        output = _exponential_smoothing(values, self.alpha, self._previous)
+        self._previous = output[-1].copy()
+        return output
+
+    def reset(self):
+        Filter.reset(self)
+        self._previous = None
+
+
+class HighPass(LowPass):
+    """
+    First-order high-pass, the complement of the LowPass with the same alpha: the signal minus its low-pass part.
+    Removes the constant and slow parts of a signal, e.g. gravity from acceleration values.
+    """
+
+    def _process(self, values):
+        return values - LowPass._process(self, values)
+
+
+def alpha_for_cutoff(cutoff: float, sample_rate: float) -> float:
+    """
+    The alpha of a LowPass or HighPass with the cutoff frequency `cutoff` (Hz) for samples arriving at `sample_rate`.
+    """
+    rc = 1 / (2 * math.pi * cutoff)
+    dt = 1 / sample_rate
+    return dt / (rc + dt)
+
+
+class SensorFilter:
+    """
+    Filters one capability of a Sensor as its samples arrive (in the receive thread of the sensor), e.g.
+
+        smoothed = SensorFilter(sensor, 'accelerometer', LowPass(0.2))
+        smoothed.get_value()  # {'x': ..., 'y': ..., 'z': ...}
+
+    Values with several fields are filtered as one sample with a channel per field. Callbacks registered with
+    register_callback() are called with the filtered value of every sample.
+    """
+
+    def __init__(self, sensor, capability, filter: Filter, fields=None):
+        self.sensor = sensor
+        self.capability = capability
+        self.filter = filter
+        # the field names of dict values, taken from the first sample unless given
+        self.fields = list(fields) if fields is not None else None
+        self._value = None
+        self._callbacks = []
+        self._lock = Lock()
+        sensor.add_sample_listener(self._on_sample)
+
+    def _on_sample(self, timestamp, data):
+        value = data.get(self.capability)
+        if value is None:
+            return
+
+        with self._lock:
+            if isinstance(value, dict):
+                if self.fields is None:
+                    self.fields = list(value)
+                try:
+                    sample = [[float(value[field]) for field in self.fields]]
+                except (KeyError, TypeError, ValueError):
+                    # value does not match the layout of the first sample
+                    return
+                filtered = self.filter.process(sample)[0]
+                self._value = dict(zip(self.fields, filtered.tolist()))
+            else:
+                try:
+                    self._value = float(self.filter.process([float(value)])[0])
+                except (TypeError, ValueError):
+                    return
+            value = self._value
+
+        for func in self._callbacks:
+            func(value)
+
+    # returns the latest filtered value (None before the first sample)
+    def get_value(self):
+        return self._value
+
+    def register_callback(self, func):
+        self._callbacks.append(func)
+
+    def unregister_callback(self, func):
+        if func in self._callbacks:
+            self._callbacks.remove(func)
+            return True
+        return False
+
+    def reset(self):
+        with self._lock:
+            self.filter.reset()
+            self._value = None
+
+    def close(self):
+        self.sensor.remove_sample_listener(self._on_sample)
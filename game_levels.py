@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Level engine for the DIPPID game.
+
+A level is a road of a given length (in pixels) with two lanes, split into chunks of CHUNK_WIDTH pixels. Objects are
+(x, lane) tuples in level coordinates, lane 0 is the top lane and lane 1 the bottom lane.
+Levels are either loaded from JSON files (see levels/) or generated from a seed; generated levels create the content
+of a chunk only when it is requested, so their length doesn't cost memory.
+While a level is played, a LevelRun keeps the chunks near the viewport indexed for collision queries and remembers
+what was collected; every run starts with a fresh state.
+
+Level file format:
+    {"length": 700,
+     "obstacles": {"top": [400], "bottom": []},
+     "collectibles": {"top": [570, 200], "bottom": [400, 250]}}
+"""
+
+import json
+import math
+import os
+import random
+from bisect import bisect_left
+from collections import namedtuple
+
+CHUNK_WIDTH = 360  # a multiple of the dash pattern length of the middle line (18 px), so chunks fit together
+TOP_LANE, BOTTOM_LANE = 0, 1
+LANE_NAMES = {"top": TOP_LANE, "bottom": BOTTOM_LANE}
+LEVEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels")
+
+Chunk = namedtuple("Chunk", "obstacles collectibles")
+
+
+class LaneIndex:
+    """
+    Round objects of the same radius, sorted by x for every lane, so overlap queries take O(log n) and only look at
+    the objects near the queried interval.
+    """
+
+    def __init__(self, objects, radius):
+        self.radius = radius
+        # lane -> (sorted x positions, objects in the same order)
+        self._lanes = {}
+        for obj in sorted(objects):
+            xs, items = self._lanes.setdefault(obj[1], ([], []))
+            xs.append(obj[0])
+            items.append(obj)
+
+    def _range(self, lane, left, right):
+        # an object overlaps [left, right) if x - radius < right and x + radius >= left
+        xs, items = self._lanes.get(lane, ((), ()))
+        return xs, items, bisect_left(xs, left - self.radius), bisect_left(xs, right + self.radius)
+
+    def overlapping(self, lane, left, right) -> list:
+        xs, items, start, end = self._range(lane, left, right)
+        return items[start:end]
+
+    def first_overlapping(self, lane, left, right):
+        xs, items, start, end = self._range(lane, left, right)
+        return items[start] if start < end else None
+
+    def remove(self, obj):
+        xs, items = self._lanes[obj[1]]
+        index = bisect_left(xs, obj[0])
+        while items[index] != obj:
+            index += 1
+        del xs[index]
+        del items[index]
+
+    def __iter__(self):
+        for xs, items in self._lanes.values():
+            yield from items
+
+    def __len__(self):
+        return sum(len(items) for xs, items in self._lanes.values())
+
+
+class Level:
+    """
+    Base class of levels: subclasses return the objects of a chunk.
+    """
+
+    def __init__(self, name, length):
+        self.name = name
+        self.length = length
+
+    @property
+    def chunk_count(self) -> int:
+        return max(1, math.ceil(self.length / CHUNK_WIDTH))
+
+    def chunk(self, index) -> Chunk:
+        raise NotImplementedError
+
+
+class DataLevel(Level):
+    """
+    A level with fixed content, e.g. loaded from a level file.
+    """
+
+    def __init__(self, name, data):
+        Level.__init__(self, name, data["length"])
+        self._chunks = [Chunk([], []) for _ in range(self.chunk_count)]
+        for kind in Chunk._fields:
+            for lane_name, positions in data.get(kind, {}).items():
+                for x in positions:
+                    chunk = self._chunks[min(int(x // CHUNK_WIDTH), self.chunk_count - 1)]
+                    getattr(chunk, kind).append((x, LANE_NAMES[lane_name]))
+        # the objects are shared by all runs of the level, so they must not be changed
+        self._chunks = [Chunk(tuple(chunk.obstacles), tuple(chunk.collectibles)) for chunk in self._chunks]
+
+    def chunk(self, index) -> Chunk:
+        return self._chunks[index]
+
+
+class GeneratedLevel(Level):
+    """
+    A level generated from a seed. The road is divided into slots; every slot holds an obstacle with the probability
+    obstacle_density and a collectible with the probability collectible_density. Only one lane of a slot is ever
+    blocked, and an obstacle on the other lane than the one in the previous slot needs a free slot in between, so
+    there is always time to switch lanes. The same seed always generates the same level.
+    """
+
+    SLOT_WIDTH = 90
+
+    def __init__(self, seed, length, obstacle_density=0.35, collectible_density=0.4, name=None):
+        Level.__init__(self, name or f"generated {seed}", length)
+        self.seed = seed
+        self.obstacle_density = obstacle_density
+        self.collectible_density = collectible_density
+
+    def _slot(self, number):
+        # every slot has its own generator, so chunks can be created in any order
+        rng = random.Random(self.seed * 1000003 + number)
+        blocked = rng.choice((TOP_LANE, BOTTOM_LANE)) if rng.random() < self.obstacle_density else None
+        return rng, blocked
+
+    def chunk(self, index) -> Chunk:
+        obstacles, collectibles = [], []
+        slots = CHUNK_WIDTH // GeneratedLevel.SLOT_WIDTH
+        for number in range(index * slots, (index + 1) * slots):
+            x = number * GeneratedLevel.SLOT_WIDTH + GeneratedLevel.SLOT_WIDTH / 2
+            if number == 0 or x > self.length:
+                continue  # keep the start of the road free for the player
+            rng, blocked = self._slot(number)
+            if blocked is not None and self._slot(number - 1)[1] not in (None, blocked):
+                blocked = None
+            if blocked is not None:
+                obstacles.append((x, blocked))
+            if rng.random() < self.collectible_density:
+                # collectibles are placed on the free lane of a slot, or anywhere if the slot is free
+                lane = 1 - blocked if blocked is not None else rng.choice((TOP_LANE, BOTTOM_LANE))
+                collectibles.append((x + rng.uniform(-20, 20), lane))
+        return Chunk(tuple(obstacles), tuple(collectibles))
+
+
+def load_level(path) -> DataLevel:
+    with open(path) as file:
+        data = json.load(file)
+    return DataLevel(os.path.splitext(os.path.basename(path))[0], data)
+
+
+def load_levels(directory=LEVEL_DIR) -> list:
+    """
+    Loads all level files (*.json) of a directory, sorted by file name.
+    """
+    names = sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+    return [load_level(os.path.join(directory, name)) for name in names]
+
+
+def generate_level(seed, number) -> GeneratedLevel:
+    """
+    Returns level `number` (starting at 1) of the seeded level sequence; later levels are longer and denser.
+    """
+    return GeneratedLevel(seed * 1000 + number, length=CHUNK_WIDTH * (4 + 2 * number),
+                          obstacle_density=min(0.3 + 0.05 * number, 0.8), name=f"seed {seed} level {number}")
+
+
+class LevelRun:
+    """
+    The state of one play-through of a level: the chunks around the viewport (indexed for collision queries) and the
+    collected items. Chunks outside the viewport (plus `margin` chunks on both sides) are dropped.
+    """
+
+    def __init__(self, level: Level, obstacle_radius, collectible_radius, margin=1):
+        self.level = level
+        self.obstacle_radius = obstacle_radius
+        self.collectible_radius = collectible_radius
+        self.margin = margin
+        # chunk index -> Chunk of LaneIndex objects
+        self.chunks = {}
+        # collectibles of this run that were collected, so they don't come back when their chunk is loaded again
+        self._collected = set()
+
+    def chunk_range(self, left, right) -> range:
+        first = max(0, int(left // CHUNK_WIDTH))
+        last = min(self.level.chunk_count - 1, int(right // CHUNK_WIDTH))
+        return range(first, max(first, last) + 1)
+
+    def update_viewport(self, left, right) -> bool:
+        """
+        Loads the chunks around [left, right) and drops the others; returns whether anything changed.
+        """
+        visible = self.chunk_range(left, right)
+        needed = range(max(0, visible.start - self.margin), min(self.level.chunk_count, visible.stop + self.margin))
+        changed = False
+        for index in [index for index in self.chunks if index not in needed]:
+            del self.chunks[index]
+            changed = True
+        for index in needed:
+            if index not in self.chunks:
+                chunk = self.level.chunk(index)
+                collectibles = [item for item in chunk.collectibles if item not in self._collected]
+                self.chunks[index] = Chunk(LaneIndex(chunk.obstacles, self.obstacle_radius),
+                                           LaneIndex(collectibles, self.collectible_radius))
+                changed = True
+        return changed
+
+    def _indexes(self, kind, left, right, radius):
+        for index in self.chunk_range(left - radius, right + radius):
+            chunk = self.chunks.get(index)
+            if chunk is not None:
+                yield getattr(chunk, kind)
+
+    def objects(self, kind, left, right) -> list:
+        """
+        The loaded obstacles or collectibles (kind) of both lanes that overlap [left, right).
+        """
+        radius = self.obstacle_radius if kind == "obstacles" else self.collectible_radius
+        return [obj for index in self._indexes(kind, left, right, radius)
+                for lane in (TOP_LANE, BOTTOM_LANE) for obj in index.overlapping(lane, left, right)]
+
+    def first_obstacle(self, lane, left, right):
+        for index in self._indexes("obstacles", left, right, self.obstacle_radius):
+            obstacle = index.first_overlapping(lane, left, right)
+            if obstacle is not None:
+                return obstacle
+        return None
+
+    def collect(self, lane, left, right):
+        """
+        Removes the first collectible that overlaps [left, right) on the lane and returns it (None if there is none).
+        """
+        for index in self._indexes("collectibles", left, right, self.collectible_radius):
+            collectible = index.first_overlapping(lane, left, right)
+            if collectible is not None:
+                index.remove(collectible)
+                self._collected.add(collectible)
+                return collectible
+        return None
@@ -6,10 +6,13 @@ Implemented by Michael Meckl.
 """
 
 import sys
+from collections import deque
 from PyQt5 import QtWidgets, QtCore
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPainter, QPen, QBrush, QPaintEvent, QColor
+from PyQt5.QtGui import QPainter, QPen, QBrush, QPaintEvent, QColor, QPixmap, QResizeEvent, QRegion
 from enum import Enum
+import instrumentation
+from game_levels import CHUNK_WIDTH, TOP_LANE, BOTTOM_LANE, Level, LevelRun, load_levels, generate_level
 
 
 Direction = Enum("Direction", "UP DOWN")
@@ -19,10 +22,20 @@ Velocity = Enum("Velocity", "NORMAL FAST")
 # noinspection PyAttributeOutsideInit
 class GameWindow(QtWidgets.QFrame):
 
+    # movement speed of the player in pixels per second
+    SPEEDS = {Velocity.NORMAL: 150, Velocity.FAST: 300}
+    # longest time step that is simulated at once, so a stalled event loop doesn't make the player jump
+    MAX_STEP = 0.1
+    # number of frames the fps readout averages over
+    FRAME_WINDOW = 60
+    # the camera follows the player when the level is longer than the window, keeping it at this part of the width
+    CAMERA_LEAD = 0.3
+    BACKGROUND_COLOR = QColor(227, 219, 155)
+
     def __init__(self, *args, **kwargs):
         super(GameWindow, self).__init__(*args, **kwargs)
         # set game window background color and border
-        self.setStyleSheet("border: 1px solid black; background-color: rgb(227, 219, 155);")
+        self.setStyleSheet(f"border: 1px solid black; background-color: {GameWindow.BACKGROUND_COLOR.name()};")
         # necessary to set fixed size as otherwise we can't know the window dimensions before the first draw!
         self.setFixedSize(700, 350)
 
@@ -37,14 +50,59 @@ class GameWindow(QtWidgets.QFrame):
         self.player_yPos_top_lane = self.inset + self.road_height / 4
         self.player_yPos_bottom_lane = self.inset + self.road_height + self.road_height / 4
 
-        self._setup_roads()
         self._setup_levels()
+        self._setup_paint_tools()
+        self._setup_game_loop()
+
+    def _setup_paint_tools(self):
+        # pens and brushes are created once instead of on every paint
+        self.no_pen = QPen(Qt.NoPen)
+        self.road_line_pen = QPen(Qt.black, 3, Qt.SolidLine)
+        self.middle_line_pen = QPen(Qt.black, 3, Qt.DashLine)
+        self.player_face_pen = QPen(Qt.black, 4, Qt.SolidLine)
+        self.text_pen = QPen(Qt.black)
+        self.road_brush = QBrush(QColor(186, 186, 186), Qt.SolidPattern)
+        self.obstacle_brush = QBrush(Qt.black, Qt.SolidPattern)
+        self.collectible_brush = QBrush(Qt.yellow, Qt.SolidPattern)
+        self.player_brush = QBrush(Qt.darkGreen, Qt.SolidPattern)
+        self.pause_brush = QBrush(QColor(255, 255, 255, 160), Qt.SolidPattern)
+
+        # roads and obstacles don't change while a level is played, so the chunks in view are rendered into a pixmap
+        # which is only rendered again when other chunks scroll into view; the pixmap covers only the road (plus the
+        # width of the road lines), the rest is the widget background; it is filled with the background color, so it
+        # is opaque and can be copied without blending
+        self.static_layer = None
+        self.static_layer_chunks = range(0)
+        line_margin = 2
+        self.static_layer_rect = QtCore.QRect(0, self.inset - line_margin,
+                                              self.__width, self.road_height * 2 + 2 * line_margin)
+
+    def invalidate_static_layer(self):
+        self.static_layer = None
+        self.mark_dirty()
+
+    def _render_static_layer(self) -> QPixmap:
+        # the pixmap covers whole chunks, in level coordinates it starts at the first chunk in view
+        chunks = self.static_layer_chunks
+        left, right = chunks.start * CHUNK_WIDTH, chunks.stop * CHUNK_WIDTH
+        ratio = self.devicePixelRatioF()
+        pixmap = QPixmap(QtCore.QSize(right - left, self.static_layer_rect.height()) * ratio)
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(GameWindow.BACKGROUND_COLOR)
+
+        painter = QPainter(pixmap)
+        painter.translate(-left, -self.static_layer_rect.top())
+        self._draw_roads(painter, left, right)
+        self._draw_obstacles(painter, left, right)
+        painter.end()
+        return pixmap
 
-    def _setup_roads(self):
-        y_middle, y_bottom = self.inset + self.road_height, self.inset + self.road_height * 2
-        self.sideline_top = (0, self.inset, self.__width, self.inset)
-        self.middle_line = (0, y_middle, self.__width, y_middle)
-        self.sideline_bottom = (0, y_bottom, self.__width, y_bottom)
+    def resizeEvent(self, event: QResizeEvent):
+        super(GameWindow, self).resizeEvent(event)
+        self.__width, self.__height = self.width(), self.height()
+        self.static_layer_rect.setWidth(self.__width)
+        self._update_camera(force=True)
+        self.invalidate_static_layer()
 
     def _setup_levels(self):
         self.obstacle_radius = self.road_height / 2 - 5
@@ -55,33 +113,52 @@ class GameWindow(QtWidgets.QFrame):
         self.collectible_top_row_y = int(self.inset + self.road_height / 2)
         self.collectible_bottom_row_y = int(self.collectible_top_row_y + self.road_height)
 
-        # this dict defines the x-/y-positions of all collectibles and obstacles for each level
-        self.levels = {
-            1: {
-                "obstacles": [(self.__width - 300, self.obstacle_top_row_y)],
-                "collectibles": [(self.__width - 300, self.collectible_bottom_row_y),
-                                 (self.__width - 130, self.collectible_top_row_y),
-                                 (self.__width - 500, self.collectible_top_row_y),
-                                 (self.__width - 450, self.collectible_bottom_row_y)]
-            },
-            2: {
-                "obstacles": [(self.__width - 480, self.obstacle_top_row_y),
-                              (self.__width - 270, self.obstacle_bottom_row_y)],
-                "collectibles": [(self.__width - 560, self.collectible_top_row_y),
-                                 (self.__width - 430, self.collectible_top_row_y),
-                                 (self.__width - 180, self.collectible_bottom_row_y)]
-            },
-            3: {
-                "obstacles": [(self.__width - 520, self.obstacle_top_row_y),
-                              (self.__width - 385, self.obstacle_bottom_row_y),
-                              (self.__width - 250, self.obstacle_top_row_y),
-                              (self.__width - 145, self.obstacle_bottom_row_y)],
-                "collectibles": [(self.__width - 390, self.collectible_top_row_y),
-                                 (self.__width - 205, self.collectible_top_row_y),
-                                 (self.__width - 430, self.collectible_bottom_row_y),
-                                 (self.__width - 75, self.collectible_bottom_row_y)]
-            }
-        }
+        # the levels are loaded from the level files; if a seed is set before start(), generated levels are played
+        self.levels = load_levels()
+        self.seed = None
+        self.level = None
+        self.level_run = None
+        # left edge of the visible part of the level (the level scrolls horizontally when it is longer than the window)
+        self.camera_x = 0
+
+    def _level(self, number: int) -> Level:
+        if self.seed is not None:
+            return generate_level(self.seed, number)
+        return self.levels[number - 1]
+
+    def _setup_game_loop(self):
+        # input only changes the game state and marks the changed parts of the window dirty; the frame timer advances
+        # the game by the elapsed time and schedules at most one paint per frame, limited to the dirty region
+        self.dirty_region = QRegion(self.rect())
+        self.show_fps = False
+        self.paused = False
+        self.pause_message = ""
+        self.fps_rect = QtCore.QRect(0, 0, 420, 26)
+        self.frame_timer = QtCore.QTimer(self)
+        self.frame_timer.setTimerType(Qt.PreciseTimer)
+        self.frame_timer.timeout.connect(self._tick)
+        self.frame_clock = QtCore.QElapsedTimer()
+
+        # times of the latest paints and how long they took (in seconds) for the fps readout
+        self.__paint_times = deque(maxlen=GameWindow.FRAME_WINDOW)
+        self.__paint_durations = deque(maxlen=GameWindow.FRAME_WINDOW)
+        self.__paint_clock = QtCore.QElapsedTimer()
+        self.__paint_clock.start()
+
+    def mark_dirty(self, rect: QtCore.QRect = None):
+        # marks a part of the window (or the whole window) for the next frame
+        self.dirty_region += rect if rect is not None else self.rect()
+
+    def _player_rect(self) -> QtCore.QRect:
+        # the area (in window coordinates) the player is drawn in, including the pen width of eyes and mouth
+        return QtCore.QRectF(self.player_xPos - self.camera_x, self.player_yPos,
+                             self.player_width, self.player_height).toAlignedRect().adjusted(-3, -3, 3, 3)
+
+    def _frame_interval(self) -> int:
+        # pace the loop with the refresh rate of the screen (60 Hz if it is unknown)
+        screen = QtWidgets.QApplication.primaryScreen()
+        refresh_rate = screen.refreshRate() if screen is not None else 0
+        return max(1, int(1000 / (refresh_rate if refresh_rate > 0 else 60)))
 
     def start(self, level_finished_callback, points_changed_callback):
         # set callbacks to notify the ui outside the game window
@@ -92,44 +169,99 @@ class GameWindow(QtWidgets.QFrame):
         self._set_initial_values()
         self._init_first_level()
 
+        self.frame_clock.start()
+        self.frame_timer.start(self._frame_interval())
+
+    def stop(self):
+        self.frame_timer.stop()
+
     def _set_initial_values(self):
         self.current_level = 1
         self.current_points = 0
 
         self.at_top_lane = True
         self.player_xPos, self.player_yPos = self.player_start_xPos, self.player_yPos_top_lane
+        self.velocity = None  # the player stands still until the device is tilted
+        self.mark_dirty()
 
     def _init_first_level(self):
-        self.current_obstacles = []
-        self.current_collectibles = []
         self._set_values_for_level(level_index=1)
 
     def _set_values_for_level(self, level_index: int):
         # set the obstacles and collectibles for the level with the given index
-        try:
-            level = self.levels[level_index]
-        except IndexError:
+        if self.seed is None and not 1 <= level_index <= len(self.levels):
             sys.stderr.write(f"Tried to access level that doesn't exist (index={level_index}!")
             return
-        self.current_obstacles = level.get("obstacles")
-        self.current_collectibles = level.get("collectibles")
+        self.level = self._level(level_index)
+        # every run gets a fresh state, so collected items come back when a level is played again; the run only keeps
+        # the chunks around the window in memory, indexed per lane for the collision checks
+        self.level_run = LevelRun(self.level, self.obstacle_radius, self.collectible_radius)
+        self._update_camera(force=True)
+        self.invalidate_static_layer()
+
+    def _update_camera(self, force=False):
+        # scrolls the level so the player stays in view and streams in the chunks around the window
+        if self.level_run is None:
+            return
+        camera_x = int(min(max(0, self.player_xPos - self.__width * GameWindow.CAMERA_LEAD),
+                           max(0, self.level.length - self.__width)))
+        if camera_x == self.camera_x and not force:
+            return
+        self.camera_x = camera_x
+        self.level_run.update_viewport(camera_x, camera_x + self.__width)
+        chunks = self.level_run.chunk_range(camera_x, camera_x + self.__width)
+        if chunks != self.static_layer_chunks:
+            self.static_layer_chunks = chunks
+            self.static_layer = None
+        self.mark_dirty(self.static_layer_rect)  # everything on the road moves
 
     def move_character_forward(self, velocity: Velocity):
-        if velocity == Velocity.NORMAL:
-            self.player_xPos += self.player_width / 2
-        elif velocity == Velocity.FAST:
-            self.player_xPos += self.player_width
+        # the player keeps moving with this velocity until stop_character() is called
+        self.velocity = velocity
 
-        self.repaint()  # update is not enough, the repaint has to happen immediately!
+    def stop_character(self):
+        self.velocity = None
 
-        if self.player_xPos > self.__width:
+    def set_paused(self, paused: bool, message: str = "Connection lost - waiting for the device"):
+        # a paused game doesn't move and shows the message over the road
+        if paused == self.paused:
+            return
+        self.paused = paused
+        self.pause_message = message
+        self.velocity = None
+        self.frame_clock.restart()
+        self.mark_dirty()
+
+    def _tick(self):
+        elapsed = self.frame_clock.restart() / 1000
+        self.step(elapsed)
+        if self.show_fps:
+            self.mark_dirty(self.fps_rect)
+        if not self.dirty_region.isEmpty():
+            # paints once when control returns to the event loop, several updates are merged
+            self.update(self.dirty_region)
+            self.dirty_region = QRegion()
+
+    def step(self, elapsed: float):
+        # advances the game by the elapsed time in seconds
+        if self.velocity is None or self.paused:
+            return
+        self.mark_dirty(self._player_rect())
+        self.player_xPos += GameWindow.SPEEDS[self.velocity] * min(elapsed, GameWindow.MAX_STEP)
+
+        if self.player_xPos > self.level.length:
             print("Level finished!")
             self._level_up()
         else:
             # check if player collided with an obstacle or a collectible
             self._check_player_collision()
+        self._update_camera()
+        self.mark_dirty(self._player_rect())
 
     def switch_lane(self, direction: Direction):
+        if self.paused:
+            return
+        self.mark_dirty(self._player_rect())
         if direction == Direction.UP and not self.at_top_lane:
             # move to the top lane
             self.at_top_lane = True
@@ -145,7 +277,7 @@ class GameWindow(QtWidgets.QFrame):
         else:
             print("Switching lane did not work! Player is already at this lane!")
 
-        self.repaint()
+        self.mark_dirty(self._player_rect())
 
     def _level_up(self):
         self.current_level += 1
@@ -158,103 +290,140 @@ class GameWindow(QtWidgets.QFrame):
         self.__points_callback(self.current_points)
 
     def _load_next_level(self):
-        if self.current_level > len(self.levels):
-            # start at the first level again when no others left
+        if self.seed is None and self.current_level > len(self.levels):
+            # start at the first level again when no others left (generated levels never run out)
             self.current_level = 1
 
-        self._set_values_for_level(level_index=self.current_level)
         self.player_xPos = self.player_start_xPos
+        self._set_values_for_level(level_index=self.current_level)
 
-    def __check_overlap(self, object_x, object_y, object_radius):
-        # calculate the interesting x and y position of the player and the other object
-        player_right_edge = self.player_xPos + self.player_width/2
-        player_left_edge = self.player_xPos - self.player_width/2
-        object_right = object_x + object_radius
-        object_left = object_x - object_radius
-        player_lane = "top" if self.at_top_lane else "bottom"
-        object_lane = "top" if object_y == self.collectible_top_row_y else "bottom"
-
-        # check if the the player left and right edges are between the leftmost and rightmost x-pos of the other object
-        # and if they are on the same lane
-        if player_right_edge > object_left and player_left_edge <= object_right and player_lane == object_lane:
-            return True
-        else:
-            return False
+    def __player_extent(self):
+        # lane and the x-range the player covers, for overlap queries on the level run
+        lane = TOP_LANE if self.at_top_lane else BOTTOM_LANE
+        return lane, self.player_xPos - self.player_width / 2, self.player_xPos + self.player_width / 2
 
     def _check_player_collision(self):
         self.__check_collectible_hit()
         self.__check_obstacle_hit()
 
     def __check_obstacle_hit(self):
-        for obstacle in self.current_obstacles:
-            if self.__check_overlap(obstacle[0], obstacle[1], self.obstacle_radius):
-                # if the player and this obstacle overlap, remove points and update ui via callback;
-                # also reset the x-pos of the player to the start of level
-                new_points = self.current_points - 50
-                self.current_points = new_points if new_points >= 0 else 0  # make sure we don't have negative points
-                self.__points_callback(self.current_points)
+        # only the obstacles next to the player on the same lane are looked at
+        if self.level_run.first_obstacle(*self.__player_extent()) is not None:
+            # if the player and an obstacle overlap, remove points and update ui via callback;
+            # also reset the x-pos of the player to the start of level
+            new_points = self.current_points - 50
+            self.current_points = new_points if new_points >= 0 else 0  # make sure we don't have negative points
+            self.__points_callback(self.current_points)
 
-                self.player_xPos = self.player_start_xPos
-                break  # if one hit occurred we don't need to check the rest anymore
+            self.player_xPos = self.player_start_xPos
 
     def __check_collectible_hit(self):
-        for collectible in self.current_collectibles:
-            if self.__check_overlap(collectible[0], collectible[1], self.collectible_radius):
-                # if the player and this collectible overlap, add points and update ui via callback;
-                # also remove this collectible from the current collectibles so it won't be drawn on next paintEvent
-                self.current_points += 20
-                self.__points_callback(self.current_points)
-
-                self.current_collectibles.remove(collectible)
-                break  # the player can only collect one at a time, so checking the others too would be useless
-
+        lane, left, right = self.__player_extent()
+        # the player can only collect one at a time
+        # if the player and a collectible overlap, the level run removes it so it won't be drawn on next paintEvent
+        collectible = self.level_run.collect(lane, left, right)
+        if collectible is not None:
+            # add points and update ui via callback
+            self.current_points += 20
+            self.__points_callback(self.current_points)
+
+            x, y, radius = collectible[0] - self.camera_x, self._collectible_y(collectible[1]), self.collectible_radius
+            self.mark_dirty(QtCore.QRectF(x - radius, y - radius, 2 * radius, 2 * radius).toAlignedRect())
+
+    @instrumentation.timed('paint.GameWindow')
     def paintEvent(self, event: QPaintEvent):
+        if instrumentation.enabled:
+            instrumentation.since('receive', 'paint.GameWindow')
+            instrumentation.count('paints.GameWindow')
+        if self.level_run is None:
+            return  # the game has not been started yet
+        start = self.__paint_clock.nsecsElapsed()
         painter = QPainter()
         painter.begin(self)
         # painter.setRenderHints(painter.Antialiasing)
 
-        # draw all parts of the game; order does matter!
-        self._draw_roads(painter)
-        self._draw_obstacles(painter)
-        self._draw_collectibles(painter)
+        # draw all parts of the game; order does matter! the painter is clipped to the dirty region
+        if self.static_layer is None:
+            self.static_layer = self._render_static_layer()
+        # everything on the road is drawn in level coordinates
+        painter.translate(-self.camera_x, 0)
+        painter.drawPixmap(self.static_layer_chunks.start * CHUNK_WIDTH, self.static_layer_rect.top(),
+                           self.static_layer)
+        self._draw_collectibles(painter, self.camera_x, self.camera_x + self.__width)
         self._draw_player(painter)
+        painter.resetTransform()
+        if self.paused:
+            self._draw_pause_message(painter)
+        if self.show_fps:
+            self._draw_fps(painter)
 
         painter.end()
-
-    def _draw_roads(self, painter: QPainter):
+        end = self.__paint_clock.nsecsElapsed()
+        self.__paint_times.append(end / 1e9)
+        self.__paint_durations.append((end - start) / 1e9)
+
+    def frame_stats(self) -> dict:
+        # frames per second and frame times (in seconds) over the latest FRAME_WINDOW paints
+        times, durations = self.__paint_times, self.__paint_durations
+        if len(times) < 2:
+            return {"fps": 0.0, "frame_time": 0.0, "paint_time": 0.0, "max_paint_time": 0.0}
+        frame_time = (times[-1] - times[0]) / (len(times) - 1)
+        return {"fps": 1 / frame_time if frame_time > 0 else 0.0,
+                "frame_time": frame_time,
+                "paint_time": sum(durations) / len(durations),
+                "max_paint_time": max(durations)}
+
+    def _draw_fps(self, painter: QPainter):
+        stats = self.frame_stats()
+        painter.setPen(self.text_pen)
+        painter.drawText(QtCore.QPointF(8, 18), f"{stats['fps']:.0f} fps  frame {stats['frame_time'] * 1000:.1f} ms  "
+                                                f"paint {stats['paint_time'] * 1000:.2f} ms "
+                                                f"(max {stats['max_paint_time'] * 1000:.2f} ms)")
+
+    def _draw_pause_message(self, painter: QPainter):
+        painter.fillRect(self.rect(), self.pause_brush)
+        painter.setPen(self.text_pen)
+        painter.drawText(self.rect(), Qt.AlignCenter, self.pause_message)
+
+    def _obstacle_y(self, lane: int) -> int:
+        return self.obstacle_top_row_y if lane == TOP_LANE else self.obstacle_bottom_row_y
+
+    def _collectible_y(self, lane: int) -> int:
+        return self.collectible_top_row_y if lane == TOP_LANE else self.collectible_bottom_row_y
+
+    def _draw_roads(self, painter: QPainter, left: int, right: int):
         # fill background of road first
-        painter.setBrush(QBrush(QColor(186, 186, 186), Qt.SolidPattern))
-        painter.drawRect(0, self.inset, self.__width, self.road_height * 2)
+        painter.fillRect(left, self.inset, right - left, self.road_height * 2, self.road_brush)
 
         # draw road lines
-        pen = QPen(Qt.black, 3, Qt.SolidLine)
-        painter.setPen(pen)
-        painter.drawLine(*self.sideline_top)
-        painter.drawLine(*self.sideline_bottom)
-        pen.setStyle(Qt.DashLine)
-        painter.setPen(pen)
-        painter.drawLine(*self.middle_line)
-
-    def _draw_collectibles(self, painter: QPainter):
-        painter.setPen(QPen(Qt.NoPen))  # set to NoPen so no outline will be drawn
-        painter.setBrush(QBrush(Qt.yellow, Qt.SolidPattern))
-        for collectible_pos in self.current_collectibles:
-            painter.drawEllipse(QtCore.QPoint(*collectible_pos), self.collectible_radius, self.collectible_radius)
-
-    def _draw_obstacles(self, painter: QPainter):
-        painter.setPen(QPen(Qt.NoPen))
-        painter.setBrush(QBrush(Qt.black, Qt.SolidPattern))
-        for obstacle_pos in self.current_obstacles:
-            painter.drawEllipse(QtCore.QPoint(*obstacle_pos), self.obstacle_radius, self.obstacle_radius)
+        y_middle, y_bottom = self.inset + self.road_height, self.inset + self.road_height * 2
+        painter.setPen(self.road_line_pen)
+        painter.drawLine(left, self.inset, right, self.inset)
+        painter.drawLine(left, y_bottom, right, y_bottom)
+        painter.setPen(self.middle_line_pen)
+        painter.drawLine(left, y_middle, right, y_middle)
+
+    def _draw_collectibles(self, painter: QPainter, left: int, right: int):
+        painter.setPen(self.no_pen)  # set to NoPen so no outline will be drawn
+        painter.setBrush(self.collectible_brush)
+        for x, lane in self.level_run.objects("collectibles", left, right):
+            painter.drawEllipse(QtCore.QPointF(x, self._collectible_y(lane)),
+                                self.collectible_radius, self.collectible_radius)
+
+    def _draw_obstacles(self, painter: QPainter, left: int, right: int):
+        painter.setPen(self.no_pen)
+        painter.setBrush(self.obstacle_brush)
+        for x, lane in self.level_run.objects("obstacles", left, right):
+            painter.drawEllipse(QtCore.QPointF(x, self._obstacle_y(lane)), self.obstacle_radius, self.obstacle_radius)
 
     def _draw_player(self, painter: QPainter):
         # draw body
-        painter.setPen(QPen(Qt.NoPen))
-        painter.setBrush(QBrush(Qt.darkGreen, Qt.SolidPattern))
-        painter.drawRect(self.player_xPos, self.player_yPos, self.player_width, self.player_height)
+        painter.setPen(self.no_pen)
+        painter.setBrush(self.player_brush)
+        painter.drawRect(QtCore.QRectF(self.player_xPos, self.player_yPos, self.player_width, self.player_height))
 
         # draw eyes and mouth afterwards
-        painter.setPen(QPen(Qt.black, 4, Qt.SolidLine))
-        painter.drawPoint(self.player_xPos + self.player_width - 5, self.player_yPos + 5)
-        painter.drawLine(self.player_xPos + self.player_width - 8, self.player_yPos + 10,
-                         self.player_xPos + self.player_width, self.player_yPos + 10)
+        painter.setPen(self.player_face_pen)
+        painter.drawPoint(QtCore.QPointF(self.player_xPos + self.player_width - 5, self.player_yPos + 5))
+        painter.drawLine(QtCore.QLineF(self.player_xPos + self.player_width - 8, self.player_yPos + 10,
+                                       self.player_xPos + self.player_width, self.player_yPos + 10))
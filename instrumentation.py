@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Opt-in latency instrumentation for the sensor-to-screen pipeline.
+
+Set the environment variable DIPPID_INSTRUMENT=1 (or call enable() before the other modules are imported) to turn it
+on. When it is off, `timed` returns the decorated function unchanged and the few inline probes are behind a check of
+the module-level `enabled` flag, so the pipeline runs exactly as without instrumentation.
+
+Stages recorded by the pipeline:
+    decode                 Sensor._decode (parsing one message)
+    dispatch               Sensor._notify_callbacks (running or queueing the callbacks of one capability)
+    process.<Node>         process() of DIPPIDNode, BufferNode and NormalVectorNode
+    paint.GameWindow       GameWindow.paintEvent
+    redraw.StreamPlotNode  StreamPlotNode.redraw (clipping and decimating the samples for its curve)
+    receive_to_<stage>     time from the latest datagram arriving in a receive loop to <stage>
+Counters: packets (datagrams received), paints.<widget>.
+"""
+
+import functools
+import os
+import sys
+import time
+from threading import Lock, Thread
+
+enabled = os.environ.get('DIPPID_INSTRUMENT', '') not in ('', '0')
+
+_lock = Lock()
+_histograms = {}
+_counters = {}
+_marks = {}
+
+
+class LatencyHistogram:
+    """
+    Histogram with power-of-two microsecond buckets (bucket i holds durations below 2**i us).
+    """
+
+    BUCKETS = 26  # up to ~33 s
+
+    def __init__(self):
+        self.buckets = [0] * LatencyHistogram.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def add(self, seconds):
+        micros = int(seconds * 1e6)
+        index = min(max(micros, 0).bit_length(), LatencyHistogram.BUCKETS - 1)
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p):
+        """
+        Upper bound (in seconds) of the bucket that contains the p-th percentile.
+        """
+        if not self.count:
+            return 0.0
+        threshold = self.count * p / 100
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= threshold:
+                return min((2 ** index) / 1e6, self.max)
+        return self.max
+
+    def summary(self):
+        return {'count': self.count,
+                'mean': self.total / self.count if self.count else 0.0,
+                'min': self.min if self.count else 0.0,
+                'p50': self.percentile(50),
+                'p99': self.percentile(99),
+                'max': self.max}
+
+
+def enable():
+    """
+    Turns instrumentation on. Functions decorated with `timed` before this call stay uninstrumented.
+    """
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def record(stage, seconds):
+    with _lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = LatencyHistogram()
+        histogram.add(seconds)
+
+
+def count(name, n=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def mark(name):
+    """
+    Remembers when an event (e.g. 'receive') happened most recently.
+    """
+    _marks[name] = time.perf_counter()
+
+
+def since(name, stage):
+    """
+    Records the time since the latest mark(name) as the stage `<name>_to_<stage>`.
+    """
+    marked = _marks.get(name)
+    if marked is not None:
+        record(f"{name}_to_{stage}", time.perf_counter() - marked)
+
+
+def timed(stage):
+    """
+    Decorator that records the duration of every call as `stage`; a no-op unless instrumentation is enabled.
+    """
+    def decorator(func):
+        if not enabled:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(stage, time.perf_counter() - start)
+
+        return wrapper
+    return decorator
+
+
+def install_paint_probe(widget, name):
+    """
+    Records receive_to_paint.<name> and counts paints.<name> whenever the widget (or its viewport) is painted.
+    Does nothing unless instrumentation is enabled. Requires Qt.
+    """
+    if not enabled:
+        return None
+    from PyQt5 import QtCore
+
+    class PaintProbe(QtCore.QObject):
+        def eventFilter(self, watched, event):
+            if event.type() == QtCore.QEvent.Paint:
+                since('receive', f"paint.{name}")
+                count(f"paints.{name}")
+            return False
+
+    probe = PaintProbe(widget)
+    target = widget.viewport() if hasattr(widget, 'viewport') else widget
+    target.installEventFilter(probe)
+    return probe
+
+
+def stats():
+    """
+    Returns {'stages': {stage: histogram summary}, 'counters': {name: value}}; durations are in seconds.
+    """
+    with _lock:
+        return {'stages': {stage: histogram.summary() for stage, histogram in _histograms.items()},
+                'counters': dict(_counters)}
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _marks.clear()
+
+
+def summary():
+    current = stats()
+    lines = [f"{'stage':<36}{'count':>9}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}{'max us':>10}"]
+    for stage, values in sorted(current['stages'].items()):
+        lines.append(f"{stage:<36}{values['count']:>9}{values['mean'] * 1e6:>10.1f}{values['p50'] * 1e6:>10.0f}"
+                     f"{values['p99'] * 1e6:>10.0f}{values['max'] * 1e6:>10.0f}")
+    for name, value in sorted(current['counters'].items()):
+        lines.append(f"{name:<36}{value:>9}")
+    return "\n".join(lines)
+
+
+def start_periodic_dump(interval=5.0, stream=None):
+    """
+    Writes summary() to stderr (or the given stream) every `interval` seconds from a daemon thread.
+    """
+    stream = stream or sys.stderr
+
+    def dump():
+        while True:
+            time.sleep(interval)
+            stream.write(summary() + "\n\n")
+            stream.flush()
+
+    thread = Thread(target=dump, daemon=True)
+    thread.start()
+    return thread
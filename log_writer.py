@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Asynchronous, batched logging of sensor records.
+Records (dicts with the same fields) are put into a bounded queue and written by a background thread to a sink:
+stdout, a CSV file, newline-delimited JSON or an appendable NumPy .npy file.
+"""
+
+import csv
+import json
+import queue
+import sys
+import time
+from threading import Thread
+
+
+class StdoutSink:
+    """
+    Writes every record as a block of "field: value" lines to stdout.
+    """
+
+    def __init__(self, fields, labels=None, stream=None):
+        self.fields = list(fields)
+        self._labels = labels or {}
+        self._stream = stream or sys.stdout
+
+    def write(self, records):
+        lines = []
+        for record in records:
+            lines.append("Log:")
+            lines.extend(f"{self._labels.get(field, field)}: {record[field]}" for field in self.fields)
+            lines.append("")
+        self._stream.write("\n".join(lines) + "\n")
+
+    def flush(self):
+        self._stream.flush()
+
+    def close(self):
+        self.flush()
+
+
+class CSVSink:
+    """
+    Writes records as rows of a CSV file with a header line.
+    """
+
+    def __init__(self, path, fields):
+        self.fields = list(fields)
+        self._file = open(path, 'w', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fields, extrasaction='ignore')
+        self._writer.writeheader()
+
+    def write(self, records):
+        self._writer.writerows(records)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class JSONLinesSink:
+    """
+    Writes one JSON object per record and line.
+    """
+
+    def __init__(self, path, fields):
+        self.fields = list(fields)
+        self._file = open(path, 'w')
+
+    def write(self, records):
+        self._file.write("".join(json.dumps({field: record[field] for field in self.fields}) + "\n"
+                                 for record in records))
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class NpySink:
+    """
+    Appends records as rows of a float64 array to a .npy file that np.load() can read at any time.
+    The header has a fixed size and is rewritten with the new row count on every flush.
+    """
+
+    MAGIC = b'\x93NUMPY\x01\x00'
+    # magic (8) + header length (2) + header; a multiple of 64 as the format recommends
+    HEADER_SIZE = 128
+
+    def __init__(self, path, fields):
+        import numpy as np
+
+        self._np = np
+        self.fields = list(fields)
+        self._rows = 0
+        self._file = open(path, 'wb')
+        self._write_header()
+
+    def _write_header(self):
+        header = repr({'descr': '<f8', 'fortran_order': False, 'shape': (self._rows, len(self.fields))})
+        length = NpySink.HEADER_SIZE - len(NpySink.MAGIC) - 2
+        header = header.ljust(length - 1) + "\n"
+        self._file.seek(0)
+        self._file.write(NpySink.MAGIC + length.to_bytes(2, 'little') + header.encode('latin1'))
+        self._file.seek(0, 2)
+
+    def write(self, records):
+        rows = self._np.array([[record[field] for field in self.fields] for record in records], dtype='<f8')
+        self._file.write(rows.tobytes())
+        self._rows += len(rows)
+
+    def flush(self):
+        self._write_header()
+        self._file.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+SINKS = {
+    'stdout': lambda path, fields, labels: StdoutSink(fields, labels),
+    'csv': lambda path, fields, labels: CSVSink(path, fields),
+    'jsonl': lambda path, fields, labels: JSONLinesSink(path, fields),
+    'npy': lambda path, fields, labels: NpySink(path, fields),
+}
+
+
+def create_sink(kind, fields, path=None, labels=None):
+    """
+    Creates a sink by name ('stdout', 'csv', 'jsonl' or 'npy'); all but stdout need a file path.
+    """
+    if kind not in SINKS:
+        raise ValueError(f"unknown log sink '{kind}', use one of {', '.join(SINKS)}")
+    if kind != 'stdout' and not path:
+        raise ValueError(f"the {kind} log sink needs a file path")
+    return SINKS[kind](path, fields, labels)
+
+
+class AsyncLogWriter:
+    """
+    Hands records over to a background thread that writes them to a sink in batches.
+
+    submit() never blocks: when the queue is full the record is dropped and counted.
+    sample_every=n keeps only every n-th record, max_rate limits the records per second (None = unlimited);
+    records removed by either option are counted as skipped.
+    """
+
+    def __init__(self, sink, max_queue_size=10000, batch_size=500, flush_interval=0.5, max_rate=None,
+                 sample_every=1):
+        self._sink = sink
+        self._queue = queue.Queue(max_queue_size)
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._max_rate = max_rate
+        self._sample_every = max(1, sample_every)
+
+        self._allowance = max_rate or 0
+        self._last_submit = time.monotonic()
+        self.submitted = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.written = 0
+
+        self._running = True
+        self._thread = Thread(target=self._work, daemon=True)
+        self._thread.start()
+
+    def submit(self, record) -> bool:
+        self.submitted += 1
+        if self.submitted % self._sample_every:
+            self.skipped += 1
+            return False
+
+        if self._max_rate:
+            # token bucket: refills with max_rate tokens per second, holds at most one second worth of tokens
+            now = time.monotonic()
+            self._allowance = min(self._max_rate, self._allowance + (now - self._last_submit) * self._max_rate)
+            self._last_submit = now
+            if self._allowance < 1:
+                self.skipped += 1
+                return False
+            self._allowance -= 1
+
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _work(self):
+        last_flush = time.monotonic()
+        while self._running or not self._queue.empty():
+            try:
+                batch = [self._queue.get(timeout=self._flush_interval)]
+            except queue.Empty:
+                batch = []
+            while batch and len(batch) < self._batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._sink.write(batch)
+                self.written += len(batch)
+            now = time.monotonic()
+            if now - last_flush >= self._flush_interval:
+                self._sink.flush()
+                last_flush = now
+
+    def stats(self):
+        return {'submitted': self.submitted, 'written': self.written, 'queued': self._queue.qsize(),
+                'skipped': self.skipped, 'dropped': self.dropped}
+
+    def close(self):
+        """
+        Writes everything that is still queued and closes the sink.
+        """
+        self._running = False
+        self._thread.join()
+        self._sink.close()
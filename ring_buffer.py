@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Fixed-capacity NumPy ring buffers for sensor samples.
+"""
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Preallocated ring buffer of `capacity` rows with `width` columns (or scalars if width is None).
+
+    Every row is stored twice (at i and i + capacity), so the newest n rows are always one contiguous slice of the
+    storage and can be handed out as a view without copying. Designed for a single writer and any number of readers:
+    the writer fills the rows first and publishes them by bumping one integer counter afterwards. While a writer is
+    active, the oldest row of a full buffer is the one being overwritten next, so concurrent readers should ask for
+    at most capacity - 1 rows (SampleHistory keeps a spare row for this). A reader that holds on to a view while the
+    writer wraps around the buffer will see old rows being overwritten - copy the view if it has to outlive that.
+    """
+
+    def __init__(self, capacity: int, width=None, dtype=np.float64):
+        if capacity < 1:
+            raise ValueError(f"capacity must be at least 1 (got {capacity})")
+        self._capacity = capacity
+        self._width = width
+        shape = (2 * capacity,) if width is None else (2 * capacity, width)
+        self._storage = np.zeros(shape, dtype=dtype)
+        # total number of rows ever written; the only state readers depend on
+        self._written = 0
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def written(self) -> int:
+        return self._written
+
+    def __len__(self):
+        return min(self._written, self._capacity)
+
+    def append(self, value):
+        pos = self._written % self._capacity
+        self._storage[pos] = value
+        self._storage[pos + self._capacity] = value
+        self._written += 1
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self._storage.dtype)
+        if self._width is None:
+            values = values.reshape(-1)
+        else:
+            values = values.reshape(-1, self._width)
+        count = len(values)
+        if count == 0:
+            return
+        if count == 1:
+            self.append(values[0])
+            return
+
+        # rows older than one capacity would be overwritten anyway
+        skipped = max(0, count - self._capacity)
+        values = values[skipped:]
+        pos = (self._written + skipped) % self._capacity
+
+        # write in at most two chunks (before and after the wrap-around), each into both halves
+        first = min(len(values), self._capacity - pos)
+        self._storage[pos:pos + first] = values[:first]
+        self._storage[pos + self._capacity:pos + self._capacity + first] = values[:first]
+        rest = len(values) - first
+        if rest:
+            self._storage[:rest] = values[first:]
+            self._storage[self._capacity:self._capacity + rest] = values[first:]
+
+        self._written += count
+
+    def latest(self, n=None):
+        """
+        Returns a view of the newest n rows (all stored rows if n is None), oldest first.
+        """
+        written = self._written
+        available = min(written, self._capacity)
+        n = available if n is None else max(0, min(n, available))
+        end = written % self._capacity + self._capacity
+        return self._storage[end - n:end]
+
+    def clear(self):
+        self._written = 0
+
+    def resize(self, capacity: int):
+        """
+        Reallocates the storage and keeps the newest min(len(self), capacity) rows.
+        """
+        if capacity == self._capacity:
+            return
+        kept = self.latest(capacity).copy()
+        self.__init__(capacity, self._width, self._storage.dtype)
+        self.extend(kept)
+
+
+class SampleHistory:
+    """
+    Timestamped sample history built on a RingBuffer whose first column holds the timestamp.
+    Timestamps and values of one sample are written together, so readers always get matching rows.
+    Safe to read from any thread while a single thread appends.
+    """
+
+    def __init__(self, capacity: int, fields):
+        # fields: names of the value columns, e.g. ['x', 'y', 'z'] or [None] for scalar samples
+        self.fields = list(fields)
+        # one spare row: the row the writer overwrites next is never handed out
+        self._ring = RingBuffer(capacity + 1, width=len(self.fields) + 1)
+        self._row = np.zeros(len(self.fields) + 1)
+
+    @property
+    def capacity(self) -> int:
+        return self._ring.capacity - 1
+
+    def __len__(self):
+        return min(len(self._ring), self.capacity)
+
+    def append(self, timestamp: float, values):
+        self._row[0] = timestamp
+        self._row[1:] = values
+        self._ring.append(self._row)
+
+    def latest(self, n=None):
+        """
+        Returns views (timestamps, values) of the newest n samples, oldest first.
+        values has one column per field.
+        """
+        rows = self._ring.latest(self.capacity if n is None else min(n, self.capacity))
+        return rows[:, 0], rows[:, 1:]
+
+    def since(self, timestamp: float):
+        """
+        Returns views (timestamps, values) of all stored samples newer than the given timestamp.
+        """
+        rows = self._ring.latest(self.capacity)
+        start = np.searchsorted(rows[:, 0], timestamp, side='right')
+        return rows[start:, 0], rows[start:, 1:]
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Incremental sliding-window spectra of sensor streams.
+
+Samples are fed in chunks of any length; a new spectrum is computed every `hop` samples from the latest `size`
+samples, so every sample is transformed size / hop times in total instead of once per call for the whole buffer.
+All spectra that become due in one call are computed with a single batched FFT. The window function and its
+amplitude normalization are computed once per transform: a sine with amplitude A at a bin frequency shows up
+as a peak of height A.
+
+SlidingSpectrum outputs the spectra, Spectrogram keeps the latest ones as an image (time x frequency) in a ring
+buffer. TransformWorker runs either of them in a worker thread (NumPy's FFT releases the GIL).
+"""
+
+from collections import deque
+from threading import Thread, Condition
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from ring_buffer import RingBuffer
+
+WINDOWS = {
+    'hann': np.hanning,
+    'hamming': np.hamming,
+    'blackman': np.blackman,
+    'rectangular': np.ones,
+}
+
+
+class SlidingSpectrum:
+    """
+    Amplitude spectrum of the latest `size` samples, every `hop` samples (size / 4 by default).
+    With detrend=True the mean of every window is removed first (e.g. gravity), with db=True amplitudes are returned
+    in decibels (20 * log10).
+    """
+
+    # amplitude that is returned as the lowest decibel value, to avoid log(0)
+    MIN_AMPLITUDE = 1e-6
+
+    def __init__(self, size=256, hop=None, sample_rate=100.0, window='hann', detrend=True, db=False):
+        if size < 2:
+            raise ValueError(f"size must be at least 2 (got {size})")
+        self.size = int(size)
+        self.hop = int(hop) if hop else max(1, self.size // 4)
+        self.sample_rate = float(sample_rate)
+        self.detrend = detrend
+        self.db = db
+
+        weights = WINDOWS[window](self.size)
+        # the one-sided spectrum holds half of the amplitude of a sine in each of its bins
+        self._window = weights * (2 / weights.sum())
+        self.frequencies = np.fft.rfftfreq(self.size, 1 / self.sample_rate)
+        # the latest spectrum, None until the first window is complete
+        self.latest = None
+        self._tail = np.empty(0)
+        self._count = 0
+
+    @property
+    def bins(self) -> int:
+        return len(self.frequencies)
+
+    def process(self, values) -> np.ndarray:
+        """
+        Adds samples and returns the spectra that became due, one row per spectrum (possibly none).
+        """
+        values = np.atleast_1d(np.asarray(values, dtype=float)).ravel()
+        extended = np.concatenate([self._tail, values]) if len(self._tail) else values
+        first = self._count
+        self._count += len(values)
+        self._tail = extended[max(0, len(extended) - self.size + 1):].copy()
+
+        # spectra are due at the sample numbers size + k * hop, independent of how the input is split into calls;
+        # the first one due now is the first after the samples of the previous calls
+        start = self.size + max(0, (first - self.size) // self.hop + 1) * self.hop
+        ends = np.arange(start, self._count + 1, self.hop)
+        if len(ends) == 0:
+            return np.empty((0, self.bins))
+
+        # sample number n is at index n - offset of `extended`
+        offset = self._count - len(extended)
+        frames = sliding_window_view(extended, self.size)[ends - self.size - offset]
+        if self.detrend:
+            frames = frames - frames.mean(axis=1, keepdims=True)
+        spectra = np.abs(np.fft.rfft(frames * self._window, axis=1))
+        if self.db:
+            spectra = 20 * np.log10(np.maximum(spectra, SlidingSpectrum.MIN_AMPLITUDE))
+        self.latest = spectra[-1]
+        return spectra
+
+    def reset(self):
+        self.latest = None
+        self._tail = np.empty(0)
+        self._count = 0
+
+
+class Spectrogram:
+    """
+    The latest `history` spectra of a SlidingSpectrum (in decibels unless db=False) as an image.
+    image() returns a view with one row per spectrum, oldest first, and one column per frequency bin, which is the
+    (x, y) = (time, frequency) layout ImageItem.setImage() expects. Safe to read from another thread while a single
+    thread processes samples.
+    """
+
+    def __init__(self, size=256, hop=None, sample_rate=100.0, history=256, window='hann', detrend=True, db=True):
+        self.spectrum = SlidingSpectrum(size, hop, sample_rate, window, detrend, db)
+        self.history = history
+        # one spare row: the row written next is never handed out
+        self._frames = RingBuffer(history + 1, width=self.spectrum.bins)
+
+    @property
+    def frequencies(self):
+        return self.spectrum.frequencies
+
+    @property
+    def written(self) -> int:
+        # number of spectra computed so far
+        return self._frames.written
+
+    def process(self, values) -> int:
+        """
+        Adds samples and returns the number of new spectra.
+        """
+        spectra = self.spectrum.process(values)
+        if len(spectra):
+            self._frames.extend(spectra[-self.history:])
+        return len(spectra)
+
+    def image(self) -> np.ndarray:
+        return self._frames.latest(self.history)
+
+    def reset(self):
+        self.spectrum.reset()
+        self._frames.clear()
+
+
+class TransformWorker:
+    """
+    Runs the process() method of a SlidingSpectrum or Spectrogram in a worker thread.
+    submit() never blocks: samples submitted while the worker is busy are processed together in its next round.
+    The results are read from the transform (SlidingSpectrum.latest, Spectrogram.image()).
+    """
+
+    def __init__(self, transform):
+        self.transform = transform
+        self.rounds = 0
+        self._pending = deque()
+        self._busy = False
+        self._running = True
+        self._condition = Condition()
+        self._thread = Thread(target=self._work, daemon=True)
+        self._thread.start()
+
+    def submit(self, values):
+        values = np.atleast_1d(np.asarray(values, dtype=float)).ravel()
+        with self._condition:
+            self._pending.append(values)
+            self._condition.notify_all()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                self._busy = False
+                self._condition.notify_all()
+                while self._running and not self._pending:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                chunks = list(self._pending)
+                self._pending.clear()
+                self._busy = True
+            self.transform.process(np.concatenate(chunks) if len(chunks) > 1 else chunks[0])
+            self.rounds += 1
+
+    def join(self):
+        """
+        Waits until every submitted sample is processed.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: not (self._pending or self._busy) or not self._thread.is_alive())
+
+    def close(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        self._thread.join()